@@ -6,18 +6,30 @@ AI调度器
 
 import asyncio
 import logging
+import math
 import time
-import threading
-from datetime import datetime
-from typing import Dict, List, Optional
+import weakref
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
 
+from config import settings
 from database import get_db_session
-from models.models import AI, DecisionLog, PortfolioSnapshot, Order
-from data_service.akshare_client import AKShareClient
+from models.models import AI, DecisionLog, PortfolioSnapshot, Order, Position
+from data_service.quote_frame import QuoteFrame
+from data_service.quote_hub import QuoteHub, get_quote_hub
+from data_service.kline_store import KLineStore
+from data_service.indicators import IndicatorEngine
 from ai_service.prompt_builder import PromptBuilder
-from ai_service.decision_parser import DecisionParser
+from ai_service.decision_parser import DecisionParser, IncrementalDecisionParser
 from ai_service.llm_adapters.adapter_factory import LLMAdapterFactory
+from ai_service.llm_adapters.base_adapter import close_async_http_client
+from ai_service.llm_adapters.response_cache import CachedLLMAdapter, get_llm_response_cache
+from ai_service.job_scheduler import JobScheduler, current_job_scheduler
+from ai_service.event_triggers import EventTriggers
+from ai_service.token_usage import (
+    budget_exceeded, daily_budget, daily_spend, estimate_cost, estimate_usage, normalize_usage
+)
 
 # 导入WebSocket管理器用于广播
 try:
@@ -35,12 +47,19 @@ logger = logging.getLogger(__name__)
 class AIScheduler:
     """AI决策调度器（重构版）
     
-    三个独立的定时任务：
+    三个定时任务，由同一个 JobScheduler 按墙钟刻度触发（闭市时暂停到下一次开盘）：
     1. 行情更新任务（15秒）：获取并缓存最新行情
     2. AI决策任务（30分钟）：调用LLM生成交易决策
-    3. 订单撮合任务（15秒）：处理所有pending订单
+    3. 订单撮合任务（15秒，比行情更新晚5秒）：处理所有pending订单
+
+    AI决策按时间表错开：决策任务每个刻度（默认1分钟）检查一次，只执行到点的AI。
+    每个AI有自己的决策间隔和相位（AI表中未设置时使用默认间隔，并在同一间隔的AI之间均匀错开），
+    LLM调用和数据库写入因此分散在整个间隔内，而不是每30分钟集中一次。
+    此外，短时大幅涨跌、接近涨跌停、挂单成交等事件会为相关的AI在下一个刻度追加一次决策（见 EventTriggers）。
     """
 
+    DECISION_TICK_OFFSET = 10  # 决策刻度相对整分钟的偏移（秒），等待同一分钟的行情更新完成
+
     def __init__(
         self, 
         db=None, 
@@ -53,11 +72,27 @@ class AIScheduler:
         decision_interval=1800,          # AI决策间隔：30分钟 = 1800秒
         matching_interval=15,            # 订单撮合间隔：15秒
         llm_timeout=30,
-        force_run=False                  # 强制运行（忽略交易时间检查，用于测试）
+        force_run=False,                 # 强制运行（忽略交易时间检查，用于测试）
+        quote_hub=None,                  # 行情中心（默认使用进程级共享实例）
+        kline_store=None,                # 本地K线库
+        clock=None,                      # 时钟（回放时注入 VirtualClock，默认使用系统时间）
+        llm_concurrency=None,            # 同时进行的LLM调用数上限（默认读取配置）
+        decision_deadline=None,          # 单个AI一次决策的截止时间（秒，默认读取配置）
+        decision_slot=None,              # 决策时间表的刻度（秒，默认读取配置）
+        event_triggers=None,             # 行情事件触发器（默认按配置创建，配置关闭时不启用）
+        llm_cache=None                   # LLM响应缓存（默认按配置使用进程级缓存，配置关闭时不启用）
     ):
         self.db = db
         self.is_running = False
-        self.data_client = data_client or AKShareClient()
+        if quote_hub is None:
+            # 未注入数据源时与REST/WebSocket共享进程级行情中心，否则使用独立的行情中心
+            quote_hub = get_quote_hub() if data_client is None else QuoteHub(data_client, market_update_interval)
+        self.quote_hub: QuoteHub = quote_hub
+        self.data_client = data_client or quote_hub.data_client
+        self.kline_store = kline_store or KLineStore(self.data_client)
+        self.indicator_engine = IndicatorEngine(
+            self.kline_store, bar_source=quote_hub.bar_aggregator, tick_source=quote_hub.tick_buffer
+        )
         self.prompt_builder = PromptBuilder()
         self.decision_parser = DecisionParser()
         self.trading_rules = trading_rules or TradingRules()
@@ -71,18 +106,44 @@ class AIScheduler:
         self.matching_interval = matching_interval
         self.llm_timeout = llm_timeout
         self.force_run = force_run  # 强制运行开关
+        self.clock = clock
+        self.llm_concurrency = max(1, llm_concurrency or settings.llm_max_concurrency)
+        self.decision_deadline = decision_deadline or settings.llm_decision_deadline
+        self.decision_slot = max(1, int(decision_slot or settings.decision_slot_seconds))
+        self._last_decision_slot: Dict[int, datetime] = {}  # 每个AI最近一次执行的决策时间点
+        self._decision_tasks: Dict[int, asyncio.Task] = {}   # 进行中的决策（按AI）
+        self._llm_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        if event_triggers is None and settings.event_triggers_enabled:
+            event_triggers = EventTriggers(
+                tick_source=quote_hub.tick_buffer,
+                price_move_pct=settings.event_price_move_pct,
+                price_move_minutes=settings.event_price_move_minutes,
+                limit_proximity_pct=settings.event_limit_proximity_pct,
+                debounce_seconds=settings.event_debounce_seconds,
+                min_gap_seconds=settings.event_min_gap_seconds,
+                max_per_hour=settings.event_max_per_hour,
+                limit_normal=self.trading_rules.price_limit_normal,
+                limit_st=self.trading_rules.price_limit_st,
+            )
+        self.event_triggers: Optional[EventTriggers] = event_triggers
+        self.llm_cache = llm_cache if llm_cache is not None else get_llm_response_cache()
+        self._decision_loop: Optional[asyncio.AbstractEventLoop] = None
 
         # 缓存适配器实例
         self.adapters_cache = {}
 
-        # 三个独立的线程
-        self.market_thread = None
-        self.decision_thread = None
-        self.matching_thread = None
+        # 定时任务调度器（start() 时注册任务）
+        self.job_scheduler: Optional[JobScheduler] = None
         
-        # 共享数据：最新行情缓存
-        self.latest_quotes = []
-        self.quotes_lock = threading.Lock()
+    @property
+    def latest_quotes(self) -> List:
+        """最新行情（来自行情中心快照）"""
+        return list(self.quote_hub.get_snapshot().quotes)
+
+    @property
+    def quotes_lock(self):
+        """行情快照锁"""
+        return self.quote_hub.lock
 
     def _is_trading_time(self) -> bool:
         """检查当前是否在交易时间
@@ -94,39 +155,35 @@ class AIScheduler:
         if self.force_run:
             return True  # 强制运行模式，忽略交易时间检查
         
-        return self.trading_rules.check_trading_time()
+        return self.trading_rules.check_trading_time(self._now())
+    
+    def _now(self) -> datetime:
+        """当前时间（注入时钟时使用虚拟时间）"""
+        return self.clock.now() if self.clock else datetime.now()
     
     def _get_next_trading_time_info(self) -> str:
         """获取下一个交易时段的信息（用于日志）"""
-        from datetime import datetime, time
-        now = datetime.now()
-        current_time = now.time()
-        weekday = now.weekday()
-        
-        # 周末
-        if weekday >= 5:
-            days_until_monday = 7 - weekday
-            return f"周末休市，{days_until_monday}天后（周一 09:30）开市"
-        
-        # 工作日
-        morning_start = time(9, 30)
-        morning_end = time(11, 30)
-        afternoon_start = time(13, 0)
-        afternoon_end = time(15, 0)
-        
-        if current_time < morning_start:
-            return f"盘前，今日 09:30 开市"
-        elif morning_start <= current_time <= morning_end:
-            return "上午交易时段"
-        elif morning_end < current_time < afternoon_start:
-            return "午休，13:00 继续交易"
-        elif afternoon_start <= current_time <= afternoon_end:
-            return "下午交易时段"
-        else:
-            return "已收盘，明日 09:30 开市"
+        return self.trading_rules.calendar.describe(self._now())
     
+    def _create_job_scheduler(self) -> JobScheduler:
+        """创建定时任务调度器并注册三个任务（强制运行模式下不限制交易时段）"""
+        jobs = JobScheduler(
+            clock=self.clock,
+            calendar=None if self.force_run else self.trading_rules.calendar
+        )
+        jobs.add_job("行情更新", self._update_market_data, self.market_update_interval)
+        # 每个刻度只执行到点的AI（见 _adecision_tick）
+        jobs.add_job("AI决策", self._adecision_tick, self.decision_slot, offset=self.DECISION_TICK_OFFSET)
+        jobs.add_job("订单撮合", self._match_orders_job, self.matching_interval, offset=5)
+        # 线程池（asyncio.to_thread 使用的默认执行器）：每个任务一个线程，再给每个进行中的LLM调用留两个线程
+        # （流式提前下单 + 其他AI的准备/应用），提前下单不必排在其他AI的数据库操作之后
+        jobs.max_workers = len(jobs.jobs) + 2 * self.llm_concurrency
+        # 决策任务的HTTP连接池属于调度器的事件循环，停止时一并关闭
+        jobs.on_shutdown(close_async_http_client)
+        return jobs
+
     def start(self):
-        """启动调度器（启动三个独立任务）"""
+        """启动调度器（三个任务在同一个调度线程中按刻度执行）"""
         if self.is_running:
             logger.warning("调度器已在运行")
             return
@@ -149,137 +206,90 @@ class AIScheduler:
         except Exception as e:
             print(f"⚠️  初始行情获取失败: {e}")
         
-        # 启动三个独立线程
-        self.market_thread = threading.Thread(
-            target=self._market_update_loop,
-            name="MarketUpdateThread",
-            daemon=True
-        )
-        self.decision_thread = threading.Thread(
-            target=self._ai_decision_loop,
-            name="AIDecisionThread",
-            daemon=True
-        )
-        self.matching_thread = threading.Thread(
-            target=self._order_matching_loop,
-            name="OrderMatchingThread",
-            daemon=True
-        )
-        
-        self.market_thread.start()
-        self.decision_thread.start()
-        self.matching_thread.start()
+        self.job_scheduler = self._create_job_scheduler()
+        self.job_scheduler.start()
         
-        logger.info(f"✅ 行情更新线程已启动（间隔 {self.market_update_interval}秒）")
-        logger.info(f"✅ AI决策线程已启动（间隔 {self.decision_interval}秒 = {self.decision_interval//60}分钟）")
-        logger.info(f"✅ 订单撮合线程已启动（间隔 {self.matching_interval}秒）")
+        logger.info(f"✅ 行情更新任务已启动（间隔 {self.market_update_interval}秒）")
+        logger.info(f"✅ AI决策任务已启动（默认间隔 {self.decision_interval}秒 = {self.decision_interval//60}分钟，各AI错开执行）")
+        logger.info(f"✅ 订单撮合任务已启动（间隔 {self.matching_interval}秒）")
         logger.info("=" * 60)
         
-        print(f"🟢 行情更新线程：每 {self.market_update_interval} 秒更新一次")
-        print(f"🤖 AI决策线程：每 {self.decision_interval//60} 分钟决策一次")
-        print(f"💹 订单撮合线程：每 {self.matching_interval} 秒撮合一次")
+        print(f"🟢 行情更新任务：每 {self.market_update_interval} 秒更新一次")
+        print(f"🤖 AI决策任务：每个AI默认每 {self.decision_interval//60} 分钟决策一次（错开执行）")
+        print(f"💹 订单撮合任务：每 {self.matching_interval} 秒撮合一次")
 
     def stop(self):
-        """停止调度器（停止所有三个任务）"""
+        """停止调度器（立即打断等待，取消进行中的决策）"""
         if not self.is_running:
             return
 
         self.is_running = False
         logger.info("AI调度器正在停止...")
-
-        # 等待所有线程结束
-        threads = [
-            ("行情更新", self.market_thread),
-            ("AI决策", self.decision_thread),
-            ("订单撮合", self.matching_thread)
-        ]
-        
-        for name, thread in threads:
-            if thread and thread.is_alive():
-                thread.join(timeout=5)
-                logger.info(f"{name}线程已停止")
-
+        if self.job_scheduler:
+            self.job_scheduler.stop()
         logger.info("AI调度器已完全停止")
 
     # ==================== 任务1：行情更新（15秒） ====================
     
-    def _market_update_loop(self):
-        """行情更新任务循环（15秒一次，闭市时暂停）"""
-        logger.info("📊 行情更新任务已启动")
-        
-        while self.is_running:
-            try:
-                # 检查是否在交易时间
-                if not self._is_trading_time():
-                    if not hasattr(self, '_market_last_pause_log') or \
-                       time.time() - self._market_last_pause_log > 3600:  # 每小时只记录一次
-                        logger.info(f"📊 行情更新暂停（{self._get_next_trading_time_info()}）")
-                        self._market_last_pause_log = time.time()
-                    time.sleep(60)  # 闭市时每分钟检查一次
-                    continue
-                
-                start_time = time.time()
-                self._update_market_data()
-                elapsed = time.time() - start_time
-                
-                logger.debug(f"行情更新完成，耗时 {elapsed:.2f}秒")
-                
-                # 等待下一个周期
-                time.sleep(max(0, self.market_update_interval - elapsed))
-                
-            except Exception as e:
-                logger.error(f"行情更新任务异常: {e}")
-                time.sleep(5)
-        
-        logger.info("📊 行情更新任务已停止")
-    
     def _update_market_data(self):
-        """更新行情数据（存到缓存）并更新所有AI的资产"""
-        from stock_config import TRADING_STOCKS
-        stock_codes = list(TRADING_STOCKS.keys())
+        """更新行情数据（发布到行情中心）并更新所有AI的资产"""
+        version_before = self.quote_hub.version
+        snapshot = self.quote_hub.refresh()
+        quotes = snapshot.quotes
         
-        quotes = self.data_client.get_realtime_quotes(stock_codes)
-        
-        if quotes:
-            with self.quotes_lock:
-                self.latest_quotes = quotes
+        if quotes and snapshot.version != version_before:
             logger.info(f"✅ 行情更新成功：{len(quotes)} 只股票")
             
             # 更新所有AI的持仓市值和总资产
-            self._update_all_ai_assets(quotes)
+            self._update_all_ai_assets(snapshot.frame)
+            self._check_market_events(snapshot.frame)
         else:
             logger.warning("⚠️  行情更新失败：未获取到数据")
     
-    def _update_all_ai_assets(self, quotes: List):
+    def _check_market_events(self, quotes):
+        """检查行情事件，并分发给持有该股票或有该股票挂单的AI"""
+        if self.event_triggers is None:
+            return
+        try:
+            events = self.event_triggers.check_quotes(quotes, self._now())
+            if not events:
+                return
+            watchers = self._get_stock_watchers()
+            for event in events:
+                ai_ids = watchers.get('*') or watchers.get(event['stock_code'], set())
+                if ai_ids:
+                    self.event_triggers.enqueue(ai_ids, event)
+        except Exception as e:
+            logger.error(f"检查行情事件失败: {e}")
+
+    def _get_stock_watchers(self) -> Dict[str, set]:
+        """{股票代码: 持有该股票或有该股票挂单的激活AI}，配置为通知所有AI时返回 {'*': 所有激活AI}"""
+        with get_db_session() as db:
+            active = {ai_id for (ai_id,) in db.query(AI.id).filter(AI.is_active == True).all()}
+            if settings.event_broadcast:
+                return {'*': active}
+            watchers: Dict[str, set] = {}
+            rows = db.query(Position.stock_code, Position.ai_id).filter(Position.quantity > 0).all()
+            rows += db.query(Order.stock_code, Order.ai_id).filter(Order.status == 'pending').all()
+            for code, ai_id in rows:
+                if ai_id in active:
+                    watchers.setdefault(code, set()).add(ai_id)
+            return watchers
+
+    def _update_all_ai_assets(self, quotes):
         """根据最新行情更新所有AI的持仓市值和总资产
         
         Args:
-            quotes: 最新行情数据列表
+            quotes: 最新行情（QuoteFrame 或行情列表）
         """
         try:
-            # 构建股票代码到价格的映射
-            stock_prices = {}
-            for quote in quotes:
-                stock_prices[quote.code] = quote.price
+            quote_frame = QuoteFrame.ensure(quotes)
             
-            # 更新每个AI的持仓市值
+            # 所有AI的持仓一次性向量化估值
             with get_db_session() as db:
-                ais = db.query(AI).all()
+                updated = PortfolioManager(db, self.trading_rules).revalue_all(quote_frame)
                 
-                for ai in ais:
-                    try:
-                        # 使用portfolio_manager更新市值
-                        if self.portfolio_manager:
-                            # 注意：portfolio_manager的db session可能不同，需要创建新实例
-                            from portfolio.portfolio_manager import PortfolioManager
-                            temp_pm = PortfolioManager(db, self.trading_rules)
-                            temp_pm.update_market_value(ai.id, stock_prices)
-                        
-                    except Exception as e:
-                        logger.error(f"更新AI {ai.id} 资产失败: {e}")
-                        continue
-                
-                logger.debug(f"✅ 已更新 {len(ais)} 个AI的资产数据")
+                logger.debug(f"✅ 已更新 {updated} 个AI的资产数据")
                 
                 # 更新完资产后，立即保存快照
                 self._save_realtime_snapshots(db)
@@ -330,109 +340,325 @@ class AIScheduler:
     
     # ==================== 任务2：AI决策（30分钟） ====================
     
-    def _ai_decision_loop(self):
-        """AI决策任务循环（30分钟一次，闭市时暂停）"""
-        logger.info("🤖 AI决策任务已启动")
+    def _close_decision_loop(self):
+        """关闭手动执行决策周期使用的事件循环及其共享的HTTP连接池"""
+        if self._decision_loop is None or self._decision_loop.is_closed():
+            return
+        try:
+            self._decision_loop.run_until_complete(close_async_http_client())
+        finally:
+            self._decision_loop.close()
+            self._decision_loop = None
+    
+    def _execute_ai_decisions(self):
+        """在当前线程中执行一次决策周期（手动触发和测试使用）"""
+        self._run_on_decision_loop(self._aexecute_ai_decisions())
+
+    async def _adecision_tick(self):
+        """
+        决策刻度：执行决策时间点已到的AI，以及有待处理事件且未超出频率限制的AI
         
-        # 首次启动延迟10秒，等待行情数据准备好
-        time.sleep(10)
+        每个AI的决策作为独立的协程派生出去，刻度本身立即返回：一个AI的LLM调用再慢也只影响它自己
+        （上一次还没结束时跳过它这一次的时间点，事件留到下一次），不会让其他AI的时间点堆积到同一刻度
+        """
+        now = self._now()
+        schedule = self._decision_slots(await asyncio.to_thread(self._get_decision_settings))
+        busy = set(self._decision_tasks)
+        due = self._due_ais(schedule, now)
+        skipped = [ai_id for ai_id in due if ai_id in busy]
+        if skipped:
+            logger.warning(f"⏳ AI {skipped} 上一次决策还未结束，跳过 {now:%H:%M:%S} 的时间点")
+        due = [ai_id for ai_id in due if ai_id not in busy]
+        events: Dict[int, List[Dict]] = {}
+        if self.event_triggers is not None:
+            self.event_triggers.note_decision(due, now)
+            events = self.event_triggers.take_due(now, exclude=due + list(busy))
+            events = {ai_id: items for ai_id, items in events.items() if ai_id in schedule}
+            if events:
+                logger.info(f"⚡ 事件触发 {len(events)} 个AI决策")
         
-        while self.is_running:
-            try:
-                # 检查是否在交易时间
-                if not self._is_trading_time():
-                    if not hasattr(self, '_decision_last_pause_log') or \
-                       time.time() - self._decision_last_pause_log > 3600:
-                        logger.info(f"🤖 AI决策暂停（{self._get_next_trading_time_info()}）")
-                        self._decision_last_pause_log = time.time()
-                    time.sleep(300)  # 闭市时每5分钟检查一次
-                    continue
-                
-                start_time = time.time()
-                self._execute_ai_decisions()
-                elapsed = time.time() - start_time
-                
-                logger.info(f"✅ AI决策周期完成，耗时 {elapsed:.2f}秒")
-                
-                # 等待下一个周期
-                time.sleep(max(0, self.decision_interval - elapsed))
-                
-            except Exception as e:
-                logger.error(f"AI决策任务异常: {e}")
-                import traceback
-                traceback.print_exc()
-                time.sleep(60)  # 出错后等待1分钟
+        tasks = [self._spawn_decision(ai_id, events.get(ai_id)) for ai_id in due + list(events)]
+        if tasks and current_job_scheduler() is None:
+            # 不在调度器中执行（手动触发和测试）时等待本刻度的决策完成
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn_decision(self, ai_id: int, events: Optional[List[Dict]] = None) -> asyncio.Task:
+        """派生单个AI的决策协程，并登记为进行中"""
+        coro = self._aexecute_ai_decisions([ai_id], {ai_id: events} if events else {})
+        jobs = current_job_scheduler()
+        name = f"AI {ai_id} 决策"
+        task = jobs.spawn(coro, name) if jobs is not None else asyncio.get_running_loop().create_task(coro, name=name)
+        self._decision_tasks[ai_id] = task
+        task.add_done_callback(lambda _, ai_id=ai_id: self._decision_tasks.pop(ai_id, None))
+        return task
+
+    def _llm_semaphore(self) -> asyncio.Semaphore:
+        """当前事件循环上所有决策共享的LLM并发限制"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._llm_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._llm_semaphores[loop] = asyncio.Semaphore(self.llm_concurrency)
+        return semaphore
+
+    def _get_decision_settings(self) -> List[Tuple[int, Optional[int], Optional[int]]]:
+        """所有激活的AI的 (id, 决策间隔, 决策相位)"""
+        with get_db_session() as db:
+            return [
+                (ai.id, ai.decision_interval, ai.decision_offset)
+                for ai in db.query(AI).filter(AI.is_active == True).order_by(AI.id).all()
+            ]
+
+    def _decision_slots(
+        self,
+        ais: Sequence[Tuple[int, Optional[int], Optional[int]]]
+    ) -> Dict[int, Tuple[int, int]]:
+        """
+        计算各AI的决策时间表
         
-        logger.info("🤖 AI决策任务已停止")
-    
-    def _execute_ai_decisions(self):
-        """执行所有AI的决策"""
+        - 间隔向上取整为刻度的整数倍，未设置时使用默认间隔
+        - 指定了相位的AI按指定值（对间隔取模后取整到刻度）
+        - 未指定相位的AI按 id 顺序在同一间隔内均匀分布
+        
+        Args:
+            ais: [(AI id, 决策间隔, 决策相位)]
+        
+        Returns:
+            {AI id: (间隔, 相位)}，单位秒
+        """
+        slot = self.decision_slot
+        schedule = {}
+        auto: Dict[int, List[int]] = {}
+        for ai_id, interval, offset in ais:
+            interval = max(slot, math.ceil((interval or self.decision_interval) / slot) * slot)
+            if offset is None:
+                auto.setdefault(interval, []).append(ai_id)
+            else:
+                schedule[ai_id] = (interval, int(offset) % interval // slot * slot)
+        for interval, ai_ids in auto.items():
+            slots = interval // slot
+            for i, ai_id in enumerate(ai_ids):
+                schedule[ai_id] = (interval, i * slots // len(ai_ids) * slot)
+        return schedule
+
+    def _due_ais(self, schedule: Dict[int, Tuple[int, int]], now: datetime) -> List[int]:
+        """
+        决策时间点已到的AI
+        
+        每个AI的决策时间点为 当日零点 + 刻度偏移 + 相位 + k × 间隔；最近一个时间点还没执行过的AI即为到点。
+        第一次出现的AI只有在最近一个时间点就是本刻度时才执行，避免启动时所有AI同时决策。
+        """
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        due = []
+        for ai_id, (interval, offset) in schedule.items():
+            anchor = midnight + timedelta(seconds=self.DECISION_TICK_OFFSET + offset)
+            latest = anchor + timedelta(seconds=math.floor((now - anchor).total_seconds() / interval) * interval)
+            last = self._last_decision_slot.get(ai_id)
+            if last is None:
+                last = latest if (now - latest).total_seconds() >= self.decision_slot else latest - timedelta(seconds=1)
+            if latest > last:
+                due.append(ai_id)
+            self._last_decision_slot[ai_id] = latest
+        return due
+
+    async def _aexecute_ai_decisions(
+        self,
+        ai_ids: Optional[Sequence[int]] = None,
+        events: Optional[Dict[int, List[Dict]]] = None
+    ):
+        """
+        执行AI决策（各AI的LLM调用并发进行，整个周期的耗时取决于最慢的模型）
+        
+        Args:
+            ai_ids: 只执行这些AI，默认所有激活的AI
+            events: 事件触发的AI及其事件 {AI id: [事件]}，会写入该AI的提示词
+        """
+        start_time = time.time()
         logger.info("=" * 60)
         logger.info("🤖 开始AI决策周期")
         logger.info("=" * 60)
         
-        # 获取当前行情（从缓存）
-        with self.quotes_lock:
-            quotes = self.latest_quotes.copy()
+        # 获取当前行情（行情中心快照的列式视图，所有AI共享，可直接当作行情列表使用）
+        quotes = self.quote_hub.get_snapshot().frame
         
         if not quotes:
             logger.warning("⚠️  无行情数据，跳过本次决策")
             return
         
+        # 历史K线每个周期只从本地K线库读取一次，所有AI共享
+        historical_klines = await asyncio.to_thread(self._get_historical_klines)
+        indicators = await asyncio.to_thread(self._get_indicators, quotes)
+        
         # 获取所有激活的AI
-        with get_db_session() as db:
-            active_ais = db.query(AI).filter(AI.is_active == True).all()
-            logger.info(f"📋 找到 {len(active_ais)} 个激活的AI")
-            
-            for ai in active_ais:
-                try:
-                    logger.info(f"🤖 处理 AI: {ai.name}")
-                    self._process_single_ai_decision(ai, quotes, db)
-                except Exception as e:
-                    logger.error(f"❌ AI {ai.name} 决策失败: {e}")
-                    import traceback
-                    traceback.print_exc()
-            
-            # 保存资产快照
-            self._save_portfolio_snapshots_sync(db)
+        active_ais = await asyncio.to_thread(self._get_active_ais)
+        if ai_ids is not None:
+            wanted = set(ai_ids)
+            active_ais = [(ai_id, name) for ai_id, name in active_ais if ai_id in wanted]
+        active_ais = await asyncio.to_thread(self._within_budget, active_ais)
+        logger.info(f"📋 找到 {len(active_ais)} 个激活的AI（并发数 {self.llm_concurrency}）")
         
+        # 所有AI的LLM调用在同一个事件循环中并发进行（流式请求，共享连接池），
+        # 准备和应用结果各使用独立的数据库会话，在线程中执行以免阻塞事件循环
+        await self._adecide_all(active_ais, quotes, historical_klines, indicators, events)
+        
+        # 保存资产快照
+        await asyncio.to_thread(self._save_snapshots_in_session, [ai_id for ai_id, _ in active_ais])
+        
+        logger.info(f"✅ AI决策周期完成，耗时 {time.time() - start_time:.2f}秒")
         logger.info("=" * 60)
+
+    def _get_active_ais(self) -> List[tuple]:
+        """所有激活的AI (id, 名称)"""
+        with get_db_session() as db:
+            return [(ai.id, ai.name) for ai in db.query(AI).filter(AI.is_active == True).all()]
+
+    def _within_budget(self, active_ais: List[tuple]) -> List[tuple]:
+        """去掉当日LLM用量已达预算的AI（预算按当日已记录的决策日志计算，并发中的调用可能略微超出）"""
+        if not active_ais:
+            return active_ais
+        with get_db_session() as db:
+            ais = db.query(AI).filter(AI.id.in_([ai_id for ai_id, _ in active_ais])).all()
+            budgets = {ai.id: daily_budget(ai) for ai in ais}
+            if not any(tokens > 0 or cost > 0 for tokens, cost in budgets.values()):
+                return active_ais
+            spend = daily_spend(db, self._now().date(), list(budgets))
+        allowed = []
+        for ai_id, name in active_ais:
+            reason = budget_exceeded(spend.get(ai_id), *budgets.get(ai_id, (0, 0.0)))
+            if reason:
+                logger.warning(f"💰 AI {name} {reason}，跳过本次决策")
+                continue
+            allowed.append((ai_id, name))
+        return allowed
+
+    def _save_snapshots_in_session(self, ai_ids: Optional[Sequence[int]] = None):
+        with get_db_session() as db:
+            self._save_portfolio_snapshots_sync(db, ai_ids)
     
-    # ==================== 任务3：订单撮合（15秒） ====================
+    def _run_on_decision_loop(self, coro):
+        """在当前线程专用的事件循环中执行协程（事件循环跨周期复用，HTTP连接池随之复用）"""
+        if self._decision_loop is None or self._decision_loop.is_closed():
+            self._decision_loop = asyncio.new_event_loop()
+        return self._decision_loop.run_until_complete(coro)
+    
+    async def _adecide_all(self, active_ais, quotes, historical_klines, indicators, events=None):
+        """并发执行所有AI的决策，同时进行的LLM调用数不超过 llm_concurrency"""
+        semaphore = self._llm_semaphore()
+        deadline = time.monotonic() + self.decision_deadline
+        events = events or {}
+        results = await asyncio.gather(*(
+            self._adecide(ai_id, quotes, historical_klines, indicators, deadline, semaphore, events.get(ai_id))
+            for ai_id, _ in active_ais
+        ), return_exceptions=True)
+        for (_, name), result in zip(active_ais, results):
+            if isinstance(result, BaseException):
+                logger.error(f"❌ AI {name} 决策失败: {result}")
     
-    def _order_matching_loop(self):
-        """订单撮合任务循环（15秒一次，闭市时暂停）"""
-        logger.info("💹 订单撮合任务已启动")
+    async def _adecide(
+        self,
+        ai_id: int,
+        quotes,
+        historical_klines: Optional[Dict[str, List[Dict]]],
+        indicators: Optional[Dict[str, Dict]],
+        deadline: float,
+        semaphore: asyncio.Semaphore,
+        events: Optional[List[Dict]] = None
+    ):
+        """
+        单个AI的完整决策流程：准备 → LLM流式调用 → 应用结果
         
-        # 首次启动延迟5秒
-        time.sleep(5)
+        Args:
+            ai_id: AI ID
+            quotes: 行情（所有AI共享的只读快照）
+            historical_klines: 历史K线
+            indicators: 技术指标
+            deadline: 截止时间（time.monotonic() 读数），超过时取消LLM请求
+            semaphore: 并发限制
+            events: 触发本次决策的事件（按时间表执行时为None）
+        """
+        decision_start = time.time()
+        context = await asyncio.to_thread(
+            self._prepare_in_session, ai_id, quotes, historical_klines, indicators, events
+        )
+        if context is None:
+            return
         
-        while self.is_running:
-            try:
-                # 检查是否在交易时间
-                if not self._is_trading_time():
-                    if not hasattr(self, '_matching_last_pause_log') or \
-                       time.time() - self._matching_last_pause_log > 3600:
-                        logger.info(f"💹 订单撮合暂停（{self._get_next_trading_time_info()}）")
-                        self._matching_last_pause_log = time.time()
-                    time.sleep(60)  # 闭市时每分钟检查一次
-                    continue
-                
-                start_time = time.time()
-                matched_count = self._match_pending_orders()
-                elapsed = time.time() - start_time
-                
-                if matched_count > 0:
-                    logger.info(f"✅ 撮合完成：{matched_count} 个订单，耗时 {elapsed:.2f}秒")
-                
-                # 等待下一个周期
-                time.sleep(max(0, self.matching_interval - elapsed))
-                
-            except Exception as e:
-                logger.error(f"订单撮合任务异常: {e}")
-                time.sleep(5)
+        # 流式解析：actions 中的每个操作一完整就提前下单（同一AI的订单按顺序创建），顶层JSON闭合后停止读取
+        parser = IncrementalDecisionParser(self.decision_parser)
+        placed_orders: List[Dict] = []
+        pending: asyncio.Queue = asyncio.Queue()
         
-        logger.info("💹 订单撮合任务已停止")
+        async def place_orders():
+            while (action := await pending.get()) is not None:
+                placed_orders.extend(await asyncio.to_thread(self._create_orders_in_session, ai_id, [action]))
+        
+        def on_token(delta: str) -> bool:
+            for action in parser.feed(delta):
+                logger.info(f"⚡ {context['ai_name']} 流式解析到操作，提前下单: {action['action']} {action['stock_code']} {action['quantity']}股")
+                pending.put_nowait(action)
+            return parser.done
+        
+        placer = asyncio.create_task(place_orders())
+        try:
+            async with semaphore:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"⏱️ AI {context['ai_name']} 已超过决策截止时间，跳过LLM调用")
+                    llm_response = '{"reasoning": "超过决策截止时间", "actions": []}'
+                else:
+                    llm_response = await self._acall_llm(context, timeout=remaining, on_token=on_token)
+        finally:
+            pending.put_nowait(None)
+            await placer
+        
+        await asyncio.to_thread(
+            self._apply_in_session, ai_id, context, llm_response, decision_start, parser.actions, placed_orders
+        )
+    
+    def _prepare_in_session(self, ai_id: int, quotes, historical_klines, indicators, events=None) -> Optional[Dict]:
+        """在独立的数据库会话中准备决策上下文"""
+        with get_db_session() as db:
+            ai = db.get(AI, ai_id)
+            if ai is None:
+                return None
+            logger.info(f"🤖 处理 AI: {ai.name}")
+            context = self._prepare_ai_decision(ai, quotes, db, historical_klines, indicators, events)
+            db.commit()
+            return context
+    
+    def _apply_in_session(
+        self,
+        ai_id: int,
+        context: Dict,
+        llm_response: str,
+        decision_start: float,
+        streamed_actions: Optional[List[Dict]] = None,
+        placed_orders: Optional[List[Dict]] = None
+    ):
+        """在独立的数据库会话中应用决策结果"""
+        with get_db_session() as db:
+            ai = db.get(AI, ai_id)
+            if ai is not None:
+                self._apply_ai_decision(
+                    ai, db, context, llm_response, decision_start, streamed_actions, placed_orders
+                )
+    
+    def _create_orders_in_session(self, ai_id: int, actions: List[Dict]) -> List[Dict]:
+        """在独立的数据库会话中创建订单（流式解析提前下单），返回订单摘要"""
+        with get_db_session() as db:
+            orders = OrderManager(db, self.trading_rules).create_orders_from_decision(ai_id, actions)
+            return [
+                {"stock_code": o.stock_code, "direction": o.direction, "quantity": o.quantity}
+                for o in orders
+            ]
+    
+    # ==================== 任务3：订单撮合（15秒） ====================
+    
+    def _match_orders_job(self):
+        """订单撮合任务"""
+        start_time = time.time()
+        matched_count = self._match_pending_orders()
+        if matched_count > 0:
+            logger.info(f"✅ 撮合完成：{matched_count} 个订单，耗时 {time.time() - start_time:.2f}秒")
     
     def _match_pending_orders(self) -> int:
         """撮合所有pending状态的订单
@@ -463,7 +689,8 @@ class AIScheduler:
                         db, 
                         self.trading_rules,
                         self.portfolio_manager,
-                        self.data_client
+                        self.data_client,
+                        tick_buffer=self.quote_hub.tick_buffer
                     )
                     
                     success, message = temp_matching_engine.match_order(order)
@@ -471,6 +698,13 @@ class AIScheduler:
                     if success:
                         matched_count += 1
                         logger.info(f"✅ 订单 #{order.id} 撮合成功: {order.direction} {order.quantity} {order.stock_code}")
+                        if self.event_triggers is not None:
+                            self.event_triggers.order_filled(
+                                order.ai_id,
+                                f"订单 #{order.id} 已成交: {order.direction} {order.quantity} {order.stock_code}"
+                                f" @ {order.filled_price or order.price}",
+                                self._now()
+                            )
                     else:
                         logger.debug(f"订单 #{order.id} 暂未撮合: {message}")
                         
@@ -566,138 +800,315 @@ class AIScheduler:
             traceback.print_exc()
             raise e  # 重新抛出异常，让调用方知道失败了
 
-    def _process_single_ai_decision(self, ai: AI, quotes: List, db: Session):
-        """处理单个AI的决策（包含历史K线数据）"""
+    def _get_historical_klines(self) -> Dict[str, List[Dict]]:
+        """获取所有可交易股票的近5日K线（本地K线库增量同步，命中时不访问网络）"""
+        from stock_config import TRADING_STOCKS
+        
+        logger.info(f"📊 获取历史K线数据...")
+        historical_klines = self.kline_store.get_klines_batch(
+            list(TRADING_STOCKS.keys()),
+            interval='d',     # 日线
+            adjust='n',       # 不复权
+            days=5            # 最近5天
+        )
+        logger.info(f"✅ 获取到 {len(historical_klines)} 只股票的历史K线")
+        return historical_klines
+    
+    def _get_indicators(self, quotes) -> Optional[Dict[str, Dict]]:
+        """计算所有股票的技术指标（日线部分每个交易日只计算一次，所有AI共享）"""
+        try:
+            return self.indicator_engine.get_indicators(quotes, self._now().date())
+        except Exception as e:
+            logger.error(f"计算技术指标失败: {e}")
+            return None
+    
+    def _process_single_ai_decision(
+        self,
+        ai: AI,
+        quotes: List,
+        db: Session,
+        historical_klines: Optional[Dict[str, List[Dict]]] = None,
+        indicators: Optional[Dict[str, Dict]] = None
+    ):
+        """处理单个AI的决策（在调用方的数据库会话中顺序执行，包含历史K线数据和技术指标）"""
         decision_start = time.time()
 
         try:
-            # 🔄 刷新AI对象，确保获取最新的现金余额（防止使用旧缓存数据）
-            db.refresh(ai)
-            logger.debug(f"🔄 刷新AI对象: {ai.name}, 当前现金: ¥{ai.current_cash:,.2f}")
-            
-            # [Fix] 在获取持仓前，先执行T+1结算检查
-            # 确保如果过了T+1，持仓状态是"可卖"
-            try:
-                from portfolio.portfolio_manager import PortfolioManager
-                temp_pm = PortfolioManager(db, self.trading_rules)
-                temp_pm.update_available_quantity_daily(ai.id)
-            except Exception as e:
-                logger.error(f"执行T+1结算失败: {e}")
+            context = self._prepare_ai_decision(ai, quotes, db, historical_klines, indicators)
+            llm_response = self._call_llm(context, timeout=self.decision_deadline)
+            self._apply_ai_decision(ai, db, context, llm_response, decision_start)
+        except Exception as e:
+            logger.error(f"❌ 处理AI {ai.name} 决策时发生异常: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            db.rollback()
+    
+    def _prepare_ai_decision(
+        self,
+        ai: AI,
+        quotes: List,
+        db: Session,
+        historical_klines: Optional[Dict[str, List[Dict]]] = None,
+        indicators: Optional[Dict[str, Dict]] = None,
+        events: Optional[List[Dict]] = None
+    ) -> Dict:
+        """
+        决策准备：刷新账户、T+1结算、读取持仓并构建Prompt（事件触发时提示词中包含触发事件）
+        
+        Returns:
+            LLM调用和结果应用需要的上下文（只包含普通数据，不引用数据库对象）
+        """
+        # 🔄 刷新AI对象，确保获取最新的现金余额（防止使用旧缓存数据）
+        db.refresh(ai)
+        logger.debug(f"🔄 刷新AI对象: {ai.name}, 当前现金: ¥{ai.current_cash:,.2f}")
+        
+        # [Fix] 在获取持仓前，先执行T+1结算检查
+        # 确保如果过了T+1，持仓状态是"可卖"
+        try:
+            from portfolio.portfolio_manager import PortfolioManager
+            temp_pm = PortfolioManager(db, self.trading_rules)
+            temp_pm.update_available_quantity_daily(ai.id)
+        except Exception as e:
+            logger.error(f"执行T+1结算失败: {e}")
 
-            # 1. 获取持仓信息
-            from models.models import Position
-            positions = db.query(Position).filter(Position.ai_id == ai.id).all()
-            
-            # 2. 获取所有可交易股票的近5日K线数据
-            logger.info(f"📊 获取历史K线数据...")
-            historical_klines = {}
-            from stock_config import TRADING_STOCKS
-            
-            for stock_code in TRADING_STOCKS.keys():
-                klines = self.data_client.get_historical_klines(
-                    stock_code=stock_code,
-                    interval='d',     # 日线
-                    adjust='n',       # 不复权
-                    days=5            # 最近5天
-                )
-                if klines:
-                    historical_klines[stock_code] = klines
-            
-            logger.info(f"✅ 获取到 {len(historical_klines)} 只股票的历史K线")
-            
-            # 3. 构建用户提示词（包含历史K线）
-            user_prompt = self.prompt_builder.build_user_prompt(
-                ai, quotes, positions, historical_klines
-            )
-            logger.debug(f"📄 用户Prompt长度: {len(user_prompt)} 字符")
+        # 1. 获取持仓信息
+        from models.models import Position
+        positions = db.query(Position).filter(Position.ai_id == ai.id).all()
+        
+        # 2. 获取所有可交易股票的近5日K线数据（未传入时从本地K线库读取）
+        if historical_klines is None:
+            historical_klines = self._get_historical_klines()
+        
+        # 3. 构建用户提示词（包含历史K线）
+        user_prompt = self.prompt_builder.build_user_prompt(
+            ai, quotes, positions, historical_klines, indicators, events, now=self._now()
+        )
+        logger.debug(f"📄 用户Prompt长度: {len(user_prompt)} 字符")
 
-            # 4. 构建完整Prompt (现在System Prompt也会在内部自动构建)
-            full_prompt = self.prompt_builder.build_full_prompt(user_prompt=user_prompt)
-            prompt_text = f"System: {full_prompt['system']}\n\nUser: {full_prompt['user']}"
-            
-            # 6. 转换为messages格式
-            messages = [
+        # 4. 构建完整Prompt (现在System Prompt也会在内部自动构建)
+        full_prompt = self.prompt_builder.build_full_prompt(user_prompt=user_prompt)
+        
+        # 计算当前收益信息
+        total_profit_snapshot = ai.total_assets - ai.initial_cash
+        profit_rate_snapshot = (total_profit_snapshot / ai.initial_cash * 100) if ai.initial_cash > 0 else 0.0
+        
+        return {
+            "ai_id": ai.id,
+            "ai_name": ai.name,
+            "temperature": ai.temperature,
+            # 5. 转换为messages格式
+            "messages": [
                 {"role": "system", "content": full_prompt['system']},
                 {"role": "user", "content": full_prompt['user']}
-            ]
-
-            # 7. 调用LLM
-            logger.info(f"🧠 调用LLM进行决策...")
-            try:
-                adapter = self._get_adapter(ai.name)
-                if adapter:
-                    llm_result = adapter.call_api(messages, temperature=ai.temperature)
-                    llm_response = llm_result.get('response') or ''
-                    logger.info(f"📤 LLM响应长度: {len(llm_response)} 字符")
-                else:
-                    logger.warning("❌ 适配器创建失败")
-                    llm_response = '{"reasoning": "适配器创建失败", "actions": []}'
-            except Exception as e:
-                logger.error(f"❌ LLM调用失败: {str(e)}")
-                llm_response = '{"reasoning": "LLM调用失败", "actions": []}'
-
-            # 8. 解析决策
-            logger.info(f"🔍 解析LLM响应...")
-            logger.info(f"📄 LLM实际响应内容：{llm_response}")
-            decision = self.decision_parser.parse(llm_response)
-            
-            if decision.get('success'):
-                actions = decision.get('actions', [])
-                logger.info(f"🎯 解析成功: {len(actions)} 个动作")
-            else:
-                logger.error(f"❌ 解析失败: {decision.get('error')}")
-                actions = []
-
-            # 9. 生成订单
-            logger.info(f"📋 生成交易订单...")
-            try:
-                orders = self.order_manager.create_orders_from_decision(ai.id, actions)
-                logger.info(f"✅ 生成 {len(orders)} 个订单")
-            except Exception as e:
-                logger.error(f"❌ 订单生成失败: {str(e)}")
-                orders = []
+            ],
+            "prompt_text": f"System: {full_prompt['system']}\n\nUser: {full_prompt['user']}",
+            "market_data": {
+                "quotes_count": len(quotes),
+                "historical_klines": len(historical_klines or {}),
+                "trigger_events": [event['message'] for event in events or []],
+            },
+            "portfolio_data": {
+                "ai_id": ai.id,
+                "positions_count": len(positions),
+                # 保存账户快照，用于调试
+                "cash": ai.current_cash,
+                "total_assets": ai.total_assets,
+                "total_profit": total_profit_snapshot,
+                "profit_rate": profit_rate_snapshot
+            },
+        }
+    
+    def _call_llm(self, context: Dict, timeout: float) -> str:
+        """
+        调用LLM（不访问数据库，可在多个线程中并发执行）
+        
+        Returns:
+            LLM响应文本（失败时返回空动作的JSON）
+        """
+        logger.info(f"🧠 {context['ai_name']} 调用LLM进行决策...")
+        try:
+            adapter = self._get_adapter(context['ai_name'])
+            if adapter:
+                llm_result = adapter.call_api(
+                    context['messages'], temperature=context['temperature'], timeout=max(1, int(timeout))
+                )
+                self._record_llm_usage(context, adapter, llm_result)
+                llm_response = llm_result.get('response') or ''
+                logger.info(f"📤 {context['ai_name']} LLM响应长度: {len(llm_response)} 字符")
+                return llm_response
+            logger.warning("❌ 适配器创建失败")
+            return '{"reasoning": "适配器创建失败", "actions": []}'
+        except Exception as e:
+            logger.error(f"❌ LLM调用失败: {str(e)}")
+            return '{"reasoning": "LLM调用失败", "actions": []}'
+    
+    async def _acall_llm(self, context: Dict, timeout: float, on_token=None) -> str:
+        """
+        异步流式调用LLM（超过 timeout 时取消请求）
+        
+        Args:
+            context: 决策上下文
+            timeout: 超时时间（秒）
+            on_token: 流式回调，返回 True 时提前结束读取
+        
+        Returns:
+            LLM响应文本。失败时错误记入 context['llm_error']，已收到部分内容（超时或中断）时返回部分内容，
+            否则返回空动作的JSON
+        """
+        logger.info(f"🧠 {context['ai_name']} 调用LLM进行决策...")
+        try:
+            adapter = self._get_adapter(context['ai_name'])
+            if not adapter:
+                logger.warning("❌ 适配器创建失败")
+                return '{"reasoning": "适配器创建失败", "actions": []}'
+            llm_result = await adapter.acall_api(
+                context['messages'], temperature=context['temperature'], timeout=timeout, on_token=on_token
+            )
+            self._record_llm_usage(context, adapter, llm_result)
+            if not llm_result.get('success'):
+                if not llm_result.get('response'):
+                    raise RuntimeError(llm_result.get('error'))
+                # 流式阶段可能已经按部分内容下单，保留部分内容，决策日志与实际订单一致
+                context['llm_error'] = llm_result.get('error')
+                logger.error(
+                    f"❌ {context['ai_name']} LLM调用未完成: {llm_result.get('error')}，"
+                    f"保留已收到的 {len(llm_result['response'])} 字符"
+                )
+                return llm_result['response']
+            llm_response = llm_result.get('response') or ''
+            logger.info(
+                f"📤 {context['ai_name']} LLM响应长度: {len(llm_response)} 字符，"
+                f"首token {llm_result.get('ttft_ms')}ms，总耗时 {llm_result.get('latency_ms')}ms"
+            )
+            return llm_response
+        except Exception as e:
+            context['llm_error'] = str(e)
+            logger.error(f"❌ {context['ai_name']} LLM调用失败: {str(e)}")
+            return '{"reasoning": "LLM调用失败", "actions": []}'
+    
+    # 已提示过不返回 usage 的模型（每个模型只警告一次）
+    _usage_estimate_warned: set = set()
 
-            # 10. 保存决策日志（增强：保存账户快照）
-            import json
-            
-            # 计算当前收益信息
-            total_profit_snapshot = ai.total_assets - ai.initial_cash
-            profit_rate_snapshot = (total_profit_snapshot / ai.initial_cash * 100) if ai.initial_cash > 0 else 0.0
-            
-            decision_log = DecisionLog(
-                ai_id=ai.id,
-                market_data={"quotes_count": len(quotes), "historical_klines": len(historical_klines)},
-                portfolio_data={
-                    "ai_id": ai.id, 
-                    "positions_count": len(positions),
-                    # 新增：保存账户快照，用于调试
-                    "cash": ai.current_cash,
-                    "total_assets": ai.total_assets,
-                    "total_profit": total_profit_snapshot,
-                    "profit_rate": profit_rate_snapshot
-                },
-                llm_prompt=prompt_text[:2000],  # 保存前2000字符
-                llm_response=llm_response,
-                parsed_decision=json.dumps(decision, ensure_ascii=False),
-                orders_generated=json.dumps([{
-                    "stock_code": o.stock_code, 
-                    "direction": o.direction, 
-                    "quantity": o.quantity
-                } for o in orders], ensure_ascii=False),
-                execution_result={"orders_created": len(orders)},
-                latency_ms=int((time.time() - decision_start) * 1000),
-                tokens_used=len(prompt_text.split()) + len(llm_response.split()),
+    @classmethod
+    def _record_llm_usage(cls, context: Dict, adapter, llm_result: Dict):
+        """
+        把服务商返回的token用量和估算费用记入决策上下文（context['llm_usage']）
+        
+        响应缓存命中时没有请求上游，不记用量；服务商没有返回用量时（不支持 stream_options、
+        超时返回部分内容等）按字符数估算，保证每日预算仍然生效，并在执行结果中标记为估算值
+        """
+        if llm_result.get('cached'):
+            context['llm_cached'] = True
+            return
+        usage = normalize_usage(llm_result.get('usage'))
+        if usage is None and llm_result.get('tokens_used') is not None:
+            usage = {'prompt_tokens': None, 'completion_tokens': None, 'cached_tokens': None,
+                     'total_tokens': llm_result['tokens_used']}
+        if usage is None and (llm_result.get('success') or llm_result.get('response')):
+            model_name = getattr(adapter, 'model_name', None)
+            if model_name not in cls._usage_estimate_warned:
+                cls._usage_estimate_warned.add(model_name)
+                logger.warning(f"⚠️  {model_name} 未返回token用量，按字符数估算（预算控制使用估算值）")
+            usage = estimate_usage(context['messages'], llm_result.get('response'))
+            context['llm_usage_estimated'] = True
+        if usage is not None:
+            usage['cost'] = estimate_cost(getattr(adapter, 'model_name', None), usage)
+            logger.info(
+                f"🧾 {context['ai_name']} token用量: 提示 {usage['prompt_tokens']}（缓存命中 {usage['cached_tokens']}），"
+                f"输出 {usage['completion_tokens']}，费用 {usage['cost']}"
             )
-            db.add(decision_log)
-            db.commit()
+        context['llm_usage'] = usage
+    
+    def _apply_ai_decision(
+        self,
+        ai: AI,
+        db: Session,
+        context: Dict,
+        llm_response: str,
+        decision_start: float,
+        streamed_actions: Optional[List[Dict]] = None,
+        placed_orders: Optional[List[Dict]] = None
+    ):
+        """
+        应用决策结果：解析响应、生成订单、保存决策日志
+        
+        Args:
+            streamed_actions: 流式解析阶段已经下单的操作（不再重复下单）
+            placed_orders: 流式解析阶段已创建的订单摘要
+        """
+        # 6. 解析决策
+        logger.info(f"🔍 解析LLM响应...")
+        logger.info(f"📄 LLM实际响应内容：{llm_response}")
+        decision = self.decision_parser.parse(llm_response)
+        
+        if decision.get('success'):
+            actions = decision.get('actions', [])
+            logger.info(f"🎯 解析成功: {len(actions)} 个动作")
+        elif streamed_actions:
+            # 响应不完整（超时或中断），以流式阶段已解析并下单的操作为准
+            logger.error(f"❌ 解析失败: {decision.get('error')}，记录流式阶段已解析的 {len(streamed_actions)} 个操作")
+            decision = {**decision, "actions": list(streamed_actions), "partial": True}
+            actions = list(streamed_actions)
+        else:
+            logger.error(f"❌ 解析失败: {decision.get('error')}")
+            actions = []
+
+        # 7. 生成订单（使用当前会话，不与其他AI共享；流式阶段已下单的操作跳过）
+        placed_orders = list(placed_orders or [])
+        if streamed_actions:
+            # 按操作内容去掉已下单的（完整解析选中的对象、顺序不一定与流式阶段相同，相同的操作按次数抵消）
+            remaining = list(streamed_actions)
+            pending = []
+            for action in actions:
+                if action in remaining:
+                    remaining.remove(action)
+                else:
+                    pending.append(action)
+            actions = pending
+        logger.info(f"📋 生成交易订单...")
+        try:
+            orders = OrderManager(db, self.trading_rules).create_orders_from_decision(ai.id, actions)
+            logger.info(f"✅ 生成 {len(orders)} 个订单（流式提前下单 {len(placed_orders)} 个）")
+        except Exception as e:
+            logger.error(f"❌ 订单生成失败: {str(e)}")
+            orders = []
 
-            logger.info(f"✅ AI {ai.name} 决策处理完成")
+        # 8. 保存决策日志（增强：保存账户快照）
+        import json
+        prompt_text = context['prompt_text']
+        
+        usage = context.get('llm_usage') or {}
+        execution_result = {"orders_created": len(placed_orders) + len(orders), "streamed_orders": len(placed_orders)}
+        if context.get('llm_cached'):
+            execution_result["llm_cached"] = True  # 响应来自LLM响应缓存，不计用量
+        if context.get('llm_usage_estimated'):
+            execution_result["usage_estimated"] = True  # 服务商未返回用量，token数和费用为估算值
+        decision_log = DecisionLog(
+            ai_id=ai.id,
+            timestamp=self._now(),
+            market_data=context['market_data'],
+            portfolio_data=context['portfolio_data'],
+            llm_prompt=prompt_text[:2000],  # 保存前2000字符
+            llm_response=llm_response,
+            parsed_decision=json.dumps(decision, ensure_ascii=False),
+            orders_generated=json.dumps(placed_orders + [{
+                "stock_code": o.stock_code, 
+                "direction": o.direction, 
+                "quantity": o.quantity
+            } for o in orders], ensure_ascii=False),
+            execution_result=execution_result,
+            latency_ms=int((time.time() - decision_start) * 1000),
+            tokens_used=usage.get('total_tokens'),
+            prompt_tokens=usage.get('prompt_tokens'),
+            completion_tokens=usage.get('completion_tokens'),
+            cached_tokens=usage.get('cached_tokens'),
+            cost=usage.get('cost'),
+            error=context.get('llm_error'),
+        )
+        db.add(decision_log)
+        db.commit()
 
-        except Exception as e:
-            logger.error(f"❌ 处理AI {ai.name} 决策时发生异常: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            db.rollback()
+        logger.info(f"✅ AI {ai.name} 决策处理完成")
     
     # ==================== 保留旧版本的方法（兼容性） ====================
     
@@ -706,12 +1117,15 @@ class AIScheduler:
         # 直接调用新版方法
         self._process_single_ai_decision(ai, quotes, db)
 
-    def _save_portfolio_snapshots_sync(self, db: Session):
-        """同步版本的组合快照保存"""
+    def _save_portfolio_snapshots_sync(self, db: Session, ai_ids: Optional[Sequence[int]] = None):
+        """同步版本的组合快照保存（ai_ids 为空时保存所有AI）"""
         print("📊 保存组合快照...")
         try:
             from models.models import PortfolioSnapshot, Position
-            ais = db.query(AI).all()
+            query = db.query(AI)
+            if ai_ids is not None:
+                query = query.filter(AI.id.in_(list(ai_ids)))
+            ais = query.all()
 
             for ai in ais:
                 try:
@@ -924,6 +1338,8 @@ class AIScheduler:
             return self.adapters_cache[cache_key]
 
         adapter = LLMAdapterFactory.create_adapter(ai_name)
+        if adapter and self.llm_cache is not None:
+            adapter = CachedLLMAdapter(adapter, self.llm_cache)
         if adapter:
             self.adapters_cache[cache_key] = adapter
 
@@ -955,12 +1371,7 @@ class AIScheduler:
 
     def _serialize_quotes(self, quotes: List) -> str:
         """序列化行情数据"""
-        return str([{
-            "code": q.code,
-            "name": q.name,
-            "price": q.price,
-            "change_percent": q.change_percent
-        } for q in quotes])
+        return str(QuoteFrame.ensure(quotes).to_dicts(("code", "name", "price", "change_percent")))
 
     def _serialize_positions(self, positions: List) -> str:
         """序列化持仓数据"""
@@ -987,7 +1398,11 @@ class AIScheduler:
         return {
             "is_running": self.is_running,
             "cached_adapters": len(self.adapters_cache),
-            "active_adapters": list(self.adapters_cache.keys())
+            "active_adapters": list(self.adapters_cache.keys()),
+            "jobs": self.job_scheduler.metrics() if self.job_scheduler else [],
+            "decisions_in_flight": sorted(self._decision_tasks),
+            "event_triggers": self.event_triggers.metrics() if self.event_triggers else None,
+            "llm_cache": self.llm_cache.metrics() if self.llm_cache else None
         }
 
     def _broadcast_decision_update(self, ai: AI, decision_log: DecisionLog):
@@ -103,12 +103,24 @@ class DecisionParser:
         # 移除首尾空白
         response = response.strip()
         
-        # 尝试提取第一个完整的JSON对象（如果有多余文本）
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            response = json_match.group(0)
+        # 提取第一个完整的决策对象（前后有多余文本时，按JSON语法找到对象的结束位置，而不是贪婪匹配最后一个右括号）；
+        # 没有 reasoning/actions 键的对象（如前言中的 {"风险": "中"}）跳过，与 IncrementalDecisionParser 选择同一个对象
+        decoder = json.JSONDecoder()
+        first = None
+        start = response.find('{')
+        while start != -1:
+            try:
+                obj, end = decoder.raw_decode(response, start)
+            except json.JSONDecodeError:
+                start = response.find('{', start + 1)
+                continue
+            if isinstance(obj, dict) and ("reasoning" in obj or "actions" in obj):
+                return response[start:end]
+            if first is None:
+                first = response[start:end]
+            start = response.find('{', start + 1)
         
-        return response
+        return first if first is not None else response
     
     def _validate_decision(self, decision: Dict):
         """
@@ -178,23 +190,24 @@ class DecisionParser:
             reasoning = reasoning[:200] + "..."
         
         # 规范化actions
-        normalized_actions = []
-        for action in decision["actions"]:
-            normalized_action = {
-                "action": action["action"].lower(),
-                "stock_code": action["stock_code"],
-                "quantity": int(action["quantity"]),
-                "price_type": action.get("price_type", "market").lower(),
-                "price": action.get("price"),
-                "reason": action.get("reason", "").strip()
-            }
-            normalized_actions.append(normalized_action)
+        normalized_actions = [self._normalize_action(action) for action in decision["actions"]]
         
         return {
             "reasoning": reasoning,
             "actions": normalized_actions
         }
     
+    def _normalize_action(self, action: Dict) -> Dict:
+        """规范化单个操作"""
+        return {
+            "action": action["action"].lower(),
+            "stock_code": action["stock_code"],
+            "quantity": int(action["quantity"]),
+            "price_type": (action.get("price_type") or "market").lower(),
+            "price": action.get("price"),
+            "reason": (action.get("reason") or "").strip()
+        }
+    
     def get_action_summary(self, actions: List[Dict]) -> str:
         """
         获取操作摘要（用于日志）
@@ -214,3 +227,139 @@ class DecisionParser:
         
         return ", ".join(summary_parts)
 
+
+class IncrementalDecisionParser:
+    """流式决策解析器
+
+    逐段接收LLM输出，按JSON语法跟踪嵌套层级：
+    - actions 数组中的每个元素一闭合就校验并返回，调用方可以在模型写完 reasoning 之前下单
+    - 顶层对象闭合后 done 为 True，调用方可以提前结束流式读取
+    - 对象之前的 markdown 标记等多余文本会被跳过；闭合的对象没有 reasoning/actions 键时
+      （如前言中的"根据{持仓}"）不算决策，从它的下一个字符重新查找
+    """
+
+    def __init__(self, parser: Optional[DecisionParser] = None):
+        """
+        Args:
+            parser: 用于校验和规范化的 DecisionParser
+        """
+        self.parser = parser or DecisionParser()
+        self.buffer = ""
+        self.done = False
+        self.actions: List[Dict] = []   # 已返回的合法操作
+        self.rejected: List[str] = []   # 不合法的操作及原因
+
+        self._pos = 0              # 已扫描到的位置
+        self._end = -1             # 顶层对象的结束位置
+        self._reset_object()
+
+    def _reset_object(self):
+        """清空顶层对象的扫描状态（重新查找决策对象时使用）"""
+        self._start = -1           # 顶层对象的起始位置
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string: Optional[str] = None  # 顶层最近一个字符串（用于识别键名）
+        self._key: Optional[str] = None          # 顶层当前键名
+        self._is_decision = False                # 顶层对象是否出现过 reasoning/actions 键
+        self._in_actions = False
+        self._element_start = -1
+
+    def feed(self, text: str) -> List[Dict]:
+        """
+        接收一段输出
+
+        Args:
+            text: 增量文本
+
+        Returns:
+            本次新完成的合法操作（规范化后的格式，与 DecisionParser.parse 的 actions 元素相同）
+        """
+        if self.done or not text:
+            return []
+        self.buffer += text
+        completed = []
+
+        buffer = self.buffer
+        i = self._pos - 1
+        while i + 1 < len(buffer):
+            i += 1
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = buffer[self._string_start + 1:i]
+                continue
+
+            if self._start == -1:
+                if ch == '{':
+                    self._start = i
+                    self._depth = 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ':' and self._depth == 1:
+                self._key = self._last_string
+                if self._key in ('reasoning', 'actions'):
+                    self._is_decision = True
+            elif ch in '{[':
+                if self._depth == 1 and ch == '[' and self._key == 'actions':
+                    self._in_actions = True
+                elif self._depth == 2 and self._in_actions and ch == '{':
+                    self._element_start = i
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 2 and self._in_actions and ch == '}' and self._element_start != -1:
+                    action = self._accept(buffer[self._element_start:i + 1])
+                    if action is not None:
+                        completed.append(action)
+                    self._element_start = -1
+                elif self._depth == 1 and self._in_actions:
+                    self._in_actions = False
+                elif self._depth == 0:
+                    if not self._is_decision:
+                        # 不是决策对象：从它的下一个字符重新查找
+                        i = self._start
+                        self._reset_object()
+                        continue
+                    self._end = i + 1
+                    self.done = True
+                    self._pos = i + 1
+                    return completed
+
+        self._pos = len(buffer)
+        return completed
+
+    def _accept(self, text: str) -> Optional[Dict]:
+        """校验一个完整的操作元素"""
+        try:
+            action = json.loads(text)
+            self.parser._validate_action(action)
+            action = self.parser._normalize_action(action)
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            # 异常不能抛出：on_token 回调中的异常会中断整个流式请求
+            self.rejected.append(f"{text[:100]}: {e}")
+            logger.warning(f"IncrementalDecisionParser: 忽略不合法的操作 {text[:100]} ({e})")
+            return None
+        self.actions.append(action)
+        return action
+
+    @property
+    def text(self) -> str:
+        """顶层对象的完整文本（未闭合时为目前收到的全部内容）"""
+        if self._start == -1:
+            return self.buffer
+        return self.buffer[self._start:self._end if self._end != -1 else len(self.buffer)]
+
+    def result(self) -> Dict:
+        """按完整文本解析最终决策（格式与 DecisionParser.parse 相同）"""
+        return self.parser.parse(self.text)
@@ -0,0 +1,216 @@
+"""
+行情事件触发
+在固定的决策时间表之外，根据行情和成交事件为相关的AI追加一次决策：
+短时间内大幅涨跌、接近涨跌停、挂单成交。事件按 股票/类型 去抖，触发的决策按AI限频
+"""
+
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from data_service.quote_frame import QuoteFrame
+
+logger = logging.getLogger(__name__)
+
+EVENT_PRICE_UP = 'price_up'
+EVENT_PRICE_DOWN = 'price_down'
+EVENT_NEAR_LIMIT_UP = 'near_limit_up'
+EVENT_NEAR_LIMIT_DOWN = 'near_limit_down'
+EVENT_ORDER_FILLED = 'order_filled'
+
+
+class EventTriggers:
+    """行情事件触发器（线程安全）
+
+    - check_quotes() 在每轮行情更新后调用，条件由不满足变为满足时产生一次股票事件；
+      同一股票同一类型的事件在 debounce_seconds 内只产生一次
+    - 调度器把股票事件分发给持有该股票或有该股票挂单的AI（enqueue），成交事件直接分发给下单的AI
+    - take_due() 在决策刻度调用，取出可以执行事件决策的AI及其事件：
+      距该AI上一次决策不足 min_gap_seconds，或最近一小时的事件决策已达 max_per_hour 次时继续等待，
+      等待期间的事件合并到下一次决策
+    - 按时间表执行的决策通过 note_decision() 登记，已排队的事件随之清空
+    """
+
+    def __init__(
+        self,
+        tick_source=None,
+        price_move_pct: float = 3.0,
+        price_move_minutes: float = 5,
+        limit_proximity_pct: float = 1.0,
+        debounce_seconds: float = 600,
+        min_gap_seconds: float = 300,
+        max_per_hour: int = 3,
+        limit_normal: float = 0.10,
+        limit_st: float = 0.05
+    ):
+        """
+        Args:
+            tick_source: 提供 change_pct(stock_codes, minutes) 的分笔来源（TickBuffer），为None时不检查短时涨跌
+            price_move_pct: 短时涨跌幅阈值（%）
+            price_move_minutes: 短时涨跌的统计窗口（分钟）
+            limit_proximity_pct: 距涨跌停价的距离阈值（%，相对涨跌停价）
+            debounce_seconds: 同一股票同一类型事件的去抖时间（秒）
+            min_gap_seconds: 同一AI两次决策之间的最小间隔（秒）
+            max_per_hour: 每个AI每小时最多的事件决策次数
+            limit_normal: 普通股票涨跌停幅度
+            limit_st: ST股票涨跌停幅度
+        """
+        self.tick_source = tick_source
+        self.price_move_pct = price_move_pct
+        self.price_move_minutes = price_move_minutes
+        self.limit_proximity_pct = limit_proximity_pct
+        self.debounce_seconds = debounce_seconds
+        self.min_gap_seconds = min_gap_seconds
+        self.max_per_hour = max_per_hour
+        self.limit_normal = limit_normal
+        self.limit_st = limit_st
+
+        self._lock = threading.Lock()
+        self._active: Set[Tuple[str, str]] = set()            # 当前满足条件的 (股票, 类型)
+        self._fired_at: Dict[Tuple[str, str], float] = {}     # (股票, 类型) 最近一次产生事件的时间
+        self._pending: Dict[int, List[Dict[str, Any]]] = {}   # AI -> 排队中的事件
+        self._last_decision: Dict[int, float] = {}            # AI -> 最近一次决策的时间
+        self._triggered: Dict[int, Deque[float]] = {}         # AI -> 最近一小时事件决策的时间
+        self.stats = {'events': 0, 'debounced': 0, 'decisions': 0, 'rate_limited': 0}
+
+    # ==================== 事件检测 ====================
+
+    def check_quotes(self, quotes, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        检查一轮行情，返回新产生的股票事件
+
+        Args:
+            quotes: QuoteFrame 或行情列表
+            now: 当前时间（事件时间和去抖使用），默认为系统时间
+
+        Returns:
+            [{'kind', 'stock_code', 'message', 'at'}]
+        """
+        frame = QuoteFrame.ensure(quotes)
+        if not len(frame):
+            return []
+        now = now or datetime.now()
+        conditions = self._conditions(frame)
+
+        events = []
+        with self._lock:
+            current = {(code, kind) for code, kind, _ in conditions}
+            self._active &= current  # 条件不再满足的重新布防
+            for code, kind, message in conditions:
+                key = (code, kind)
+                if key in self._active:
+                    continue
+                self._active.add(key)
+                fired_at = self._fired_at.get(key)
+                if fired_at is not None and now.timestamp() - fired_at < self.debounce_seconds:
+                    self.stats['debounced'] += 1
+                    continue
+                self._fired_at[key] = now.timestamp()
+                self.stats['events'] += 1
+                events.append({'kind': kind, 'stock_code': code, 'message': message, 'at': now.isoformat()})
+        for event in events:
+            logger.info(f"⚡ 行情事件: {event['message']}")
+        return events
+
+    def _conditions(self, frame: QuoteFrame) -> List[Tuple[str, str, str]]:
+        """当前满足条件的 (股票, 类型, 说明)"""
+        conditions = []
+        prices = frame.column('price')
+        names = [quote.name or code for quote, code in zip(frame.quotes, frame.codes)]
+
+        if self.tick_source is not None and self.price_move_pct > 0:
+            changes = self.tick_source.change_pct(frame.codes, self.price_move_minutes)
+            for code, name in zip(frame.codes, names):
+                change = changes.get(code)
+                if change is not None and abs(change) >= self.price_move_pct:
+                    direction = '上涨' if change > 0 else '下跌'
+                    conditions.append((
+                        code, EVENT_PRICE_UP if change > 0 else EVENT_PRICE_DOWN,
+                        f"{name}({code}) {self.price_move_minutes:g}分钟内{direction} {abs(change):.2f}%"
+                    ))
+
+        if self.limit_proximity_pct > 0:
+            upper, lower = frame.limit_prices(self.limit_normal, self.limit_st)
+            ratio = self.limit_proximity_pct / 100
+            with np.errstate(invalid='ignore'):
+                near_up = (prices > 0) & (upper > 0) & (prices >= upper * (1 - ratio))
+                near_down = (prices > 0) & (lower > 0) & (prices <= lower * (1 + ratio))
+            for i in np.flatnonzero(near_up):
+                conditions.append((
+                    frame.codes[i], EVENT_NEAR_LIMIT_UP,
+                    f"{names[i]}({frame.codes[i]}) 接近涨停（现价 {prices[i]:.2f}，涨停价 {upper[i]:.2f}）"
+                ))
+            for i in np.flatnonzero(near_down):
+                conditions.append((
+                    frame.codes[i], EVENT_NEAR_LIMIT_DOWN,
+                    f"{names[i]}({frame.codes[i]}) 接近跌停（现价 {prices[i]:.2f}，跌停价 {lower[i]:.2f}）"
+                ))
+        return conditions
+
+    def order_filled(self, ai_id: int, message: str, now: Optional[datetime] = None):
+        """挂单成交：为下单的AI排队一个成交事件"""
+        now = now or datetime.now()
+        self.enqueue([ai_id], {'kind': EVENT_ORDER_FILLED, 'stock_code': None, 'message': message, 'at': now.isoformat()})
+
+    # ==================== 分发与限频 ====================
+
+    def enqueue(self, ai_ids: Iterable[int], event: Dict[str, Any]):
+        """为这些AI排队一个事件"""
+        with self._lock:
+            for ai_id in ai_ids:
+                self._pending.setdefault(ai_id, []).append(event)
+
+    def take_due(self, now: Optional[datetime] = None, exclude: Iterable[int] = ()) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        取出可以执行事件决策的AI
+
+        Args:
+            now: 当前时间
+            exclude: 本刻度已按时间表决策的AI（其事件由 note_decision 清空，不在这里返回）
+
+        Returns:
+            {AI id: [事件]}
+        """
+        ts = (now or datetime.now()).timestamp()
+        excluded = set(exclude)
+        due = {}
+        with self._lock:
+            for ai_id in list(self._pending):
+                events = self._pending[ai_id]
+                if not events or ai_id in excluded:
+                    continue
+                last = self._last_decision.get(ai_id)
+                if last is not None and ts - last < self.min_gap_seconds:
+                    continue
+                history = self._triggered.setdefault(ai_id, deque())
+                while history and ts - history[0] >= 3600:
+                    history.popleft()
+                if len(history) >= self.max_per_hour:
+                    self.stats['rate_limited'] += 1
+                    continue
+                history.append(ts)
+                self._last_decision[ai_id] = ts
+                due[ai_id] = self._pending.pop(ai_id)
+                self.stats['decisions'] += 1
+        return due
+
+    def note_decision(self, ai_ids: Iterable[int], now: Optional[datetime] = None):
+        """登记按时间表执行的决策：刷新最近决策时间并清空排队的事件"""
+        ts = (now or datetime.now()).timestamp()
+        with self._lock:
+            for ai_id in ai_ids:
+                self._last_decision[ai_id] = ts
+                self._pending.pop(ai_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """事件统计"""
+        with self._lock:
+            return {
+                **self.stats,
+                'active_conditions': len(self._active),
+                'pending': {ai_id: len(events) for ai_id, events in self._pending.items() if events},
+            }
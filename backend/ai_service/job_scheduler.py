@@ -0,0 +1,342 @@
+"""
+定时任务调度器
+所有定时任务在同一个事件循环中按墙钟对齐的刻度触发（例如15秒任务在每分钟的 :00/:15/:30/:45 触发），
+下一次触发时间只由刻度决定，不随任务耗时漂移；闭市期间直接等待到下一次开盘，stop() 立即唤醒
+"""
+
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 当前事件循环所属的调度器（任务及其派生的协程中可用）
+_current_scheduler: contextvars.ContextVar[Optional["JobScheduler"]] = contextvars.ContextVar(
+    "current_job_scheduler", default=None
+)
+
+
+def current_job_scheduler() -> Optional["JobScheduler"]:
+    """正在执行当前任务的调度器，不在调度器中执行时返回None"""
+    return _current_scheduler.get()
+
+
+class Job:
+    """一个定时任务及其运行统计"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        interval: float,
+        offset: float = 0.0,
+        first_delay: Optional[float] = None,
+        trading_hours: bool = True
+    ):
+        """
+        Args:
+            name: 任务名称
+            func: 任务函数（协程函数直接在事件循环中执行，普通函数在线程池中执行）
+            interval: 触发间隔（秒）
+            offset: 刻度相对整点的偏移（秒），刻度为 当日零点 + offset + k × interval
+            first_delay: 启动后先在 first_delay 秒时执行一次，之后再按刻度触发（默认直接按刻度）
+            trading_hours: 是否只在交易时段内触发
+        """
+        if interval <= 0:
+            raise ValueError(f"任务 {name} 的触发间隔必须大于0: {interval}")
+        self.name = name
+        self.func = func
+        self.interval = float(interval)
+        self.offset = float(offset) % self.interval
+        self.first_delay = first_delay
+        self.trading_hours = trading_hours
+        self.is_coroutine = asyncio.iscoroutinefunction(func)
+
+        self.next_run: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0      # 上一次还没结束而跳过的刻度
+        self.missed = 0       # 调度落后（例如系统休眠）而错过的刻度
+        self.last_run_at: Optional[datetime] = None
+        self.last_lag_ms: Optional[float] = None
+        self.max_lag_ms = 0.0
+        self.last_runtime_ms: Optional[float] = None
+        self.max_runtime_ms = 0.0
+        self.total_runtime_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def align(self, moment: datetime, strict: bool = False) -> datetime:
+        """moment 及之后（strict 时为之后，不含 moment）的第一个刻度"""
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        elapsed = (moment - midnight).total_seconds() - self.offset
+        ratio = round(elapsed / self.interval, 9)
+        ticks = max(0, math.floor(ratio) + 1 if strict else math.ceil(ratio))
+        return midnight + timedelta(seconds=self.offset + ticks * self.interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'interval': self.interval,
+            'running': self.running,
+            'runs': self.runs,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'missed': self.missed,
+            'next_run': self.next_run.isoformat() if self.next_run else None,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'last_lag_ms': self.last_lag_ms,
+            'max_lag_ms': round(self.max_lag_ms, 1),
+            'last_runtime_ms': self.last_runtime_ms,
+            'avg_runtime_ms': round(self.total_runtime_ms / self.runs, 1) if self.runs else None,
+            'max_runtime_ms': round(self.max_runtime_ms, 1),
+            'last_error': self.last_error,
+        }
+
+
+class JobScheduler:
+    """按墙钟刻度触发的定时任务调度器
+
+    - 单个事件循环维护所有任务的下一次触发时间，每次只等待最早的一个；等待可被 stop() 立即打断
+    - 下一次触发时间 = 本次的刻度 + interval，与任务实际开始时间和耗时无关；调度落后时跳到最近的未来刻度
+    - 同一任务上一次还没结束时跳过本次刻度（不重叠执行）
+    - 记录每个任务的触发延迟（实际开始 - 刻度）和耗时
+    - 注入冻结的虚拟时钟（speed == 0）时，先等当前任务执行完再把时钟推进到下一个刻度，触发顺序完全确定
+    - 任务可以通过 spawn() 派生独立运行的协程（不阻塞任务的下一个刻度），派生的协程同样在推进时钟前等待、停止时取消
+    """
+
+    def __init__(self, clock=None, calendar=None, max_workers: int = 4):
+        """
+        Args:
+            clock: 时钟（提供 now()，VirtualClock 还提供 speed/advance()），默认使用系统时间
+            calendar: 交易日历（提供 is_trading_time()/next_session_start()），为None时不限制交易时段
+            max_workers: 执行普通函数任务的线程数
+        """
+        self.clock = clock
+        self.calendar = calendar
+        self.max_workers = max_workers
+        self.jobs: List[Job] = []
+        self._shutdown_hooks: List[Callable[[], Awaitable]] = []
+        self._spawned: Set[asyncio.Task] = set()
+        self._stopping = threading.Event()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # ==================== 配置 ====================
+
+    def add_job(self, name: str, func: Callable, interval: float, **kwargs) -> Job:
+        """添加任务（参数见 Job），需在 start() 之前调用"""
+        job = Job(name, func, interval, **kwargs)
+        self.jobs.append(job)
+        return job
+
+    def on_shutdown(self, hook: Callable[[], Awaitable]):
+        """注册停止时在事件循环中执行的清理协程（例如关闭共享的HTTP连接池）"""
+        self._shutdown_hooks.append(hook)
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        """在调度循环中派生一个独立运行的协程（必须在调度器的事件循环中调用）"""
+        task = asyncio.get_running_loop().create_task(coro, name=name)
+        self._spawned.add(task)
+        task.add_done_callback(self._spawn_done)
+        return task
+
+    def _spawn_done(self, task: asyncio.Task):
+        self._spawned.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"{task.get_name()}执行异常: {task.exception()}")
+
+    # ==================== 运行 ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """在后台线程中运行调度循环"""
+        if self.is_running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run_loop, name="JobScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """停止调度：立即唤醒等待，取消进行中的协程任务（线程中的任务不再等待其结束）"""
+        self._stopping.set()
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def run_until(self, until: datetime):
+        """在当前线程中运行调度循环，直到时钟到达 until（回放和测试使用）"""
+        self._stopping.clear()
+        self._run_loop(until)
+
+    def _run_loop(self, until: Optional[datetime] = None):
+        loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="SchedulerJob")
+        loop.set_default_executor(self._executor)
+        self._loop = loop
+        try:
+            loop.run_until_complete(self._main(until))
+        except Exception as e:
+            logger.error(f"调度循环异常: {e}")
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            loop.close()
+            self._loop = None
+            self._wakeup = None
+
+    async def _main(self, until: Optional[datetime]):
+        _current_scheduler.set(self)
+        self._wakeup = asyncio.Event()
+        if self._stopping.is_set():
+            return
+        try:
+            now = self._now()
+            for job in self.jobs:
+                job.next_run = self._first_run(job, now)
+
+            while self.jobs and not self._stopping.is_set():
+                job = min(self.jobs, key=lambda j: j.next_run)
+                if until is not None and job.next_run > until:
+                    await self._wait_until(until)
+                    break
+                if not await self._wait_until(job.next_run):
+                    break
+                self._fire(job)
+                job.next_run = self._next_run(job, job.next_run)
+            if until is not None:
+                await self._drain()
+        finally:
+            await self._shutdown()
+
+    async def _shutdown(self):
+        tasks = [job.task for job in self.jobs if job.running] + list(self._spawned)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for hook in self._shutdown_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                logger.error(f"调度器清理失败: {e}")
+
+    # ==================== 刻度计算 ====================
+
+    def _now(self) -> datetime:
+        return self.clock.now() if self.clock else datetime.now()
+
+    def _first_run(self, job: Job, now: datetime) -> datetime:
+        if job.first_delay is not None:
+            moment = now + timedelta(seconds=job.first_delay)
+            if self._is_open(job, moment):
+                return moment
+        return self._open_tick(job, job.align(now))
+
+    def _next_run(self, job: Job, scheduled: datetime) -> datetime:
+        """刻度 scheduled 之后的下一个刻度（跳过已经过去的刻度和闭市时段）"""
+        moment = job.align(scheduled, strict=True)
+        now = self._now()
+        if moment < now:
+            behind = job.align(now)
+            job.missed += round((behind - moment).total_seconds() / job.interval)
+            moment = behind
+        return self._open_tick(job, moment)
+
+    def _open_tick(self, job: Job, moment: datetime) -> datetime:
+        """moment 及之后第一个位于交易时段内的刻度"""
+        if self._is_open(job, moment):
+            return moment
+        while not self._is_open(job, moment):
+            moment = job.align(self.calendar.next_session_start(moment))
+        logger.info(f"⏸️  {job.name}暂停，下次执行 {moment:%Y-%m-%d %H:%M:%S}")
+        return moment
+
+    def _is_open(self, job: Job, moment: datetime) -> bool:
+        return not job.trading_hours or self.calendar is None or self.calendar.is_trading_time(moment)
+
+    # ==================== 等待与执行 ====================
+
+    def _frozen(self) -> bool:
+        return self.clock is not None and getattr(self.clock, 'speed', 1) == 0
+
+    async def _wait_until(self, moment: datetime) -> bool:
+        """等待时钟到达 moment；被 stop() 打断时返回 False"""
+        while not self._stopping.is_set():
+            delay = (moment - self._now()).total_seconds()
+            if delay <= 0:
+                return True
+            if self._frozen():
+                await self._drain()
+                self.clock.advance((moment - self._now()).total_seconds())
+                continue
+            speed = getattr(self.clock, 'speed', 1) if self.clock else 1
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay / speed)
+            except asyncio.TimeoutError:
+                pass
+        return False
+
+    async def _drain(self):
+        """等待进行中的任务（及其派生的协程）执行完"""
+        while True:
+            tasks = [job.task for job in self.jobs if job.running] + list(self._spawned)
+            if not tasks:
+                return
+            await asyncio.wait(tasks)
+
+    def _fire(self, job: Job):
+        if job.running:
+            job.skipped += 1
+            logger.warning(f"⚠️ {job.name}上一次还未结束，跳过 {job.next_run:%H:%M:%S} 的执行")
+            return
+        job.task = asyncio.get_running_loop().create_task(self._execute(job, job.next_run))
+
+    async def _execute(self, job: Job, scheduled: datetime):
+        started_at = self._now()
+        lag_ms = max(0.0, (started_at - scheduled).total_seconds() * 1000)
+        job.last_run_at = started_at
+        job.last_lag_ms = round(lag_ms, 1)
+        job.max_lag_ms = max(job.max_lag_ms, lag_ms)
+
+        start = time.perf_counter()
+        try:
+            if job.is_coroutine:
+                await job.func()
+            else:
+                await asyncio.get_running_loop().run_in_executor(None, job.func)
+            job.last_error = None
+        except Exception as e:
+            job.errors += 1
+            job.last_error = str(e)
+            logger.error(f"{job.name}任务异常: {e}")
+        # 被 stop() 取消的执行不计入统计
+        runtime_ms = (time.perf_counter() - start) * 1000
+        job.runs += 1
+        job.last_runtime_ms = round(runtime_ms, 1)
+        job.max_runtime_ms = max(job.max_runtime_ms, runtime_ms)
+        job.total_runtime_ms += runtime_ms
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        """各任务的运行统计"""
+        return [job.metrics() for job in self.jobs]
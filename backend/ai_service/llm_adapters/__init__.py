@@ -2,11 +2,16 @@
 LLM适配器模块
 """
 
-from .base_adapter import LLMAdapter
+from .base_adapter import LLMAdapter, close_async_http_client, get_async_http_client
 from .openai_adapter import OpenAIAdapter
 from .claude_adapter import ClaudeAdapter
 from .deepseek_adapter import DeepSeekAdapter
+from .response_cache import CachedLLMAdapter, LLMResponseCache, get_llm_response_cache, make_cache_key
 
-__all__ = ['LLMAdapter', 'OpenAIAdapter', 'ClaudeAdapter', 'DeepSeekAdapter']
+__all__ = [
+    'LLMAdapter', 'OpenAIAdapter', 'ClaudeAdapter', 'DeepSeekAdapter',
+    'get_async_http_client', 'close_async_http_client',
+    'CachedLLMAdapter', 'LLMResponseCache', 'get_llm_response_cache', 'make_cache_key'
+]
 
 
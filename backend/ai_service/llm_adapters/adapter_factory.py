@@ -54,7 +54,8 @@ class LLMAdapterFactory:
             adapter = OpenAIAdapter(
                 api_key=api_key,
                 base_url=ai_config['base_url'],
-                model_name=ai_config['model_name']
+                model_name=ai_config['model_name'],
+                stream_usage=ai_config.get('stream_usage', True)
             )
             adapter.initialize_client()
 
@@ -4,27 +4,62 @@ LLM适配器基类
 """
 
 import os
+import json
+import time
+import asyncio
 import logging
+import weakref
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
 
+import httpx
+
 logger = logging.getLogger(__name__)
 
+# 每个事件循环共享一个异步HTTP连接池（httpx.AsyncClient 不能跨事件循环使用）
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的异步HTTP客户端（必须在协程中调用）"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=None  # 超时由每次请求单独指定
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_http_client():
+    """关闭当前事件循环的共享HTTP客户端"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class _StreamOptionsRejected(RuntimeError):
+    """服务端拒绝了 stream_options 参数"""
+
 
 class LLMAdapter(ABC):
     """LLM适配器基类"""
 
-    def __init__(self, api_key: str, base_url: str, model_name: str):
+    def __init__(self, api_key: str, base_url: str, model_name: str, stream_usage: bool = True):
         """
         Args:
             api_key: API密钥
             base_url: API基础URL
             model_name: 模型名称
+            stream_usage: 流式请求是否携带 stream_options.include_usage（服务端以4xx拒绝时自动关闭）
         """
         self.api_key = api_key
         self.base_url = base_url
         self.model_name = model_name
+        self.stream_usage = stream_usage
         self.client = None
 
     @abstractmethod
@@ -49,6 +84,7 @@ class LLMAdapter(ABC):
                 "raw_response": "原始响应",
                 "latency_ms": 响应延迟（毫秒）,
                 "tokens_used": 使用的token数（如果有）,
+                "usage": 服务商返回的用量明细（prompt_tokens/completion_tokens等，如果有）,
                 "error": "错误信息"
             }
         """
@@ -65,4 +101,123 @@ class LLMAdapter(ABC):
             return result.get("success", False)
         except Exception as e:
             logger.error(f"API Key验证失败: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    async def acall_api(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.7,
+        timeout: float = 30,
+        on_token: Optional[Callable[[str], Optional[bool]]] = None
+    ) -> Dict:
+        """
+        异步流式调用LLM API（OpenAI兼容的 /chat/completions 接口，使用共享连接池）
+
+        非OpenAI兼容的服务需要在子类中覆盖。超过 timeout 时取消请求并返回已收到的部分内容；
+        调用方取消任务时请求同样会被中断。
+
+        Args:
+            messages: 消息列表
+            temperature: 温度参数
+            timeout: 整个调用的截止时间（秒）
+            on_token: 每收到一段内容时的回调（参数为增量文本），返回 True 时提前结束读取（例如JSON已经完整）
+
+        Returns:
+            与 call_api 相同的响应格式，另外包含:
+            "ttft_ms": 首个token的延迟（毫秒），未收到内容时为None
+            "stopped_early": 是否因 on_token 返回 True 而提前结束
+        """
+        start = time.monotonic()
+        state = {"chunks": [], "ttft_ms": None, "usage": None}
+
+        try:
+            await asyncio.wait_for(self._stream_with_fallback(messages, temperature, state, start, on_token), timeout)
+            error = None
+        except asyncio.TimeoutError:
+            error = f"timeout after {timeout}s"
+            logger.warning(f"{self.model_name} 流式调用超时（{timeout}秒），已收到 {len(state['chunks'])} 段内容")
+        except Exception as e:
+            error = str(e)
+            logger.error(f"{self.model_name} 流式调用失败: {error}")
+
+        content = "".join(state["chunks"])
+        usage = state["usage"] or {}
+        return {
+            "success": error is None,
+            "response": content if error is None else (content or None),
+            "raw_response": None,
+            "latency_ms": int((time.monotonic() - start) * 1000),
+            "ttft_ms": state["ttft_ms"],
+            "tokens_used": usage.get("total_tokens"),
+            "usage": usage or None,
+            "stopped_early": state.get("stopped_early", False),
+            "error": error
+        }
+
+    async def _stream_with_fallback(self, messages, temperature, state, start, on_token):
+        """流式请求；服务端拒绝 stream_options 时关闭该参数重试一次"""
+        try:
+            await self._stream_chat(messages, temperature, state, start, on_token)
+        except _StreamOptionsRejected as e:
+            logger.warning(f"{self.model_name} 不支持 stream_options（{e}），关闭后重试")
+            self.stream_usage = False
+            try:
+                await self._stream_chat(messages, temperature, state, start, on_token)
+            except Exception:
+                # 去掉参数后仍然失败，说明错误与 stream_options 无关
+                self.stream_usage = True
+                raise
+
+    async def _stream_chat(
+        self,
+        messages: List[Dict],
+        temperature: float,
+        state: Dict,
+        start: float,
+        on_token: Optional[Callable[[str], Optional[bool]]]
+    ):
+        """发送流式请求并逐行解析SSE事件，内容追加到 state['chunks']"""
+        client = get_async_http_client()
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+        }
+        if self.stream_usage:
+            payload["stream_options"] = {"include_usage": True}
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+        async with client.stream(
+            "POST", f"{self.base_url.rstrip('/')}/chat/completions", json=payload, headers=headers
+        ) as response:
+            if response.status_code >= 400:
+                body = (await response.aread()).decode("utf-8", errors="replace")
+                if "stream_options" in payload and response.status_code in (400, 422):
+                    raise _StreamOptionsRejected(f"HTTP {response.status_code}: {body[:200]}")
+                raise RuntimeError(f"HTTP {response.status_code}: {body[:500]}")
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    continue
+
+                choices = event.get("choices") or []
+                usage = event.get("usage") or (choices[0].get("usage") if choices else None)
+                if usage:
+                    state["usage"] = usage
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if not delta:
+                    continue
+                if state["ttft_ms"] is None:
+                    state["ttft_ms"] = int((time.monotonic() - start) * 1000)
+                state["chunks"].append(delta)
+                if on_token is not None and on_token(delta):
+                    state["stopped_early"] = True
+                    break
@@ -58,8 +58,10 @@ class OpenAIAdapter(LLMAdapter):
 
             # 尝试获取token使用情况（有些API不支持）
             tokens_used = None
+            usage = None
             try:
                 tokens_used = response.usage.total_tokens
+                usage = response.usage.model_dump()
             except:
                 pass
 
@@ -69,6 +71,7 @@ class OpenAIAdapter(LLMAdapter):
                 "raw_response": response,
                 "latency_ms": latency_ms,
                 "tokens_used": tokens_used,
+                "usage": usage,
                 "error": None
             }
 
@@ -85,5 +88,6 @@ class OpenAIAdapter(LLMAdapter):
                 "raw_response": None,
                 "latency_ms": latency_ms,
                 "tokens_used": None,
+                "usage": None,
                 "error": error_msg
             }
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""
+LLM响应缓存
+以 模型/温度/消息 的哈希为键，把成功的LLM响应保存到本地SQLite文件，总大小超过上限时按最近使用时间淘汰。
+回放、回测和强制运行模式下相同的提示词不再重复请求上游
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(model_name: str, temperature: float, messages: List[Dict]) -> str:
+    """缓存键：模型、温度和消息内容的 SHA-256（消息按键排序序列化，与字典顺序无关）"""
+    payload = json.dumps(
+        {'model': model_name, 'temperature': round(float(temperature), 4), 'messages': messages},
+        ensure_ascii=False, sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """LLM响应缓存（SQLite，线程安全）
+
+    - 只缓存成功且完整的响应（超时返回的部分内容不缓存）
+    - 命中时更新最近使用时间；写入后总大小超过 max_bytes 时删除最久未使用的记录
+    - 读写异常只记录日志，调用方按未命中处理
+    """
+
+    def __init__(self, path: str, max_bytes: int = 200 * 1024 * 1024):
+        """
+        Args:
+            path: 缓存文件路径
+            max_bytes: 缓存内容的总大小上限（字节）
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_response (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                usage TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_response_last_used ON llm_response (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_response").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        logger.info(f"LLMResponseCache initialized: {path}（{self._size / 1024 / 1024:.1f}MB）")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存
+
+        Returns:
+            {"response": 响应文本, "usage": token用量或None}，未命中时返回None
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT response, usage FROM llm_response WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute(
+                    "UPDATE llm_response SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+                self.hits += 1
+            return {'response': row[0], 'usage': json.loads(row[1]) if row[1] else None}
+        except Exception as e:
+            logger.error(f"读取LLM响应缓存失败: {e}")
+            return None
+
+    def put(self, key: str, model_name: str, response: str, usage: Optional[Dict] = None):
+        """写入缓存（超过总大小上限时淘汰最久未使用的记录）"""
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                old = self._conn.execute("SELECT size FROM llm_response WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_response (key, model, response, usage, size, created_at, last_used, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                    (key, model_name, response, json.dumps(usage) if usage else None, size, now, now)
+                )
+                self._size += size - (old[0] if old else 0)
+                self._evict()
+                self._conn.commit()
+        except Exception as e:
+            logger.error(f"写入LLM响应缓存失败: {e}")
+
+    def _evict(self):
+        """删除最久未使用的记录，直到总大小不超过上限"""
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM llm_response ORDER BY last_used ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for key, size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM llm_response WHERE key = ?", (key,))
+                self._size -= size
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_response")
+            self._conn.commit()
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        """命中统计和占用大小"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_response").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'path': self.path,
+                'entries': entries,
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+                'evictions': self.evictions,
+            }
+
+
+class CachedLLMAdapter:
+    """带响应缓存的适配器包装
+
+    call_api/acall_api 先查缓存，命中时直接返回（acall_api 会把缓存的响应通过 on_token 一次性回放），
+    未命中时调用被包装的适配器并缓存成功的响应；其余属性和方法透传给被包装的适配器
+    """
+
+    def __init__(self, adapter, cache: LLMResponseCache):
+        self.adapter = adapter
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.adapter, name)
+
+    def _key(self, messages: List[Dict], temperature: float) -> str:
+        return make_cache_key(self.adapter.model_name, temperature, messages)
+
+    @staticmethod
+    def _cached_result(cached: Dict[str, Any], stopped_early: bool = False) -> Dict:
+        usage = cached.get('usage') or {}
+        return {
+            "success": True,
+            "response": cached['response'],
+            "raw_response": None,
+            "latency_ms": 0,
+            "ttft_ms": 0,
+            "tokens_used": usage.get("total_tokens"),
+            "usage": cached.get('usage'),
+            "error": None,
+            "stopped_early": stopped_early,
+            "cached": True,
+        }
+
+    def _store(self, key: str, result: Dict):
+        if result.get('success') and result.get('response'):
+            self.cache.put(key, self.adapter.model_name, result['response'], result.get('usage'))
+
+    def call_api(self, messages: List[Dict], temperature: float = 0.7, timeout: int = 30) -> Dict:
+        key = self._key(messages, temperature)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self._cached_result(cached)
+        result = self.adapter.call_api(messages, temperature=temperature, timeout=timeout)
+        self._store(key, result)
+        return result
+
+    async def acall_api(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.7,
+        timeout: float = 30,
+        on_token: Optional[Callable[[str], Optional[bool]]] = None
+    ) -> Dict:
+        key = self._key(messages, temperature)
+        cached = self.cache.get(key)
+        if cached is not None:
+            stopped_early = bool(on_token(cached['response'])) if on_token else False
+            return self._cached_result(cached, stopped_early)
+        result = await self.adapter.acall_api(messages, temperature=temperature, timeout=timeout, on_token=on_token)
+        self._store(key, result)
+        return result
+
+
+# 进程级单例
+_llm_response_cache: Optional[LLMResponseCache] = None
+_llm_response_cache_lock = threading.Lock()
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """获取进程级LLM响应缓存（配置未启用时返回None）"""
+    global _llm_response_cache
+    from config import settings
+    if not settings.llm_cache_enabled:
+        return None
+    with _llm_response_cache_lock:
+        if _llm_response_cache is None:
+            try:
+                _llm_response_cache = LLMResponseCache(settings.llm_cache_file, settings.llm_cache_max_mb * 1024 * 1024)
+            except Exception as e:
+                logger.error(f"打开LLM响应缓存失败 ({settings.llm_cache_file}): {e}")
+                return None
+        return _llm_response_cache
@@ -7,6 +7,7 @@ from typing import List, Dict, Optional, Any
 from datetime import datetime
 from models.models import AI, Position
 from data_service.akshare_client import Quote
+from data_service.quote_frame import QuoteFrame
 
 
 class PromptBuilder:
@@ -17,7 +18,10 @@ class PromptBuilder:
         ai: AI,
         quotes: List[Quote],
         positions: List[Position],
-        historical_klines: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        historical_klines: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        indicators: Optional[Dict[str, Dict[str, Any]]] = None,
+        events: Optional[List[Dict[str, Any]]] = None,
+        now: Optional[datetime] = None
     ) -> str:
         """
         构建用户提示词（动态数据）
@@ -27,6 +31,9 @@ class PromptBuilder:
             quotes: 实时行情列表
             positions: 持仓列表
             historical_klines: 历史K线数据，格式: {stock_code: [kline_data, ...], ...}
+            indicators: 技术指标（IndicatorEngine.get_indicators 的结果），提供时代替逐日K线表格
+            events: 触发本次决策的行情/成交事件（EventTriggers 产生），按时间表决策时为空
+            now: 提示词中的当前时间（回放时为虚拟时间），默认为系统时间
             
         Returns:
             完整的用户提示词
@@ -36,13 +43,12 @@ class PromptBuilder:
         profit_rate = (total_profit / ai.initial_cash * 100) if ai.initial_cash > 0 else 0.0
         
         prompt = f"""【当前时间】
-{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
+{(now or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')}
+{self._format_events(events)}
 【市场行情】
 {self._format_market_data(quotes)}
 
-【近5日K线数据】
-{self._format_historical_klines(historical_klines) if historical_klines else "暂无历史数据"}
+{self._format_history_section(historical_klines, indicators)}
 
 【你的账户】
 现金: ¥{ai.current_cash:,.2f}
@@ -56,6 +62,17 @@ class PromptBuilder:
 """
         return prompt
     
+    def _format_events(self, events: Optional[List[Dict[str, Any]]]) -> str:
+        """格式化触发事件（没有事件时为空）"""
+        if not events:
+            return ""
+        lines = "\n".join(f"- {event['message']}" for event in events)
+        return f"""
+【触发事件】
+本次决策由以下事件触发（不在常规决策时间），请重点评估这些变化：
+{lines}
+"""
+
     def _format_market_data(self, quotes: List[Quote]) -> str:
         """
         格式化市场数据
@@ -67,11 +84,11 @@ class PromptBuilder:
         lines.append("股票代码 | 名称     | 最新价  | 涨跌幅   | 成交量(万手) | 涨停价  | 跌停价")
         lines.append("-" * 80)
         
-        for q in quotes:
-            # 计算涨跌停价（简化计算，实际应该考虑ST等特殊情况）
-            limit_up = q.close_yesterday * 1.10
-            limit_down = q.close_yesterday * 0.90
-            
+        # 向量化计算全部股票的涨跌停价（与下单校验使用相同的规则）
+        quote_frame = QuoteFrame.ensure(quotes)
+        limit_ups, limit_downs = quote_frame.limit_prices()
+        
+        for q, limit_up, limit_down in zip(quote_frame, limit_ups.tolist(), limit_downs.tolist()):
             lines.append(
                 f"{q.code}   | {q.name:<8} | ¥{q.price:>6.2f} | "
                 f"{q.change_percent:>+6.2f}% | {q.volume/10000:>10,.0f} | "
@@ -87,8 +104,8 @@ class PromptBuilder:
         if not positions:
             return "暂无持仓"
         
-        # 创建股票代码到行情的映射
-        quote_map = {q.code: q for q in quotes}
+        # 股票代码到行情的映射
+        quote_map = QuoteFrame.ensure(quotes)
         
         lines = []
         lines.append("股票代码 | 名称     | 数量  | 可卖  | 成本价  | 现价    | 盈亏")
@@ -108,6 +125,56 @@ class PromptBuilder:
         
         return "\n".join(lines)
     
+    def _format_history_section(
+        self,
+        historical_klines: Optional[Dict[str, List[Dict[str, Any]]]],
+        indicators: Optional[Dict[str, Dict[str, Any]]]
+    ) -> str:
+        """
+        历史数据部分：有技术指标时输出紧凑的指标表（含近5日收盘价），否则输出逐日K线表格
+        """
+        if indicators:
+            return f"【技术指标（日线）】\n{self._format_indicators(indicators, historical_klines)}"
+        klines_text = self._format_historical_klines(historical_klines) if historical_klines else "暂无历史数据"
+        return f"【近5日K线数据】\n{klines_text}"
+    
+    def _format_indicators(
+        self,
+        indicators: Dict[str, Dict[str, Any]],
+        historical_klines: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    ) -> str:
+        """
+        格式化技术指标（每只股票一行）
+        
+        Args:
+            indicators: {stock_code: {指标名: 值}}
+            historical_klines: 用于列出近5日收盘价
+            
+        Returns:
+            格式化的指标表格
+        """
+        def fmt(value, spec=".2f"):
+            return "-" if value is None else format(value, spec)
+        
+        lines = []
+        lines.append("股票代码 | 近5日收盘 | MA5/MA20 | RSI14 | MACD(DIF/DEA/柱) | ATR14(%) | 量比 | VWAP(偏离) | 5/15/60分涨跌")
+        lines.append("-" * 100)
+        
+        for stock_code, ind in indicators.items():
+            klines = (historical_klines or {}).get(stock_code) or []
+            closes = "/".join(f"{k.get('c', 0):.2f}" for k in klines[-5:]) or "-"
+            lines.append(
+                f"{stock_code} | {closes} | "
+                f"{fmt(ind.get('ma5'))}/{fmt(ind.get('ma20'))} | {fmt(ind.get('rsi14'), '.1f')} | "
+                f"{fmt(ind.get('macd_dif'), '.3f')}/{fmt(ind.get('macd_dea'), '.3f')}/{fmt(ind.get('macd_hist'), '+.3f')} | "
+                f"{fmt(ind.get('atr14'))}({fmt(ind.get('atr_pct'), '.1f')}%) | {fmt(ind.get('volume_ratio5'))} | "
+                f"{fmt(ind.get('vwap'))}({fmt(ind.get('vs_vwap_pct'), '+.2f')}%) | "
+                f"{fmt(ind.get('chg_5m_pct'), '+.2f')}%/{fmt(ind.get('chg_15m_pct'), '+.2f')}%/{fmt(ind.get('chg_60m_pct'), '+.2f')}%"
+            )
+        
+        lines.append("注：MA/RSI/MACD/ATR/量比基于已收盘的日线；VWAP为今日成交均价，括号内为最新价相对VWAP的偏离；5/15/60分涨跌基于盘中实时行情的分笔和分时K线。")
+        return "\n".join(lines)
+    
     def _format_historical_klines(self, klines_data: Dict[str, List[Dict[str, Any]]]) -> str:
         """
         格式化历史K线数据
@@ -0,0 +1,218 @@
+"""
+Token用量与费用
+把各服务商返回的 usage 统一为 提示/输出/缓存命中 token 数（没有返回时按字符数估算），按配置的单价估算费用，
+并按AI、按日汇总决策日志中的用量，用于每日预算控制和费用查询
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.models import DecisionLog
+
+logger = logging.getLogger(__name__)
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_usage(usage) -> Optional[Dict[str, int]]:
+    """
+    统一 usage 格式
+
+    兼容 OpenAI（prompt_tokens_details.cached_tokens）、DeepSeek（prompt_cache_hit_tokens）、
+    Kimi（cached_tokens）的缓存命中字段；缓存命中的 token 包含在 prompt_tokens 中
+
+    Args:
+        usage: 服务商返回的 usage（字典或 openai SDK 的对象）
+
+    Returns:
+        {"prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens"}，没有用量信息时返回None
+    """
+    if not usage:
+        return None
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, 'model_dump') else dict(vars(usage))
+
+    prompt = _to_int(usage.get('prompt_tokens'))
+    completion = _to_int(usage.get('completion_tokens'))
+    total = _to_int(usage.get('total_tokens'))
+    if prompt is None and completion is None and total is None:
+        return None
+
+    details = usage.get('prompt_tokens_details') or {}
+    cached = _to_int(
+        details.get('cached_tokens') if isinstance(details, dict) else None
+    ) or _to_int(usage.get('prompt_cache_hit_tokens')) or _to_int(usage.get('cached_tokens')) or 0
+
+    prompt = prompt or 0
+    completion = completion or 0
+    return {
+        'prompt_tokens': prompt,
+        'completion_tokens': completion,
+        'cached_tokens': min(cached, prompt) if prompt else cached,
+        'total_tokens': total if total is not None else prompt + completion,
+    }
+
+
+def estimate_usage(messages: Sequence[Dict[str, Any]], response: Optional[str]) -> Dict[str, int]:
+    """
+    服务商没有返回 usage 时按字符数估算用量（用于预算控制，不追求精确）
+
+    中日韩等非ASCII字符按每字 1 个token、ASCII字符按每 4 个 1 个token 计，每条消息另加 4 个token的格式开销
+
+    Args:
+        messages: 请求的消息列表
+        response: 收到的响应文本（可以是超时前的部分内容）
+
+    Returns:
+        与 normalize_usage() 相同格式的用量（缓存命中计为 0）
+    """
+    def count(text: str) -> int:
+        non_ascii = sum(1 for ch in text if ord(ch) > 127)
+        return non_ascii + -(-(len(text) - non_ascii) // 4)
+
+    prompt = sum(count(str(message.get('content') or '')) + 4 for message in messages or [])
+    completion = count(response or '')
+    return {
+        'prompt_tokens': prompt,
+        'completion_tokens': completion,
+        'cached_tokens': 0,
+        'total_tokens': prompt + completion,
+    }
+
+
+def estimate_cost(model_name: str, usage: Optional[Dict[str, int]], prices: Optional[Dict] = None) -> Optional[float]:
+    """
+    按单价估算一次调用的费用（元）
+
+    Args:
+        model_name: 模型名称
+        usage: normalize_usage() 的结果
+        prices: {模型: [输入单价, 缓存命中输入单价, 输出单价]}（元/百万token，缓存命中单价可省略），
+                默认读取配置 llm_token_prices
+
+    Returns:
+        费用，没有用量或没有配置该模型的单价时返回None
+    """
+    if not usage:
+        return None
+    if prices is None:
+        from config import settings
+        prices = settings.llm_token_prices
+    price = prices.get(model_name)
+    if not price:
+        return None
+    if len(price) == 2:
+        input_price, cached_price, output_price = price[0], price[0], price[1]
+    else:
+        input_price, cached_price, output_price = price[0], price[1], price[2]
+    cached = usage.get('cached_tokens') or 0
+    uncached = max(0, (usage.get('prompt_tokens') or 0) - cached)
+    cost = uncached * input_price + cached * cached_price + (usage.get('completion_tokens') or 0) * output_price
+    return round(cost / 1_000_000, 6)
+
+
+# ==================== 每日预算 ====================
+
+def daily_budget(ai) -> Tuple[int, float]:
+    """AI的每日 (token预算, 费用预算)，AI未单独设置时使用配置的默认值，0 表示不限制"""
+    from config import settings
+    token_budget = ai.daily_token_budget if ai.daily_token_budget is not None else settings.ai_daily_token_budget
+    cost_budget = ai.daily_cost_budget if ai.daily_cost_budget is not None else settings.ai_daily_cost_budget
+    return int(token_budget or 0), float(cost_budget or 0.0)
+
+
+def budget_exceeded(spend: Optional[Dict[str, Any]], token_budget: int, cost_budget: float) -> Optional[str]:
+    """
+    检查当日用量是否已达预算
+
+    Returns:
+        超出预算的说明，未超出时返回None
+    """
+    if not spend:
+        return None
+    if token_budget > 0 and spend['total_tokens'] >= token_budget:
+        return f"今日已用 {spend['total_tokens']} token，达到预算 {token_budget}"
+    if cost_budget > 0 and spend['cost'] >= cost_budget:
+        return f"今日费用 ¥{spend['cost']:.4f}，达到预算 ¥{cost_budget:.2f}"
+    return None
+
+
+# ==================== 用量汇总 ====================
+
+def _day_range(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def _usage_columns():
+    return (
+        func.count(DecisionLog.id),
+        func.coalesce(func.sum(DecisionLog.prompt_tokens), 0),
+        func.coalesce(func.sum(DecisionLog.completion_tokens), 0),
+        func.coalesce(func.sum(DecisionLog.cached_tokens), 0),
+        func.coalesce(func.sum(DecisionLog.tokens_used), 0),
+        func.coalesce(func.sum(DecisionLog.cost), 0.0),
+        func.avg(DecisionLog.latency_ms),
+    )
+
+
+def _usage_row(row: Sequence) -> Dict[str, Any]:
+    calls, prompt, completion, cached, total, cost, latency = row
+    return {
+        'calls': calls,
+        'prompt_tokens': int(prompt),
+        'completion_tokens': int(completion),
+        'cached_tokens': int(cached),
+        'total_tokens': int(total),
+        'cache_hit_rate': round(cached / prompt, 4) if prompt else None,
+        'cost': round(float(cost), 6),
+        'avg_latency_ms': round(latency, 1) if latency is not None else None,
+    }
+
+
+def spend_by_ai(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    ai_ids: Optional[Iterable[int]] = None
+) -> Dict[int, Dict[str, Any]]:
+    """[start, end) 内各AI的用量合计 {AI id: 用量}"""
+    query = db.query(DecisionLog.ai_id, *_usage_columns()).filter(
+        DecisionLog.timestamp >= start, DecisionLog.timestamp < end
+    )
+    if ai_ids is not None:
+        query = query.filter(DecisionLog.ai_id.in_(list(ai_ids)))
+    return {row[0]: _usage_row(row[1:]) for row in query.group_by(DecisionLog.ai_id).all()}
+
+
+def daily_spend(db: Session, day: date, ai_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """某一天各AI的用量合计"""
+    start, end = _day_range(day)
+    return spend_by_ai(db, start, end, ai_ids)
+
+
+def usage_summary(db: Session, start: datetime, end: datetime, ai_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    [start, end) 内按 AI、日期 汇总的用量
+
+    Returns:
+        [{"ai_id", "date", "calls", "prompt_tokens", "completion_tokens", "cached_tokens",
+          "total_tokens", "cache_hit_rate", "cost", "avg_latency_ms"}]，按日期、AI排序
+    """
+    day = func.date(DecisionLog.timestamp)
+    query = db.query(DecisionLog.ai_id, day, *_usage_columns()).filter(
+        DecisionLog.timestamp >= start, DecisionLog.timestamp < end
+    )
+    if ai_id is not None:
+        query = query.filter(DecisionLog.ai_id == ai_id)
+    rows = query.group_by(DecisionLog.ai_id, day).order_by(day, DecisionLog.ai_id).all()
+    return [{'ai_id': row[0], 'date': str(row[1]), **_usage_row(row[2:])} for row in rows]
@@ -6,11 +6,12 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from models.models import AI, Position, Order, Transaction, DecisionLog
 from database import get_db
 from stock_config import get_stock_name
+from ai_service.token_usage import budget_exceeded, daily_budget, daily_spend, spend_by_ai, usage_summary
 
 router = APIRouter()
 
@@ -23,6 +24,10 @@ class AICreate(BaseModel):
     model_name: str
     # API Key和base_url从环境变量和ais_config.py读取
     initial_cash: float = 100000.0
+    decision_interval: Optional[int] = None  # 决策间隔（秒），默认使用调度器的间隔
+    decision_offset: Optional[int] = None  # 决策相位（秒），默认自动错开
+    daily_token_budget: Optional[int] = None  # 每日token预算，默认使用配置
+    daily_cost_budget: Optional[float] = None  # 每日费用预算（元），默认使用配置
 
 
 class AIResponse(BaseModel):
@@ -33,6 +38,10 @@ class AIResponse(BaseModel):
     initial_cash: float
     current_cash: float
     total_assets: float
+    decision_interval: Optional[int] = None
+    decision_offset: Optional[int] = None
+    daily_token_budget: Optional[int] = None
+    daily_cost_budget: Optional[float] = None
     is_active: bool
     
     class Config:
@@ -126,6 +135,10 @@ def register_ai(ai_data: AICreate, db: Session = Depends(get_db)):
         initial_cash=ai_data.initial_cash,
         current_cash=ai_data.initial_cash,
         total_assets=ai_data.initial_cash,
+        decision_interval=ai_data.decision_interval,
+        decision_offset=ai_data.decision_offset,
+        daily_token_budget=ai_data.daily_token_budget,
+        daily_cost_budget=ai_data.daily_cost_budget,
         is_active=True
     )
     
@@ -204,6 +217,48 @@ def get_ai_decisions(ai_id: int, limit: int = 100, db: Session = Depends(get_db)
     return logs
 
 
+@router.get("/api/ai/{ai_id}/usage")
+def get_ai_usage(ai_id: int, days: int = 7, db: Session = Depends(get_db)):
+    """获取AI的LLM用量：每日预算、今日用量和最近几天的每日汇总"""
+    ai = db.query(AI).filter(AI.id == ai_id).first()
+    if not ai:
+        raise HTTPException(status_code=404, detail="AI not found")
+    
+    token_budget, cost_budget = daily_budget(ai)
+    today = daily_spend(db, datetime.now().date(), [ai_id]).get(ai_id)
+    start = datetime.combine(datetime.now().date() - timedelta(days=max(1, days) - 1), datetime.min.time())
+    
+    return {
+        "ai_id": ai.id,
+        "ai_name": ai.name,
+        "budget": {
+            "daily_token_budget": token_budget,
+            "daily_cost_budget": cost_budget,
+            "exceeded": budget_exceeded(today, token_budget, cost_budget),
+        },
+        "today": today,
+        "daily": usage_summary(db, start, datetime.now() + timedelta(days=1), ai_id),
+    }
+
+
+@router.get("/api/usage/summary")
+def get_usage_summary(days: int = 7, db: Session = Depends(get_db)):
+    """获取所有AI最近几天的LLM用量（按AI合计和按日明细）"""
+    start = datetime.combine(datetime.now().date() - timedelta(days=max(1, days) - 1), datetime.min.time())
+    end = datetime.now() + timedelta(days=1)
+    names = {ai.id: ai.name for ai in db.query(AI).all()}
+    totals = spend_by_ai(db, start, end)
+    
+    return {
+        "since": start.isoformat(),
+        "totals": [
+            {"ai_id": ai_id, "ai_name": names.get(ai_id), **usage}
+            for ai_id, usage in sorted(totals.items(), key=lambda item: item[1]['cost'], reverse=True)
+        ],
+        "daily": usage_summary(db, start, end),
+    }
+
+
 @router.get("/api/ai/ranking")
 def get_ai_ranking(db: Session = Depends(get_db)):
     """获取AI排行榜"""
@@ -241,25 +296,68 @@ def get_ai_ranking(db: Session = Depends(get_db)):
 
 @router.get("/api/market/quotes")
 def get_market_quotes(limit: int = 50):
-    """获取实时行情"""
-    from data_service.akshare_client import AKShareClient
+    """获取实时行情（来自进程级行情中心）"""
+    from data_service.quote_hub import get_quote_hub
+    
+    snapshot = get_quote_hub().refresh_if_stale()
+    
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "version": snapshot.version,
+        "quotes": snapshot.frame.to_dicts()[:limit]
+    }
+
+
+@router.get("/api/market/orderbook/{stock_code}")
+async def get_market_order_book(stock_code: str):
+    """获取五档盘口（异步，不阻塞事件循环）"""
+    from data_service.async_client import get_async_market_client
+    
+    order_book = await get_async_market_client().get_order_book(stock_code)
+    if order_book is None:
+        raise HTTPException(status_code=503, detail="Order book unavailable")
+    
+    return {"stock_code": stock_code, "order_book": order_book}
+
+
+@router.get("/api/market/klines")
+async def get_market_klines(interval: str = "d", days: int = 5):
+    """并发获取所有可交易股票的历史K线（异步）"""
+    from data_service.async_client import get_async_market_client
+    from stock_config import TRADING_STOCKS
     
-    client = AKShareClient()
-    quotes = client.get_realtime_quotes()[:limit]
+    klines = await get_async_market_client().get_historical_klines_batch(
+        list(TRADING_STOCKS.keys()), interval=interval, days=days
+    )
     
     return {
         "timestamp": datetime.now().isoformat(),
-        "quotes": [q.to_dict() for q in quotes]
+        "klines": klines
+    }
+
+
+@router.get("/api/market/intraday/{stock_code}")
+def get_intraday_bars(stock_code: str, interval: int = 5, count: int = 48):
+    """获取分时K线（由行情中心轮询的实时行情在本地聚合，不请求上游）"""
+    from data_service.quote_hub import get_quote_hub
+    
+    aggregator = get_quote_hub().bar_aggregator
+    if interval not in aggregator.intervals:
+        raise HTTPException(status_code=400, detail=f"Unsupported interval, choose from {list(aggregator.intervals)}")
+    
+    return {
+        "stock_code": stock_code,
+        "interval": interval,
+        "bars": aggregator.get_bars(stock_code, interval, count)
     }
 
 
 @router.get("/api/market/stocks")
 def get_stock_list():
     """获取股票列表"""
-    from data_service.akshare_client import AKShareClient
+    from data_service.quote_hub import get_quote_hub
     
-    client = AKShareClient()
-    stocks = client.get_all_stock_list()
+    stocks = get_quote_hub().data_client.get_all_stock_list()
     
     return {
         "total": len(stocks),
@@ -267,6 +365,17 @@ def get_stock_list():
     }
 
 
+@router.get("/api/market/sources")
+def get_market_sources():
+    """上游行情数据源的健康状态（熔断状态、失败率、耗时分位数）"""
+    from data_service.quote_hub import get_quote_hub
+    
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "sources": get_quote_hub().data_client.get_source_metrics()
+    }
+
+
 @router.get("/api/market/orders", response_model=List[OrderWithAIResponse])
 def get_all_orders(limit: int = 100, db: Session = Depends(get_db)):
     """获取全市场最新订单"""
@@ -3,7 +3,7 @@
 """
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -31,6 +31,24 @@ class Settings(BaseSettings):
     # AI调度配置
     ai_decision_interval: int = 10  # AI决策间隔（秒）
     llm_timeout: int = 5  # LLM API超时时间（秒）
+    llm_max_concurrency: int = 4  # 决策周期内同时进行的LLM调用数上限
+    llm_decision_deadline: float = 120.0  # 单个AI一次决策（含LLM调用）的截止时间（秒）
+    decision_slot_seconds: int = 60  # 决策时间表的最小刻度（秒），各AI的决策间隔和相位按此取整
+    ai_daily_token_budget: int = 0  # 每个AI每日的token预算（0 表示不限制，可按AI单独设置）
+    ai_daily_cost_budget: float = 0.0  # 每个AI每日的费用预算（元，0 表示不限制，需配置单价）
+    # 模型单价（元/百万token）：{模型: [输入, 缓存命中输入, 输出]}，缓存命中单价可省略
+    # 例如 LLM_TOKEN_PRICES='{"deepseek-chat": [2, 0.5, 8]}'
+    llm_token_prices: Dict[str, List[float]] = {}
+
+    # 行情事件触发的决策
+    event_triggers_enabled: bool = True  # 是否启用事件触发的决策
+    event_price_move_pct: float = 3.0  # 短时涨跌幅阈值（%）
+    event_price_move_minutes: int = 5  # 短时涨跌的统计窗口（分钟）
+    event_limit_proximity_pct: float = 1.0  # 距涨跌停价的距离阈值（%）
+    event_debounce_seconds: int = 600  # 同一股票同一类型事件的去抖时间（秒）
+    event_min_gap_seconds: int = 300  # 同一AI两次决策的最小间隔（秒）
+    event_max_per_hour: int = 3  # 每个AI每小时最多的事件决策次数
+    event_broadcast: bool = False  # 股票事件是否通知所有AI（默认只通知持仓或有挂单的AI）
     
     # LLM API配置（从环境变量自动读取）
     openai_api_key: Optional[str] = None
@@ -55,6 +73,22 @@ class Settings(BaseSettings):
     biying_license: Optional[str] = None
     biying_base_url: str = "http://api.biyingapi.com"
     
+    # 行情缓存配置
+    market_stale_while_revalidate: bool = False  # 缓存过期时先返回旧数据，同时后台刷新
+    market_stale_max_age: float = 60.0  # 允许返回的旧数据最大年龄（秒）
+    
+    # 行情录制配置
+    tick_recorder_enabled: bool = False  # 录制每次获取的实时行情和五档盘口
+    tick_recorder_dir: str = "./ticks"  # 录制文件目录（按日分区）
+    
+    # LLM响应缓存（回放、回测和强制运行模式下复用相同提示词的响应）
+    llm_cache_enabled: bool = False  # 是否启用LLM响应缓存
+    llm_cache_file: str = "./llm_cache.db"  # 缓存文件（SQLite）
+    llm_cache_max_mb: int = 200  # 缓存总大小上限（MB），超过时淘汰最久未使用的响应
+    
+    # 交易日历配置
+    trading_holidays_file: Optional[str] = None  # 休市表文件（JSON），默认使用 rules/holidays.json
+    
     # 日志配置
     log_level: str = "INFO"
     
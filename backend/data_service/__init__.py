@@ -3,7 +3,22 @@
 """
 
 from .akshare_client import AKShareClient
+from .bar_aggregator import BarAggregator
+from .cache import MarketDataCache, ExpiryPolicy, TTLPolicy, TradingSessionPolicy
+from .async_client import AsyncAKShareClient, get_async_market_client
+from .indicators import IndicatorEngine
+from .kline_store import KLineStore
+from .quote_frame import QuoteFrame
+from .quote_hub import QuoteHub, QuoteSnapshot, get_quote_hub
+from .replay_client import ReplayDataClient, VirtualClock
+from .tick_buffer import TickBuffer
+from .tick_recorder import TickRecorder, get_tick_recorder, read_ticks
 
-__all__ = ['AKShareClient']
+__all__ = [
+    'AKShareClient', 'AsyncAKShareClient', 'BarAggregator', 'get_async_market_client', 'IndicatorEngine', 'KLineStore',
+    'MarketDataCache', 'ExpiryPolicy', 'TTLPolicy', 'TradingSessionPolicy',
+    'QuoteFrame', 'QuoteHub', 'QuoteSnapshot', 'get_quote_hub',
+    'ReplayDataClient', 'VirtualClock', 'TickBuffer', 'TickRecorder', 'get_tick_recorder', 'read_ticks'
+]
 
 
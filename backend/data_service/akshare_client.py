@@ -25,20 +25,47 @@ except:
 import akshare as ak
 import pandas as pd
 import requests
-from typing import List, Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime, timedelta
 import logging
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 
 from stock_config import TRADING_STOCKS, is_tradable_stock, get_stock_name
 from config import settings
+from .cache import (
+    ExpiryPolicy,
+    MarketDataCache,
+    KIND_QUOTE,
+    KIND_ORDER_BOOK,
+    KIND_STOCK_LIST,
+    default_policies,
+    kline_kind,
+)
+from .single_flight import SingleFlight
+from .source_health import SourceHealth
 
 logger = logging.getLogger(__name__)
 
+# Biying 多股实时接口单次请求最多支持的股票数
+BIYING_MULTI_QUOTE_LIMIT = 20
+
+
+def chunk_codes(stock_codes: List[str], size: int = BIYING_MULTI_QUOTE_LIMIT) -> List[List[str]]:
+    """将股票代码按接口上限切分为多个批次"""
+    return [stock_codes[i:i + size] for i in range(0, len(stock_codes), size)]
+
 
 class Quote:
     """行情数据模型"""
     
+    __slots__ = (
+        'code', 'name', 'price', 'open_price', 'high', 'low', 'close_yesterday',
+        'change_percent', 'change_amount', 'volume', 'amount', 'timestamp'
+    )
+    
     def __init__(self, data: Dict):
         self.code = data.get('代码', '')
         self.name = data.get('名称', '')
@@ -74,6 +101,8 @@ class Quote:
 class StockInfo:
     """股票基本信息"""
     
+    __slots__ = ('code', 'name')
+    
     def __init__(self, code: str, name: str):
         self.code = code
         self.name = name
@@ -82,20 +111,150 @@ class StockInfo:
         return {'code': self.code, 'name': self.name}
 
 
+def parse_bid_ask(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    解析 ak.stock_bid_ask_em 返回的 item/value 两列表格
+    
+    Args:
+        df: 行情表格
+        
+    Returns:
+        {item: value}
+    """
+    return dict(zip(df['item'].tolist(), df['value'].tolist()))
+
+
+def parse_stock_list(df: pd.DataFrame) -> List[StockInfo]:
+    """
+    解析 ak.stock_info_a_code_name 返回的股票列表
+    
+    Args:
+        df: 包含 code/name 列的表格
+        
+    Returns:
+        股票信息列表
+    """
+    return [StockInfo(code, name) for code, name in zip(df['code'].tolist(), df['name'].tolist())]
+
+
+def parse_biying_quotes(data: List[Dict]) -> List[Quote]:
+    """
+    解析 Biying 多股实时接口返回的数据
+    
+    Args:
+        data: [{'dm': 代码, 'p': 最新价, 'o': 开盘, 'h': 最高, 'l': 最低, 'yc': 昨收, ...}]
+        
+    Returns:
+        行情数据列表
+    """
+    quotes = []
+    for item in data:
+        code = str(item.get("dm") or "")
+        if not code:
+            continue
+        
+        code_simple = code.split(".")[0]
+        quote_data = {
+            "代码": code_simple,
+            "名称": get_stock_name(code_simple) or TRADING_STOCKS.get(code_simple, code_simple),
+            "最新价": item.get("p", 0),
+            "今开": item.get("o", 0),
+            "最高": item.get("h", 0),
+            "最低": item.get("l", 0),
+            "昨收": item.get("yc", 0),
+            "涨跌幅": item.get("pc", 0),
+            "涨跌额": item.get("ud", 0),
+            "成交量": item.get("v", 0),
+            "成交额": item.get("cje", 0),
+        }
+        quotes.append(Quote(quote_data))
+    return quotes
+
+
+def parse_biying_order_book(data: Dict) -> Dict[str, Any]:
+    """将 Biying 五档盘口数据转换为标准格式"""
+    return {
+        "ask_prices": data.get("ps") or [],    # 卖五到卖一
+        "bid_prices": data.get("pb") or [],    # 买一到买五
+        "ask_volumes": data.get("vs") or [],   # 卖盘量
+        "bid_volumes": data.get("vb") or [],   # 买盘量
+        "timestamp": data.get("t"),
+    }
+
+
+def select_recent_klines(data: List[Dict], interval: str, days: int) -> List[Dict]:
+    """只取最近N天的K线数据（如果数据量过多）"""
+    if interval == 'd':
+        # 日线数据，取最后N条
+        return data[-days:] if len(data) > days else data
+    # 分钟级数据，取最后的相关条数
+    return data[-min(len(data), 100):]
+
+
+SOURCE_BIYING = 'biying'
+SOURCE_AKSHARE = 'akshare'
+
+
 class AKShareClient:
     """AKShare客户端封装"""
     
-    def __init__(self, cache_expire: int = 10, max_retries: int = 3):
+    def __init__(
+        self,
+        cache_expire: int = 10,
+        max_retries: int = 3,
+        fallback_workers: int = 6,
+        fallback_deadline: float = 10.0,
+        biying_workers: int = 8,
+        cache_policies: Optional[Dict[str, ExpiryPolicy]] = None,
+        cache_max_entries: int = 1024,
+        stale_while_revalidate: Optional[bool] = None,
+        stale_max_age: Optional[float] = None,
+        recorder=None
+    ):
         """
         初始化
         
         Args:
-            cache_expire: 缓存过期时间（秒）
+            cache_expire: 实时行情缓存过期时间（秒）
             max_retries: 最大重试次数
+            fallback_workers: AKShare回退路径的并发线程数
+            fallback_deadline: AKShare回退路径单轮获取的截止时间（秒），超时返回部分结果
+            biying_workers: Biying 多股接口分批并发请求的线程数
+            cache_policies: 按数据类型覆盖默认的缓存过期策略
+            cache_max_entries: 缓存最大条目数（LRU淘汰）
+            stale_while_revalidate: 缓存过期时先返回旧数据并在后台刷新，默认读取配置
+            stale_max_age: 允许返回的旧数据最大年龄（秒），默认读取配置
+            recorder: 行情录制器（TickRecorder），默认在配置开启录制时使用进程级录制器
         """
         self.cache_expire = cache_expire
         self.max_retries = max_retries
-        self._cache: Dict = {}
+        self.fallback_workers = fallback_workers
+        self.fallback_deadline = fallback_deadline
+        self.biying_workers = biying_workers
+        self._cache = MarketDataCache(
+            {**default_policies(cache_expire), **(cache_policies or {})},
+            max_entries=cache_max_entries
+        )
+        if stale_while_revalidate is None:
+            stale_while_revalidate = settings.market_stale_while_revalidate
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_max_age = settings.market_stale_max_age if stale_max_age is None else stale_max_age
+        # 同一份数据同一时刻只有一个上游请求，其他调用方等待它的结果
+        self._flights = SingleFlight()
+        # 上游数据源熔断器：Biying 熔断期间直接使用 AKShare，冷却后后台探测恢复
+        self.source_health: Dict[str, SourceHealth] = {
+            SOURCE_BIYING: SourceHealth(SOURCE_BIYING),
+            SOURCE_AKSHARE: SourceHealth(SOURCE_AKSHARE),
+        }
+        if recorder is None:
+            from .tick_recorder import get_tick_recorder
+            recorder = get_tick_recorder()
+        self.recorder = recorder
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        # 最近一次 Biying 分批请求的统计：[{chunk, size, latency_ms, success, error}, ...]
+        self.last_biying_chunk_stats: List[Dict[str, Any]] = []
+        self._init_lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
         logger.info("AKShareClient initialized")
     
     def _retry_on_error(self, func, *args, **kwargs):
@@ -111,24 +270,74 @@ class AKShareClient:
                     raise
                 time.sleep(1 * (attempt + 1))  # 递增等待时间
 
-    def _get_session(self):
-        """获取Session"""
-        session = requests.Session()
-        # 恢复使用系统代理，看看是否能解决连接问题
-        return session
-    
-    def _get_from_cache(self, key: str) -> Optional[any]:
-        """从缓存获取数据"""
-        if key in self._cache:
-            data, timestamp = self._cache[key]
-            if (datetime.now() - timestamp).seconds < self.cache_expire:
-                logger.debug(f"Cache hit: {key}")
-                return data
-        return None
+    def _get_session(self) -> requests.Session:
+        """获取Session（常驻长连接池，所有 Biying 请求复用，避免每次请求都重新握手）"""
+        if self._session is None:
+            with self._init_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+    
+    def _get_from_cache(self, key: str, kind: str = KIND_QUOTE) -> Optional[Any]:
+        """从缓存获取数据（按数据类型的过期策略判断）"""
+        return self._cache.get(key, kind)
     
-    def _set_cache(self, key: str, data: any):
+    def _set_cache(self, key: str, data: Any, kind: str = KIND_QUOTE):
         """设置缓存"""
-        self._cache[key] = (data, datetime.now())
+        self._cache.set(key, data, kind)
+    
+    def _cached_fetch(self, key: str, kind: str, fetch: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """
+        带缓存的获取：命中缓存直接返回；未命中时合并并发请求；
+        开启 stale-while-revalidate 时返回旧数据并在后台刷新
+        
+        Args:
+            key: 缓存键
+            kind: 数据类型
+            fetch: 上游请求函数，失败返回None
+            
+        Returns:
+            数据，获取失败返回None
+        """
+        cached = self._get_from_cache(key, kind)
+        if cached is not None:
+            return cached
+        
+        if self.stale_while_revalidate:
+            stale = self._cache.get_stale(key, self.stale_max_age)
+            if stale is not None:
+                self._revalidate(key, lambda: self._fetch_and_cache(key, kind, fetch))
+                return stale
+        
+        try:
+            return self._flights.do(key, lambda: self._fetch_and_cache(key, kind, fetch))
+        except FutureTimeoutError:
+            logger.warning(f"等待在途请求超时: {key}")
+            return None
+    
+    def _fetch_and_cache(self, key: str, kind: str, fetch: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """请求上游并写入缓存"""
+        data = fetch()
+        if data is not None:
+            self._set_cache(key, data, kind)
+        return data
+    
+    def _revalidate(self, key: Any, refresh: Callable[[], Any]):
+        """后台刷新过期的缓存（同一个键已有在途请求时跳过）"""
+        if self._flights.in_flight(key):
+            return
+        
+        def run():
+            try:
+                self._flights.do(key, refresh)
+            except Exception as e:
+                logger.warning(f"后台刷新缓存失败 ({key}): {e}")
+        
+        self._get_executor("CacheRevalidate", 2).submit(run)
     
     def get_realtime_quotes(self, stock_codes: Optional[List[str]] = None) -> List[Quote]:
         """
@@ -147,74 +356,201 @@ class AKShareClient:
             # 标准化股票代码（去掉市场后缀）
             stock_codes = [code.split('.')[0] for code in stock_codes]
         
-        cache_key = f"realtime_quotes_{','.join(stock_codes)}"
+        # 行情按股票代码缓存：全市场刷新后，子集请求（如撮合时的单只查询）直接命中缓存
+        by_code = self._get_cached_quotes(stock_codes)
+        missing = [code for code in stock_codes if code not in by_code]
         
-        # 检查缓存
-        cached = self._get_from_cache(cache_key)
-        if cached is not None:
-            return cached
+        if missing and self.stale_while_revalidate:
+            # 有旧数据的股票先返回旧数据，后台刷新
+            stale = self._cache.get_stale_many([f"quote_{code}" for code in missing], self.stale_max_age)
+            stale_codes = [code for code in missing if f"quote_{code}" in stale]
+            if stale_codes:
+                by_code.update({code: stale[f"quote_{code}"] for code in stale_codes})
+                self._revalidate(("quotes", tuple(stale_codes)), lambda: self._load_quotes(stale_codes))
+                missing = [code for code in missing if code not in by_code]
         
-        logger.info(f"Fetching realtime quotes for {len(stock_codes)} tradable stocks...")
-
-        # 优先使用 Biying 接口
-        if settings.biying_license:
+        if missing:
+            by_code.update(self._load_quotes(missing))
+        
+        return [by_code[code] for code in stock_codes if code in by_code]
+    
+    def _load_quotes(self, stock_codes: List[str]) -> Dict[str, Quote]:
+        """
+        获取行情并写入缓存（按股票代码合并并发请求：已在请求中的股票等待其结果）
+        
+        Returns:
+            {股票代码: 行情}
+        """
+        def fetch(keys: List[tuple]) -> Dict[tuple, Quote]:
+            codes = [code for _, code in keys]
+            logger.info(f"Fetching realtime quotes for {len(codes)} tradable stocks...")
+            fetched = self._fetch_realtime_quotes(codes)
+            if fetched:
+                self._set_cached_quotes(fetched)
+                if self.recorder:
+                    self.recorder.record_quotes(fetched)
+                logger.info(f"Successfully fetched {len(fetched)}/{len(codes)} quotes")
+            else:
+                logger.error("Failed to fetch any quotes")
+            return {("quote", q.code): q for q in fetched}
+        
+        results = self._flights.do_many([("quote", code) for code in stock_codes], fetch)
+        return {code: quote for (_, code), quote in results.items()}
+    
+    def _get_cached_quotes(self, stock_codes: List[str]) -> Dict[str, Quote]:
+        """按股票代码读取缓存中仍有效的行情"""
+        cached = self._cache.get_many([f"quote_{code}" for code in stock_codes], KIND_QUOTE)
+        return {key[len("quote_"):]: quote for key, quote in cached.items()}
+    
+    def _set_cached_quotes(self, quotes: List[Quote]):
+        """按股票代码写入行情缓存"""
+        self._cache.set_many({f"quote_{q.code}": q for q in quotes}, KIND_QUOTE)
+    
+    def _fetch_realtime_quotes(self, stock_codes: List[str]) -> List[Quote]:
+        """从上游获取行情（优先使用 Biying，失败或熔断时回退到 AKShare），不读写缓存"""
+        # 优先使用 Biying 接口（熔断期间跳过，避免每次都等待超时）
+        if self._biying_available():
+            biying = self.source_health[SOURCE_BIYING]
+            start = time.monotonic()
             try:
                 logger.info("使用 Biying 接口获取实时行情")
                 quotes = self._get_realtime_quotes_biying(stock_codes)
                 if quotes:
-                    self._set_cache(cache_key, quotes)
+                    biying.record_success((time.monotonic() - start) * 1000)
+                    have = {q.code for q in quotes}
+                    missing = [code for code in stock_codes if code not in have]
+                    if missing:
+                        # 部分批次失败：缺失的股票用 AKShare 补齐
+                        logger.warning(f"Biying 缺失 {len(missing)} 只股票行情，使用 AKShare 补齐")
+                        by_code = {q.code: q for q in quotes}
+                        by_code.update({q.code: q for q in self._fetch_akshare_tracked(missing)})
+                        quotes = [by_code[code] for code in stock_codes if code in by_code]
                     return quotes
+                biying.record_failure((time.monotonic() - start) * 1000, "empty response")
                 logger.warning("Biying 接口返回空数据，回退到 AKShare")
             except Exception as e:
-                error_msg = f"⚠️ Biying 接口失败: {str(e)}"
-                print(f"\n{error_msg}")
-                print("🔄 正在回退到 AKShare 接口...\n")
-                logger.warning(f"{error_msg}，回退到 AKShare")
+                biying.record_failure((time.monotonic() - start) * 1000, e)
+                logger.warning(f"Biying 接口失败: {str(e)}，回退到 AKShare")
+        
+        # 回退到 AKShare（并发逐只获取，超过截止时间返回部分结果）
+        return self._fetch_akshare_tracked(stock_codes)
+    
+    def _fetch_akshare_tracked(self, stock_codes: List[str]) -> List[Quote]:
+        """通过 AKShare 获取行情并记录数据源健康状态（AKShare 是最后的数据源，不会被跳过）"""
+        start = time.monotonic()
+        quotes = self._get_realtime_quotes_akshare(stock_codes)
+        latency_ms = (time.monotonic() - start) * 1000
+        if quotes:
+            self.source_health[SOURCE_AKSHARE].record_success(latency_ms)
+        else:
+            self.source_health[SOURCE_AKSHARE].record_failure(latency_ms, "no quotes")
+        return quotes
+    
+    def _biying_available(self) -> bool:
+        """Biying 是否可用（已配置 license 且未熔断）；冷却结束时在后台发起探测"""
+        if not settings.biying_license:
+            return False
+        biying = self.source_health[SOURCE_BIYING]
+        if biying.allow_request():
+            return True
+        if biying.begin_probe():
+            self._get_executor("SourceProbe", 1).submit(self._probe_biying)
+        return False
+    
+    def _probe_biying(self):
+        """后台探测 Biying 是否恢复（请求一只股票的行情）"""
+        biying = self.source_health[SOURCE_BIYING]
+        start = time.monotonic()
+        try:
+            quotes = self._get_realtime_quotes_biying(list(TRADING_STOCKS.keys())[:1])
+            if not quotes:
+                raise ValueError("empty response")
+            biying.record_success((time.monotonic() - start) * 1000)
+        except Exception as e:
+            biying.record_failure((time.monotonic() - start) * 1000, e)
+    
+    def get_source_metrics(self) -> List[Dict[str, Any]]:
+        """各上游数据源的健康状态和耗时统计"""
+        return [health.metrics() for health in self.source_health.values()]
+    
+    def _get_executor(self, name: str, max_workers: int) -> ThreadPoolExecutor:
+        """获取指定用途的线程池（常驻，避免超时任务阻塞调用方）"""
+        with self._init_lock:
+            executor = self._executors.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+                self._executors[name] = executor
+        return executor
+    
+    def _get_realtime_quotes_akshare(self, stock_codes: List[str]) -> List[Quote]:
+        """
+        使用 AKShare 单股接口并发获取行情
+        
+        每只股票独立提交到线程池，整轮获取受 fallback_deadline 限制：
+        截止时间内未完成的股票直接跳过，返回已获取的部分结果，
+        避免单只股票的重试等待拖慢整个行情更新周期。
+        
+        Args:
+            stock_codes: 股票代码列表
+            
+        Returns:
+            行情数据列表（按 stock_codes 顺序，缺失的股票不包含在内）
+        """
+        if not stock_codes:
+            return []
+        
+        executor = self._get_executor("AKShareFallback", self.fallback_workers)
+        futures = {
+            code: executor.submit(self._get_single_quote_akshare, code)
+            for code in stock_codes
+        }
+        done, not_done = wait(futures.values(), timeout=self.fallback_deadline)
         
-        # 回退到 AKShare
         quotes = []
-        for code in stock_codes:
+        for code, future in futures.items():
+            if future not in done:
+                continue
             try:
-                # 使用单股票查询接口（更稳定）
-                df = self._retry_on_error(ak.stock_bid_ask_em, symbol=code)
-                
-                # 解析数据
-                data = {}
-                for _, row in df.iterrows():
-                    data[row['item']] = row['value']
-                
-                # 转换为Quote对象需要的格式
-                quote_data = {
-                    '代码': code,
-                    '名称': get_stock_name(code) or TRADING_STOCKS.get(code, code),
-                    '最新价': data.get('最新', 0),
-                    '今开': data.get('今开', 0),
-                    '最高': data.get('最高', 0),
-                    '最低': data.get('最低', 0),
-                    '昨收': data.get('昨收', 0),
-                    '涨跌幅': data.get('涨幅', 0),
-                    '涨跌额': data.get('涨跌', 0),
-                    '成交量': data.get('总手', 0) * 100,  # 转换为股数
-                    '成交额': data.get('金额', 0)
-                }
-                
-                quote = Quote(quote_data)
-                quotes.append(quote)
-                
+                quotes.append(future.result())
             except Exception as e:
                 logger.warning(f"Failed to fetch quote for {code}: {str(e)}")
                 # 继续获取其他股票，不因一只股票失败而全部失败
-                continue
         
-        if quotes:
-            # 缓存结果
-            self._set_cache(cache_key, quotes)
-            logger.info(f"Successfully fetched {len(quotes)}/{len(stock_codes)} quotes")
-        else:
-            logger.error("Failed to fetch any quotes")
+        if not_done:
+            timed_out = [code for code, future in futures.items() if future in not_done]
+            for future in not_done:
+                future.cancel()  # 尚未开始的任务直接取消
+            logger.warning(
+                f"AKShare 回退获取超过截止时间 {self.fallback_deadline}s，"
+                f"跳过 {len(timed_out)} 只股票: {timed_out}"
+            )
         
         return quotes
     
+    def _get_single_quote_akshare(self, code: str) -> Quote:
+        """使用 AKShare 单股票查询接口（更稳定）获取一只股票的行情"""
+        df = self._retry_on_error(ak.stock_bid_ask_em, symbol=code)
+        
+        # 解析数据
+        data = parse_bid_ask(df)
+        
+        # 转换为Quote对象需要的格式
+        quote_data = {
+            '代码': code,
+            '名称': get_stock_name(code) or TRADING_STOCKS.get(code, code),
+            '最新价': data.get('最新', 0),
+            '今开': data.get('今开', 0),
+            '最高': data.get('最高', 0),
+            '最低': data.get('最低', 0),
+            '昨收': data.get('昨收', 0),
+            '涨跌幅': data.get('涨幅', 0),
+            '涨跌额': data.get('涨跌', 0),
+            '成交量': data.get('总手', 0) * 100,  # 转换为股数
+            '成交额': data.get('金额', 0)
+        }
+        
+        return Quote(quote_data)
+    
     def get_all_stock_list(self) -> List[StockInfo]:
         """
         获取所有A股股票列表
@@ -225,19 +561,18 @@ class AKShareClient:
         cache_key = "all_stock_list"
         
         # 检查缓存（股票列表缓存时间更长）
-        if cache_key in self._cache:
-            data, timestamp = self._cache[cache_key]
-            if (datetime.now() - timestamp).seconds < 3600:  # 1小时缓存
-                return data
+        cached = self._get_from_cache(cache_key, KIND_STOCK_LIST)
+        if cached is not None:
+            return cached
         
         try:
             logger.info("Fetching stock list from AKShare...")
             df = self._retry_on_error(ak.stock_info_a_code_name)
             
-            stocks = [StockInfo(row['code'], row['name']) for _, row in df.iterrows()]
+            stocks = parse_stock_list(df)
             
             # 缓存结果
-            self._set_cache(cache_key, stocks)
+            self._set_cache(cache_key, stocks, KIND_STOCK_LIST)
             
             logger.info(f"Fetched {len(stocks)} stocks")
             return stocks
@@ -339,11 +674,64 @@ class AKShareClient:
     def _get_realtime_quotes_biying(self, stock_codes: List[str]) -> List[Quote]:
         """
         使用 Biying 多股实时接口获取行情
+        
+        接口单次最多支持 BIYING_MULTI_QUOTE_LIMIT 只股票，超出时切分为多个批次并发请求，
+        结果按 stock_codes 顺序合并。部分批次失败时返回其余批次的结果，全部失败时抛出异常。
+        每个批次的耗时和失败信息记录在 last_biying_chunk_stats 中。
+        
+        Args:
+            stock_codes: 股票代码列表
+            
+        Returns:
+            行情数据列表
+        """
+        stock_codes = [code.split(".")[0] for code in stock_codes]
+        chunks = chunk_codes(stock_codes)
+        if not chunks:
+            return []
+        
+        # 禁用SSL验证以解决连接问题
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        
+        if len(chunks) == 1:
+            results = [self._fetch_biying_chunk(0, chunks[0])]
+        else:
+            executor = self._get_executor("BiyingQuotes", self.biying_workers)
+            results = list(executor.map(self._fetch_biying_chunk, range(len(chunks)), chunks))
+        
+        self.last_biying_chunk_stats = [stats for stats, _ in results]
+        failed = [stats for stats in self.last_biying_chunk_stats if not stats['success']]
+        
+        if len(chunks) > 1:
+            latencies = [stats['latency_ms'] for stats in self.last_biying_chunk_stats]
+            logger.info(
+                f"Biying 分批请求完成：{len(chunks)} 批，失败 {len(failed)} 批，"
+                f"最大耗时 {max(latencies)}ms，平均耗时 {sum(latencies) // len(latencies)}ms"
+            )
+        for stats in failed:
+            logger.error(f"Biying 第 {stats['chunk'] + 1} 批（{stats['size']} 只）失败: {stats['error']}")
+        
+        if len(failed) == len(chunks):
+            raise RuntimeError(f"Biying API 调用失败: {failed[0]['error']}")
+        
+        by_code = {quote.code: quote for _, chunk_quotes in results for quote in chunk_quotes}
+        quotes = [by_code[code] for code in stock_codes if code in by_code]
+        logger.info(f"Biying 返回 {len(quotes)} 只股票行情")
+        return quotes
+    
+    def _fetch_biying_chunk(self, index: int, stock_codes: List[str]):
+        """
+        请求一个批次的 Biying 多股实时行情
         API: /hsrl/ssjy_more/{licence}?stock_codes=000001,000002,...
         返回格式: [{'p': 最新价, 'o': 开盘, 'h': 最高, 'l': 最低, 'yc': 昨收, ...}]
+        
+        Returns:
+            (批次统计, 行情列表)
         """
-        # 限制最多20支股票
-        stock_codes = [code.split(".")[0] for code in stock_codes][:20]
+        stats = {'chunk': index, 'size': len(stock_codes), 'latency_ms': 0, 'success': False, 'error': None}
+        start_time = time.time()
+        quotes: List[Quote] = []
         
         try:
             base = settings.biying_base_url.rstrip("/")
@@ -351,50 +739,23 @@ class AKShareClient:
             url = f"{base}/hsrl/ssjy_more/{settings.biying_license}?stock_codes={codes_str}"
             
             logger.info(f"Calling Biying API: {url}")
-            print(f"📡 请求 Biying 接口: {url}")
-            print(f"🔑 使用 License: {settings.biying_license[:8]}...")
-            # 禁用SSL验证以解决连接问题
-            import urllib3
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
             
             # 使用绕过代理的Session
-            with self._get_session() as session:
-                resp = session.get(url, timeout=5, verify=False)
-                resp.raise_for_status()
+            resp = self._get_session().get(url, timeout=5, verify=False)
+            resp.raise_for_status()
             
             data = resp.json()
             if not isinstance(data, list):
-                logger.error(f"Biying API 返回非列表数据: {data}")
-                return []
-            
-            quotes = []
-            for item in data:
-                code = str(item.get("dm") or "")
-                if not code:
-                    continue
-                
-                code_simple = code.split(".")[0]
-                quote_data = {
-                    "代码": code_simple,
-                    "名称": get_stock_name(code_simple) or TRADING_STOCKS.get(code_simple, code_simple),
-                    "最新价": item.get("p", 0),
-                    "今开": item.get("o", 0),
-                    "最高": item.get("h", 0),
-                    "最低": item.get("l", 0),
-                    "昨收": item.get("yc", 0),
-                    "涨跌幅": item.get("pc", 0),
-                    "涨跌额": item.get("ud", 0),
-                    "成交量": item.get("v", 0),
-                    "成交额": item.get("cje", 0),
-                }
-                quotes.append(Quote(quote_data))
-            
-            logger.info(f"Biying 返回 {len(quotes)} 只股票行情")
-            return quotes
+                raise ValueError(f"Biying API 返回非列表数据: {data}")
+            
+            quotes = parse_biying_quotes(data)
+            stats['success'] = True
             
         except Exception as e:
-            logger.error(f"Biying API 调用失败: {e}")
-            raise
+            stats['error'] = str(e)
+        
+        stats['latency_ms'] = int((time.time() - start_time) * 1000)
+        return stats, quotes
     
     def get_order_book(self, stock_code: str) -> Optional[Dict[str, Any]]:
         """
@@ -406,37 +767,38 @@ class AKShareClient:
             logger.warning("未配置 Biying license，无法获取五档盘口")
             return None
         
-        cache_key = f"order_book_{stock_code}"
-        cached = self._get_from_cache(cache_key)
-        if cached is not None:
-            return cached
+        stock_code = stock_code.split(".")[0]  # 去掉市场后缀
+        return self._cached_fetch(
+            f"order_book_{stock_code}", KIND_ORDER_BOOK,
+            lambda: self._fetch_order_book(stock_code)
+        )
+    
+    def _fetch_order_book(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """请求 Biying 五档盘口接口（不读写缓存），Biying 熔断期间直接返回None"""
+        if not self._biying_available():
+            logger.debug(f"Biying 熔断中，跳过五档盘口请求 ({stock_code})")
+            return None
         
+        start = time.monotonic()
         try:
-            stock_code = stock_code.split(".")[0]  # 去掉市场后缀
             base = settings.biying_base_url.rstrip("/")
             url = f"{base}/hsstock/real/five/{stock_code}/{settings.biying_license}"
             
             logger.info(f"Calling Biying order book API: {url}")
-            with self._get_session() as session:
-                resp = session.get(url, timeout=3, verify=False)
-                resp.raise_for_status()
-            
-            data = resp.json()
+            resp = self._get_session().get(url, timeout=3, verify=False)
+            resp.raise_for_status()
             
             # 转换为标准格式
-            order_book = {
-                "ask_prices": data.get("ps") or [],    # 卖五到卖一
-                "bid_prices": data.get("pb") or [],    # 买一到买五
-                "ask_volumes": data.get("vs") or [],   # 卖盘量
-                "bid_volumes": data.get("vb") or [],   # 买盘量
-                "timestamp": data.get("t"),
-            }
-            
-            self._set_cache(cache_key, order_book)
+            order_book = parse_biying_order_book(resp.json())
+            self.source_health[SOURCE_BIYING].record_success((time.monotonic() - start) * 1000)
+            if self.recorder:
+                self.recorder.record_order_book(stock_code, order_book)
+            
             logger.info(f"成功获取 {stock_code} 五档盘口")
             return order_book
             
         except Exception as e:
+            self.source_health[SOURCE_BIYING].record_failure((time.monotonic() - start) * 1000, e)
             logger.error(f"获取五档盘口失败 ({stock_code}): {e}")
             return None
 
@@ -463,11 +825,19 @@ class AKShareClient:
             logger.warning("未配置 Biying license，无法获取历史K线数据")
             return None
         
-        cache_key = f"klines_{stock_code}_{interval}_{days}"
-        cached = self._get_from_cache(cache_key)
-        if cached is not None:
-            return cached
-        
+        return self._cached_fetch(
+            f"klines_{stock_code}_{interval}_{adjust}_{days}", kline_kind(interval),
+            lambda: self._fetch_historical_klines(stock_code, interval, adjust, days)
+        )
+    
+    def _fetch_historical_klines(
+        self,
+        stock_code: str,
+        interval: str,
+        adjust: str,
+        days: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """请求 Biying 历史K线接口（不读写缓存）"""
         try:
             # 标准化股票代码（添加市场后缀）
             from stock_config import get_stock_full_code
@@ -478,9 +848,8 @@ class AKShareClient:
             url = f"{base}/hsstock/history/{full_code}/{interval}/{adjust}/{settings.biying_license}?lt={days * 2}"
             
             logger.info(f"Calling Biying K线 API: {url}")
-            with self._get_session() as session:
-                resp = session.get(url, timeout=5, verify=False)
-                resp.raise_for_status()
+            resp = self._get_session().get(url, timeout=5, verify=False)
+            resp.raise_for_status()
             
             data = resp.json()
             if not isinstance(data, list):
@@ -488,14 +857,8 @@ class AKShareClient:
                 return None
             
             # 只取最近N天的数据（如果数据量过多）
-            if interval == 'd':
-                # 日线数据，取最后N条
-                klines = data[-days:] if len(data) > days else data
-            else:
-                # 分钟级数据，取最后的相关条数
-                klines = data[-min(len(data), 100):]
+            klines = select_recent_klines(data, interval, days)
             
-            self._set_cache(cache_key, klines)
             logger.info(f"成功获取 {stock_code} 的 {len(klines)} 条K线数据")
             return klines
             
@@ -0,0 +1,371 @@
+"""
+异步行情数据客户端
+基于 httpx 长连接池的 Biying 接口封装，供 FastAPI 异步接口和调度器在事件循环中直接 await
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from config import settings
+from stock_config import TRADING_STOCKS, get_stock_full_code
+from .cache import (
+    ExpiryPolicy,
+    MarketDataCache,
+    KIND_QUOTE,
+    KIND_ORDER_BOOK,
+    default_policies,
+    kline_kind,
+)
+from .akshare_client import (
+    SOURCE_BIYING,
+    AKShareClient,
+    Quote,
+    chunk_codes,
+    parse_biying_order_book,
+    parse_biying_quotes,
+    select_recent_klines,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAKShareClient:
+    """AKShareClient 的异步版本
+
+    - 所有请求复用同一个 httpx.AsyncClient（keep-alive 连接池），不再每次请求都建立 TCP/TLS 连接
+    - 每类接口独立的超时时间
+    - 批量接口（多只股票的盘口/K线）并发发出请求
+    - Biying 不可用时，实时行情回退到同步客户端的 AKShare 路径（在线程中执行，不阻塞事件循环）
+
+    httpx.AsyncClient 绑定创建它的事件循环；每个事件循环各自维护一个连接池（事件循环被回收时随之释放）。
+    """
+
+    # 各接口的超时时间（秒）
+    DEFAULT_TIMEOUTS = {
+        'quotes': 5.0,
+        'order_book': 3.0,
+        'klines': 5.0,
+    }
+
+    def __init__(
+        self,
+        cache_expire: int = 10,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        timeouts: Optional[Dict[str, float]] = None,
+        sync_client: Optional[AKShareClient] = None,
+        cache_policies: Optional[Dict[str, ExpiryPolicy]] = None,
+        recorder=None
+    ):
+        """
+        初始化
+
+        Args:
+            cache_expire: 实时行情缓存过期时间（秒）
+            max_connections: 连接池最大连接数
+            max_keepalive_connections: 保持存活的空闲连接数
+            timeouts: 各接口超时时间，覆盖 DEFAULT_TIMEOUTS
+            sync_client: 用于 AKShare 回退的同步客户端
+            cache_policies: 按数据类型覆盖默认的缓存过期策略
+            recorder: 行情录制器（TickRecorder），默认在配置开启录制时使用进程级录制器
+        """
+        self.cache_expire = cache_expire
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self.timeouts = {**self.DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.sync_client = sync_client
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._cache = MarketDataCache({**default_policies(cache_expire), **(cache_policies or {})})
+        if recorder is None:
+            from .tick_recorder import get_tick_recorder
+            recorder = get_tick_recorder()
+        self.recorder = recorder
+        logger.info("AsyncAKShareClient initialized")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环上的连接池"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                verify=False,      # 与同步客户端一致，禁用SSL验证以解决连接问题
+                trust_env=False    # 不使用系统代理
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """关闭所有连接池（其他事件循环上的连接池提交到各自的事件循环中关闭）"""
+        current = asyncio.get_running_loop()
+        clients, self._clients = list(self._clients.items()), weakref.WeakKeyDictionary()
+        for loop, client in clients:
+            if client.is_closed:
+                continue
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running() and not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    def _get_from_cache(self, key: str, kind: str = KIND_QUOTE) -> Optional[Any]:
+        """从缓存获取数据"""
+        return self._cache.get(key, kind)
+
+    def _set_cache(self, key: str, data: Any, kind: str = KIND_QUOTE):
+        """设置缓存"""
+        self._cache.set(key, data, kind)
+
+    async def _get_json(self, url: str, endpoint: str) -> Any:
+        """发送GET请求并解析JSON"""
+        resp = await self._get_client().get(url, timeout=self.timeouts[endpoint])
+        resp.raise_for_status()
+        return resp.json()
+
+    def _get_sync_client(self) -> AKShareClient:
+        """获取用于回退的同步客户端"""
+        if self.sync_client is None:
+            self.sync_client = AKShareClient(cache_expire=self.cache_expire)
+        return self.sync_client
+
+    async def get_realtime_quotes(self, stock_codes: Optional[List[str]] = None) -> List[Quote]:
+        """
+        获取实时行情数据（优先使用 Biying，失败则回退到 AKShare）
+
+        Args:
+            stock_codes: 股票代码列表，为None则获取所有可交易股票
+
+        Returns:
+            行情数据列表
+        """
+        if stock_codes is None:
+            stock_codes = list(TRADING_STOCKS.keys())
+        else:
+            stock_codes = [code.split('.')[0] for code in stock_codes]
+
+        # 按股票代码缓存，只请求缺失的股票
+        cached = self._cache.get_many([f"quote_{code}" for code in stock_codes], KIND_QUOTE)
+        by_code = {key[len("quote_"):]: quote for key, quote in cached.items()}
+        missing = [code for code in stock_codes if code not in by_code]
+        if not missing:
+            return [by_code[code] for code in stock_codes]
+
+        fetched = await self._fetch_realtime_quotes(missing)
+        if fetched:
+            self._cache.set_many({f"quote_{q.code}": q for q in fetched}, KIND_QUOTE)
+            if self.recorder:
+                self.recorder.record_quotes(fetched)
+            by_code.update({q.code: q for q in fetched})
+        return [by_code[code] for code in stock_codes if code in by_code]
+
+    async def _fetch_realtime_quotes(self, stock_codes: List[str]) -> List[Quote]:
+        """从上游获取行情（不读写缓存），与同步客户端共享数据源熔断状态"""
+        sync_client = self._get_sync_client()
+        if sync_client._biying_available():
+            biying = sync_client.source_health[SOURCE_BIYING]
+            start = time.monotonic()
+            try:
+                quotes = await self._get_realtime_quotes_biying(stock_codes)
+                if quotes:
+                    biying.record_success((time.monotonic() - start) * 1000)
+                    have = {q.code for q in quotes}
+                    missing = [code for code in stock_codes if code not in have]
+                    if missing:
+                        # 部分批次失败：缺失的股票用 AKShare 补齐（与同步客户端一致）
+                        logger.warning(f"Biying 缺失 {len(missing)} 只股票行情，使用 AKShare 补齐")
+                        by_code = {q.code: q for q in quotes}
+                        filled = await asyncio.to_thread(sync_client._fetch_akshare_tracked, missing)
+                        by_code.update({q.code: q for q in filled})
+                        quotes = [by_code[code] for code in stock_codes if code in by_code]
+                    return quotes
+                biying.record_failure((time.monotonic() - start) * 1000, "empty response")
+                logger.warning("Biying 接口返回空数据，回退到 AKShare")
+            except Exception as e:
+                biying.record_failure((time.monotonic() - start) * 1000, e)
+                logger.warning(f"⚠️ Biying 接口失败: {e}，回退到 AKShare")
+
+        return await asyncio.to_thread(sync_client._fetch_akshare_tracked, stock_codes)
+
+    async def _get_realtime_quotes_biying(self, stock_codes: List[str]) -> List[Quote]:
+        """使用 Biying 多股实时接口获取行情（超过单次上限时分批并发请求，按原顺序合并）"""
+        stock_codes = [code.split(".")[0] for code in stock_codes]
+        chunks = chunk_codes(stock_codes)
+        results = await asyncio.gather(
+            *(self._fetch_biying_chunk(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        errors = [r for r in results if isinstance(r, Exception)]
+        for error in errors:
+            logger.error(f"Biying 批次请求失败: {error}")
+        if chunks and len(errors) == len(chunks):
+            raise errors[0]
+
+        by_code = {q.code: q for r in results if not isinstance(r, Exception) for q in r}
+        quotes = [by_code[code] for code in stock_codes if code in by_code]
+        logger.info(f"Biying 返回 {len(quotes)} 只股票行情（{len(chunks)} 批）")
+        return quotes
+
+    async def _fetch_biying_chunk(self, stock_codes: List[str]) -> List[Quote]:
+        """请求一个批次的 Biying 多股实时行情"""
+        base = settings.biying_base_url.rstrip("/")
+        url = f"{base}/hsrl/ssjy_more/{settings.biying_license}?stock_codes={','.join(stock_codes)}"
+
+        data = await self._get_json(url, 'quotes')
+        if not isinstance(data, list):
+            raise ValueError(f"Biying API 返回非列表数据: {data}")
+        return parse_biying_quotes(data)
+
+    async def get_stock_info(self, stock_code: str) -> Optional[Dict]:
+        """
+        获取单个股票的实时信息
+
+        Args:
+            stock_code: 股票代码
+
+        Returns:
+            股票信息字典
+        """
+        quotes = await self.get_realtime_quotes([stock_code])
+        if quotes:
+            return quotes[0].to_dict()
+        return None
+
+    async def get_order_book(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """
+        获取单个股票的买卖五档盘口（来自 Biying 接口）
+
+        Args:
+            stock_code: 股票代码
+
+        Returns:
+            标准格式的盘口数据，失败返回None
+        """
+        if not settings.biying_license:
+            logger.warning("未配置 Biying license，无法获取五档盘口")
+            return None
+
+        stock_code = stock_code.split(".")[0]
+        cache_key = f"order_book_{stock_code}"
+        cached = self._get_from_cache(cache_key, KIND_ORDER_BOOK)
+        if cached is not None:
+            return cached
+
+        try:
+            base = settings.biying_base_url.rstrip("/")
+            url = f"{base}/hsstock/real/five/{stock_code}/{settings.biying_license}"
+            order_book = parse_biying_order_book(await self._get_json(url, 'order_book'))
+            self._set_cache(cache_key, order_book, KIND_ORDER_BOOK)
+            if self.recorder:
+                self.recorder.record_order_book(stock_code, order_book)
+            return order_book
+        except Exception as e:
+            logger.error(f"获取五档盘口失败 ({stock_code}): {e}")
+            return None
+
+    async def get_order_books(self, stock_codes: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        并发获取多只股票的五档盘口
+
+        Args:
+            stock_codes: 股票代码列表
+
+        Returns:
+            {stock_code: order_book}
+        """
+        results = await asyncio.gather(*(self.get_order_book(code) for code in stock_codes))
+        return dict(zip(stock_codes, results))
+
+    async def get_historical_klines(
+        self,
+        stock_code: str,
+        interval: str = "d",
+        adjust: str = "n",
+        days: int = 5
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        获取历史K线数据（使用 Biying API）
+
+        Args:
+            stock_code: 股票代码（如 000063）
+            interval: 分时级别 (5/15/30/60/d/w/m/y)
+            adjust: 除权方式 (n不复权/f前复权/b后复权/fr等比前复权/br等比后复权)
+            days: 获取最近N天的数据
+
+        Returns:
+            K线数据列表，失败返回None
+        """
+        if not settings.biying_license:
+            logger.warning("未配置 Biying license，无法获取历史K线数据")
+            return None
+
+        cache_key = f"klines_{stock_code}_{interval}_{adjust}_{days}"
+        cached = self._get_from_cache(cache_key, kline_kind(interval))
+        if cached is not None:
+            return cached
+
+        try:
+            full_code = get_stock_full_code(stock_code)
+            base = settings.biying_base_url.rstrip("/")
+            url = f"{base}/hsstock/history/{full_code}/{interval}/{adjust}/{settings.biying_license}?lt={days * 2}"
+
+            data = await self._get_json(url, 'klines')
+            if not isinstance(data, list):
+                logger.error(f"Biying K线 API 返回非列表数据: {data}")
+                return None
+
+            klines = select_recent_klines(data, interval, days)
+            self._set_cache(cache_key, klines, kline_kind(interval))
+            return klines
+        except Exception as e:
+            logger.error(f"获取历史K线失败 ({stock_code}): {e}")
+            return None
+
+    async def get_historical_klines_batch(
+        self,
+        stock_codes: List[str],
+        interval: str = "d",
+        adjust: str = "n",
+        days: int = 5
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        并发获取多只股票的历史K线
+
+        Args:
+            stock_codes: 股票代码列表
+            interval: 分时级别
+            adjust: 除权方式
+            days: 获取最近N天的数据
+
+        Returns:
+            {stock_code: klines}（获取失败的股票不包含在内）
+        """
+        results = await asyncio.gather(*(
+            self.get_historical_klines(code, interval, adjust, days) for code in stock_codes
+        ))
+        return {code: klines for code, klines in zip(stock_codes, results) if klines}
+
+
+# 进程级单例（FastAPI 异步接口共享同一个连接池）
+_async_client: Optional[AsyncAKShareClient] = None
+
+
+def get_async_market_client() -> AsyncAKShareClient:
+    """获取进程级异步行情客户端（首次调用时创建）"""
+    global _async_client
+    if _async_client is None:
+        from .quote_hub import get_quote_hub
+        _async_client = AsyncAKShareClient(sync_client=get_quote_hub().data_client)
+    return _async_client
@@ -0,0 +1,224 @@
+"""
+分时K线聚合
+用轮询得到的实时行情在内存中增量生成 1/5/15 分钟 OHLCV K线，
+每只股票每个周期使用固定容量的环形缓冲区，不需要额外的上游请求
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .quote_frame import QuoteFrame
+from rules.trading_calendar import SESSIONS, TradingCalendar, get_trading_calendar
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVALS = (1, 5, 15)
+
+# 各交易时段收盘的分钟数（收盘时刻的行情计入该时段最后一根1分钟K线）
+_CLOSE_MINUTES = frozenset(close.hour * 60 + close.minute for _, close in SESSIONS)
+
+# K线记录（ts 为K线开始时间的 Unix 秒）
+BAR_DTYPE = np.dtype([
+    ('ts', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+    ('amount', np.float64),
+])
+
+
+class _BarRing:
+    """单只股票单个周期的K线环形缓冲区（容量固定，写满后覆盖最早的K线）"""
+
+    __slots__ = ('data', 'head', 'count')
+
+    def __init__(self, capacity: int):
+        self.data = np.zeros(capacity, dtype=BAR_DTYPE)
+        self.head = 0   # 下一根K线的写入位置
+        self.count = 0
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        return int(self.data[self.head - 1]['ts']) if self.count else None
+
+    def update(self, ts: int, price: float, volume: float, amount: float):
+        """用一笔行情更新当前K线；ts 进入新的周期时开新K线，早于当前K线的行情忽略"""
+        last_ts = self.last_ts
+        if last_ts == ts:
+            bar = self.data[self.head - 1]
+            bar['high'] = max(bar['high'], price)
+            bar['low'] = min(bar['low'], price)
+            bar['close'] = price
+            bar['volume'] += volume
+            bar['amount'] += amount
+        elif last_ts is None or ts > last_ts:
+            self.data[self.head] = (ts, price, price, price, price, volume, amount)
+            self.head = (self.head + 1) % len(self.data)
+            self.count = min(self.count + 1, len(self.data))
+
+    def tail(self, count: Optional[int] = None) -> np.ndarray:
+        """最近 count 根K线（按时间正序的副本）"""
+        n = self.count if count is None else max(0, min(count, self.count))
+        index = (self.head - n + np.arange(n)) % len(self.data)
+        return self.data[index]
+
+
+class _SymbolState:
+    """单只股票的聚合状态"""
+
+    __slots__ = ('rings', 'day', 'volume', 'amount')
+
+    def __init__(self, intervals: Sequence[int], capacity: int):
+        self.rings = {interval: _BarRing(capacity) for interval in intervals}
+        self.day: Optional[str] = None
+        self.volume = 0.0  # 上一笔行情的当日累计成交量
+        self.amount = 0.0  # 上一笔行情的当日累计成交额
+
+
+class BarAggregator:
+    """分时K线聚合器（线程安全）
+
+    - update() 接收每轮轮询的行情，按行情时间归入各周期的K线
+    - 行情中的成交量/成交额是当日累计值，K线的量额取相邻两笔行情的差值；
+      每只股票当日第一笔行情只作为基准，不计入K线成交量
+    - 只聚合交易时段内的行情：午休、开盘前和收盘后的刷新不会生成K线，
+      开盘前的行情（仍是前一交易日的累计量）也不会成为当日的成交量基准
+    - 内存占用固定：股票数 × 周期数 × capacity 根K线
+    """
+
+    def __init__(
+        self,
+        intervals: Sequence[int] = DEFAULT_INTERVALS,
+        capacity: int = 240,
+        calendar: Optional[TradingCalendar] = None
+    ):
+        """
+        Args:
+            intervals: K线周期（分钟）
+            capacity: 每只股票每个周期保留的K线数量（240 根1分钟K线即一个完整交易日）
+            calendar: 交易日历，默认使用进程级交易日历
+        """
+        self.intervals = tuple(intervals)
+        self.capacity = capacity
+        self.calendar = calendar or get_trading_calendar()
+        self._lock = threading.Lock()
+        self._symbols: Dict[str, _SymbolState] = {}
+
+    @property
+    def symbols(self) -> List[str]:
+        """已有K线的股票代码"""
+        with self._lock:
+            return list(self._symbols)
+
+    def update(self, quotes) -> int:
+        """
+        用一批实时行情更新K线
+
+        Args:
+            quotes: QuoteFrame 或行情列表
+
+        Returns:
+            处理的行情数量
+        """
+        frame = QuoteFrame.ensure(quotes)
+        if not len(frame):
+            return 0
+        prices = frame.column('price').tolist()
+        volumes = frame.column('volume').tolist()
+        amounts = frame.column('amount').tolist()
+
+        updated = 0
+        with self._lock:
+            for i, quote in enumerate(frame.quotes):
+                price = prices[i]
+                if not price or price <= 0:
+                    continue
+                if not self.calendar.is_trading_time(quote.timestamp):
+                    continue
+                state = self._symbols.get(quote.code)
+                if state is None:
+                    state = self._symbols[quote.code] = _SymbolState(self.intervals, self.capacity)
+                self._apply(state, quote.timestamp, price, volumes[i] or 0.0, amounts[i] or 0.0)
+                updated += 1
+        return updated
+
+    def _apply(self, state: _SymbolState, moment: datetime, price: float, volume: float, amount: float):
+        """把一笔行情计入一只股票的各周期K线"""
+        day = moment.strftime("%Y%m%d")
+        if state.day != day:
+            state.day, state.volume, state.amount = day, volume, amount
+        d_volume = max(0.0, volume - state.volume)
+        d_amount = max(0.0, amount - state.amount)
+        state.volume = max(state.volume, volume)
+        state.amount = max(state.amount, amount)
+
+        midnight = int(moment.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+        minute_of_day = moment.hour * 60 + moment.minute
+        if minute_of_day in _CLOSE_MINUTES:
+            minute_of_day -= 1
+        for interval, ring in state.rings.items():
+            ring.update(midnight + minute_of_day // interval * interval * 60, price, d_volume, d_amount)
+
+    def get_array(self, stock_code: str, interval: int = 1, count: Optional[int] = None) -> np.ndarray:
+        """
+        获取K线数组（BAR_DTYPE 结构化数组，按时间正序，最后一根可能尚未走完）
+
+        Args:
+            stock_code: 股票代码
+            interval: 周期（分钟），必须是构造时指定的周期之一
+            count: 最近多少根，默认全部
+        """
+        if interval not in self.intervals:
+            raise ValueError(f"不支持的K线周期: {interval}，可选 {self.intervals}")
+        with self._lock:
+            state = self._symbols.get(stock_code.split('.')[0])
+            if state is None:
+                return np.zeros(0, dtype=BAR_DTYPE)
+            return state.rings[interval].tail(count)
+
+    def get_bars(self, stock_code: str, interval: int = 1, count: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取K线列表（与 Biying 分时K线相同的字段：t/o/h/l/c/v/a）
+
+        Args:
+            stock_code: 股票代码
+            interval: 周期（分钟）
+            count: 最近多少根，默认全部
+        """
+        return [
+            {
+                't': datetime.fromtimestamp(int(bar['ts'])).strftime("%Y-%m-%d %H:%M:%S"),
+                'o': float(bar['open']),
+                'h': float(bar['high']),
+                'l': float(bar['low']),
+                'c': float(bar['close']),
+                'v': float(bar['volume']),
+                'a': float(bar['amount']),
+            }
+            for bar in self.get_array(stock_code, interval, count)
+        ]
+
+    def get_bars_batch(
+        self,
+        stock_codes: Sequence[str],
+        interval: int = 1,
+        count: Optional[int] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """批量获取K线，没有数据的股票不包含在内"""
+        result = {}
+        for code in stock_codes:
+            bars = self.get_bars(code, interval, count)
+            if bars:
+                result[code] = bars
+        return result
+
+    def clear(self):
+        """清空所有K线"""
+        with self._lock:
+            self._symbols.clear()
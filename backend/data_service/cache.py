@@ -0,0 +1,230 @@
+"""
+行情数据缓存
+按数据类型配置过期策略，并限制缓存条目数（LRU淘汰）
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, time as dtime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# 数据类型
+KIND_QUOTE = 'quote'                    # 实时行情
+KIND_ORDER_BOOK = 'order_book'          # 五档盘口
+KIND_KLINE_DAILY = 'kline_daily'        # 日线及以上周期K线
+KIND_KLINE_INTRADAY = 'kline_intraday'  # 分钟级K线
+KIND_STOCK_LIST = 'stock_list'          # 股票列表
+
+
+class ExpiryPolicy:
+    """缓存过期策略基类"""
+
+    def is_fresh(self, stored_at: datetime, now: datetime) -> bool:
+        """
+        判断缓存是否仍然有效
+
+        Args:
+            stored_at: 写入缓存的时间
+            now: 当前时间
+
+        Returns:
+            是否有效
+        """
+        raise NotImplementedError
+
+
+class TTLPolicy(ExpiryPolicy):
+    """固定有效期（支持小于1秒）"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def is_fresh(self, stored_at: datetime, now: datetime) -> bool:
+        return (now - stored_at).total_seconds() < self.seconds
+
+    def __repr__(self) -> str:
+        return f"TTLPolicy({self.seconds}s)"
+
+
+class TradingSessionPolicy(ExpiryPolicy):
+    """在下一个交易时段边界（开盘/收盘）之前一直有效
+
+    适用于日线等只在开盘（出现当日K线）和收盘（当日K线定型）时变化的数据，
+    闭市期间（包括节假日）缓存不会过期。
+    """
+
+    # 日线数据发生变化的时刻
+    BOUNDARIES: List[dtime] = [dtime(9, 30), dtime(15, 0)]
+
+    def __init__(self, calendar=None):
+        """
+        Args:
+            calendar: 交易日历（TradingCalendar），默认使用进程级交易日历
+        """
+        if calendar is None:
+            from rules.trading_calendar import get_trading_calendar
+            calendar = get_trading_calendar()
+        self.calendar = calendar
+
+    def next_boundary(self, after: datetime) -> datetime:
+        """计算 after 之后的下一个交易时段边界"""
+        day = after.date()
+        for _ in range(30):
+            if self.calendar.is_trading_day(day):
+                for boundary in self.BOUNDARIES:
+                    moment = datetime.combine(day, boundary)
+                    if moment > after:
+                        return moment
+            day += timedelta(days=1)
+        return after + timedelta(days=1)
+
+    def is_fresh(self, stored_at: datetime, now: datetime) -> bool:
+        return now < self.next_boundary(stored_at)
+
+    def __repr__(self) -> str:
+        return "TradingSessionPolicy()"
+
+
+class MarketDataCache:
+    """按数据类型配置过期策略的LRU缓存（线程安全）"""
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, ExpiryPolicy]] = None,
+        default_policy: Optional[ExpiryPolicy] = None,
+        max_entries: int = 1024
+    ):
+        """
+        Args:
+            policies: {数据类型: 过期策略}
+            default_policy: 未配置类型使用的策略
+            max_entries: 最大缓存条目数，超出时淘汰最久未使用的条目
+        """
+        self.policies = dict(policies or {})
+        self.default_policy = default_policy or TTLPolicy(10)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_policy(self, kind: str) -> ExpiryPolicy:
+        """获取数据类型对应的过期策略"""
+        return self.policies.get(kind, self.default_policy)
+
+    def get(self, key: str, kind: str) -> Optional[Any]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+            kind: 数据类型
+
+        Returns:
+            有效的缓存数据，不存在或已过期返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, stored_at = entry
+            if not self.get_policy(kind).is_fresh(stored_at, datetime.now()):
+                return None
+            self._entries.move_to_end(key)
+            logger.debug(f"Cache hit: {key}")
+            return data
+
+    def get_stale(self, key: str, max_age: float) -> Optional[Any]:
+        """
+        读取缓存，不判断过期策略（用于 stale-while-revalidate）
+
+        Args:
+            key: 缓存键
+            max_age: 允许的最大年龄（秒）
+
+        Returns:
+            写入时间在 max_age 以内的数据，否则返回None
+        """
+        return self.get_stale_many([key], max_age).get(key)
+
+    def get_stale_many(self, keys: List[str], max_age: float) -> Dict[str, Any]:
+        """批量读取年龄在 max_age 以内的缓存（不判断过期策略）"""
+        now = datetime.now()
+        result = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and (now - entry[1]).total_seconds() < max_age:
+                    result[key] = entry[0]
+        return result
+
+    def set(self, key: str, data: Any, kind: str):
+        """写入缓存"""
+        with self._lock:
+            self._entries[key] = (data, datetime.now())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_many(self, keys: List[str], kind: str) -> Dict[str, Any]:
+        """
+        批量读取缓存
+
+        Returns:
+            {key: data}，只包含存在且有效的条目
+        """
+        policy = self.get_policy(kind)
+        now = datetime.now()
+        result = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or not policy.is_fresh(entry[1], now):
+                    continue
+                self._entries.move_to_end(key)
+                result[key] = entry[0]
+        return result
+
+    def set_many(self, items: Dict[str, Any], kind: str):
+        """批量写入缓存（同一时间戳）"""
+        now = datetime.now()
+        with self._lock:
+            for key, data in items.items():
+                self._entries[key] = (data, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
+def default_policies(quote_ttl: float = 10) -> Dict[str, ExpiryPolicy]:
+    """
+    默认的过期策略
+
+    Args:
+        quote_ttl: 实时行情的有效期（秒）
+    """
+    return {
+        KIND_QUOTE: TTLPolicy(quote_ttl),
+        KIND_ORDER_BOOK: TTLPolicy(0.5),
+        KIND_KLINE_DAILY: TradingSessionPolicy(),
+        KIND_KLINE_INTRADAY: TTLPolicy(60),
+        KIND_STOCK_LIST: TTLPolicy(3600),
+    }
+
+
+def kline_kind(interval: str) -> str:
+    """K线周期对应的数据类型"""
+    return KIND_KLINE_DAILY if interval in ('d', 'w', 'm', 'y') else KIND_KLINE_INTRADAY
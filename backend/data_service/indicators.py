@@ -0,0 +1,257 @@
+"""
+技术指标引擎
+基于本地K线库的日线和实时行情，用 NumPy 对全部股票一次性计算 MA/EMA、RSI、MACD、ATR、量比和日内VWAP，
+日线指标按 股票/交易日 缓存，同一交易日内所有AI共享
+"""
+
+import logging
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .quote_frame import QuoteFrame
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== 向量化指标函数 ====================
+# 输入为 (股票数, K线数) 的二维数组，右对齐，左侧不足的部分为 NaN
+
+def ema(values: np.ndarray, span: Optional[int] = None, alpha: Optional[float] = None) -> np.ndarray:
+    """
+    指数移动平均（以第一个有效值为初值，逐列递推，各股票同时计算）
+
+    Args:
+        values: 二维数组
+        span: 周期，alpha = 2 / (span + 1)
+        alpha: 平滑系数（Wilder 平滑传 1 / n）
+    """
+    if alpha is None:
+        alpha = 2.0 / (span + 1)
+    result = np.full(values.shape, np.nan)
+    current = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        current = np.where(np.isnan(current), x, np.where(np.isnan(x), current, alpha * x + (1 - alpha) * current))
+        result[:, t] = current
+    return result
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """最近 window 根的简单平均（不足 window 根时为 NaN），返回每只股票一个值"""
+    if values.shape[1] < window:
+        return np.full(values.shape[0], np.nan)
+    tail = values[:, -window:]
+    with np.errstate(invalid='ignore'):
+        return np.where(np.isnan(tail).any(axis=1), np.nan, tail.mean(axis=1))
+
+
+def rsi(closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """相对强弱指数（Wilder 平滑），返回每只股票最新值"""
+    if closes.shape[1] < 2:
+        return np.full(closes.shape[0], np.nan)
+    diff = np.diff(closes, axis=1)
+    gain = ema(np.where(diff > 0, diff, np.where(np.isnan(diff), np.nan, 0.0)), alpha=1.0 / period)[:, -1]
+    loss = ema(np.where(diff < 0, -diff, np.where(np.isnan(diff), np.nan, 0.0)), alpha=1.0 / period)[:, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = 100 - 100 / (1 + gain / loss)
+    value = np.where((loss == 0) & (gain > 0), 100.0, value)
+    value = np.where((loss == 0) & (gain == 0), 50.0, value)
+    valid = np.sum(~np.isnan(diff), axis=1) >= period
+    return np.where(valid, value, np.nan)
+
+
+def macd(closes: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD，返回每只股票最新的 (DIF, DEA, MACD柱)，柱值按A股习惯为 2 × (DIF - DEA)"""
+    dif = ema(closes, fast) - ema(closes, slow)
+    dea = ema(dif, signal)
+    return dif[:, -1], dea[:, -1], 2 * (dif[:, -1] - dea[:, -1])
+
+
+def atr(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """平均真实波幅（Wilder 平滑），返回每只股票最新值"""
+    prev_close = np.concatenate([np.full((closes.shape[0], 1), np.nan), closes[:, :-1]], axis=1)
+    with np.errstate(invalid='ignore'):
+        true_range = np.fmax(highs - lows, np.fmax(np.abs(highs - prev_close), np.abs(lows - prev_close)))
+    valid = np.sum(~np.isnan(true_range), axis=1) >= period
+    return np.where(valid, ema(true_range, alpha=1.0 / period)[:, -1], np.nan)
+
+
+def volume_ratio(volumes: np.ndarray, window: int = 5) -> np.ndarray:
+    """最后一根K线成交量 / 之前 window 根的平均成交量"""
+    if volumes.shape[1] < window + 1:
+        return np.full(volumes.shape[0], np.nan)
+    previous = sma(volumes[:, :-1], window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(previous > 0, volumes[:, -1] / previous, np.nan)
+
+
+def vwap(amounts: np.ndarray, volumes: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """
+    日内成交均价 = 成交额 / 成交量
+
+    不同数据源的成交量单位不同（股或手），按与最新价更接近的一种换算
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        raw = np.where(volumes > 0, amounts / volumes, np.nan)
+        per_lot = raw / 100
+        use_lot = np.abs(np.log(per_lot / prices)) < np.abs(np.log(raw / prices))
+    return np.where(use_lot, per_lot, raw)
+
+
+def _stack(series: List[List[float]], length: int) -> np.ndarray:
+    """将长短不一的序列右对齐为 (股票数, length) 的二维数组"""
+    matrix = np.full((len(series), length), np.nan)
+    for i, values in enumerate(series):
+        values = values[-length:]
+        if values:
+            matrix[i, length - len(values):] = values
+    return matrix
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+# ==================== 指标引擎 ====================
+
+class IndicatorEngine:
+    """技术指标引擎
+
+    - 日线指标只使用交易日之前已收盘的K线，按 (股票, 交易日) 缓存，每个交易日只计算一次
+    - 日内指标（VWAP、相对均线/VWAP的偏离、近5/15/60分钟涨跌）每次根据最新行情、本地分笔和分时K线计算，开销很小
+    """
+
+    DAILY_FIELDS = (
+        'last_close', 'ma5', 'ma10', 'ma20', 'ema12', 'ema26', 'rsi14',
+        'macd_dif', 'macd_dea', 'macd_hist', 'atr14', 'atr_pct', 'volume_ratio5',
+    )
+
+    def __init__(self, kline_source, lookback: int = 60, bar_source=None, tick_source=None):
+        """
+        Args:
+            kline_source: 提供 get_klines_batch(stock_codes, interval, adjust, days) 的K线来源（KLineStore）
+            lookback: 计算日线指标使用的K线数量
+            bar_source: 提供 get_array(stock_code, interval, count) 的分时K线来源（BarAggregator），可选
+            tick_source: 提供 change_pct(stock_codes, minutes) 的分笔来源（TickBuffer），可选
+        """
+        self.kline_source = kline_source
+        self.lookback = lookback
+        self.bar_source = bar_source
+        self.tick_source = tick_source
+        self._lock = threading.Lock()
+        self._daily: Dict[str, Dict[str, Any]] = {}
+        self._day: Optional[date] = None
+
+    def get_indicators(
+        self,
+        quotes,
+        today: Optional[date] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        计算全部股票的技术指标
+
+        Args:
+            quotes: 最新行情（QuoteFrame 或行情列表）
+            today: 当前交易日，默认今天
+
+        Returns:
+            {股票代码: {指标名: 值}}，无法计算的指标为None
+        """
+        frame = QuoteFrame.ensure(quotes)
+        today = today or datetime.now().date()
+        daily = self.get_daily_indicators(frame.codes, today)
+
+        prices = frame.column('price')
+        vwaps = vwap(frame.column('amount'), frame.column('volume'), prices)
+        chg_5m = self.tick_source.change_pct(frame.codes, 5) if self.tick_source is not None else {}
+
+        result = {}
+        for i, code in enumerate(frame.codes):
+            values = dict(daily.get(code) or {})
+            price = float(prices[i])
+            ma20 = values.get('ma20')
+            values['price'] = _round(price)
+            values['vwap'] = _round(vwaps[i])
+            values['vs_vwap_pct'] = _round((price / vwaps[i] - 1) * 100) if price > 0 and vwaps[i] > 0 else None
+            values['vs_ma20_pct'] = _round((price / ma20 - 1) * 100) if price > 0 and ma20 else None
+            values['chg_5m_pct'] = chg_5m.get(code)
+            values.update(self._intraday_changes(code, price, today))
+            result[code] = values
+        return result
+
+    def _intraday_changes(self, code: str, price: float, today: date) -> Dict[str, Optional[float]]:
+        """最新价相对15/60分钟前（当日15分钟K线收盘价）的涨跌幅"""
+        changes = {'chg_15m_pct': None, 'chg_60m_pct': None}
+        if self.bar_source is None or price <= 0:
+            return changes
+        bars = self.bar_source.get_array(code, 15, 5)
+        midnight = datetime.combine(today, datetime.min.time()).timestamp()
+        closes = bars['close'][bars['ts'] >= midnight]
+        # 最后一根是正在进行的K线，倒数第 n+1 根的收盘价即 n 个周期之前的价格
+        for name, periods in (('chg_15m_pct', 1), ('chg_60m_pct', 4)):
+            if len(closes) > periods and closes[-periods - 1] > 0:
+                changes[name] = _round((price / closes[-periods - 1] - 1) * 100)
+        return changes
+
+    def get_daily_indicators(self, stock_codes: Sequence[str], today: date) -> Dict[str, Dict[str, Any]]:
+        """日线指标（按交易日缓存，只计算缓存中没有的股票；没有K线的股票不缓存，下一轮重新获取）"""
+        with self._lock:
+            if self._day != today:
+                self._daily.clear()
+                self._day = today
+            missing = [code for code in stock_codes if code not in self._daily]
+            if missing:
+                self._daily.update(self._compute_daily(missing, today))
+            return {code: self._daily[code] for code in stock_codes if code in self._daily}
+
+    def _compute_daily(self, stock_codes: List[str], today: date) -> Dict[str, Dict[str, Any]]:
+        """一次性计算多只股票的日线指标（没有K线的股票不在结果中）"""
+        klines = self.kline_source.get_klines_batch(stock_codes, interval='d', adjust='n', days=self.lookback + 1)
+        before = today.strftime("%Y-%m-%d")
+
+        series = {}
+        for code in stock_codes:
+            bars = [bar for bar in klines.get(code) or [] if str(bar.get('t', ''))[:10] < before]
+            if bars:
+                series[code] = bars[-self.lookback:]
+        if not series:
+            return {}
+
+        codes = list(series)
+        length = max(len(bars) for bars in series.values())
+        closes = _stack([[float(b.get('c') or np.nan) for b in series[c]] for c in codes], length)
+        highs = _stack([[float(b.get('h') or np.nan) for b in series[c]] for c in codes], length)
+        lows = _stack([[float(b.get('l') or np.nan) for b in series[c]] for c in codes], length)
+        volumes = _stack([[float(b.get('v') or 0) for b in series[c]] for c in codes], length)
+
+        last_close = closes[:, -1]
+        dif, dea, hist = macd(closes)
+        atr14 = atr(highs, lows, closes)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            atr_pct = atr14 / last_close * 100
+
+        columns = {
+            'last_close': last_close,
+            'ma5': sma(closes, 5),
+            'ma10': sma(closes, 10),
+            'ma20': sma(closes, 20),
+            'ema12': ema(closes, 12)[:, -1],
+            'ema26': ema(closes, 26)[:, -1],
+            'rsi14': rsi(closes),
+            'macd_dif': dif,
+            'macd_dea': dea,
+            'macd_hist': hist,
+            'atr14': atr14,
+            'atr_pct': atr_pct,
+            'volume_ratio5': volume_ratio(volumes),
+        }
+
+        result = {}
+        for i, code in enumerate(codes):
+            result[code] = {name: _round(columns[name][i], 3 if name.startswith('macd') else 2) for name in self.DAILY_FIELDS}
+            result[code]['bars'] = len(series[code])
+        logger.debug(f"计算 {len(codes)} 只股票的日线指标（{today}）")
+        return result
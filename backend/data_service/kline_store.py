@@ -0,0 +1,265 @@
+"""
+本地K线库
+K线持久化到数据库（kline_bar 表），按 股票/周期/复权方式 增量同步，读取走内存
+"""
+
+import logging
+import threading
+from datetime import datetime, date, time as dtime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models.models import KLineBar
+
+logger = logging.getLogger(__name__)
+
+# 日线在收盘后才会出现当日K线，收盘后需要再同步一次
+DAILY_BAR_READY_TIME = dtime(15, 5)
+
+# 分钟级K线的周期（分钟）
+INTRADAY_INTERVALS = {'5': 5, '15': 15, '30': 30, '60': 60}
+
+
+def _bar_to_dict(bar: KLineBar) -> Dict[str, Any]:
+    """将数据库记录转换为 Biying K线格式"""
+    return {
+        't': bar.bar_time,
+        'o': bar.open,
+        'h': bar.high,
+        'l': bar.low,
+        'c': bar.close,
+        'v': bar.volume,
+        'a': bar.amount,
+        'pc': bar.pre_close,
+        'sf': bar.suspended,
+    }
+
+
+def _bar_date(bar_time: str) -> Optional[date]:
+    """从K线时间中解析日期"""
+    try:
+        return datetime.strptime(str(bar_time)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+class KLineStore:
+    """本地K线库
+
+    - 首次访问某只股票时从数据库加载到内存，内存中没有数据时从上游回填 backfill_days 天
+    - 之后只请求最后一根K线之后的数据（最后一根会被覆盖，兼容盘中未完成的K线）
+    - 日线每个交易日最多同步两次（首次访问、收盘后），分钟线按周期同步
+    - 读取直接返回内存中的数据，不访问数据库和网络
+    """
+
+    def __init__(
+        self,
+        data_client,
+        session_factory: Optional[Callable] = None,
+        backfill_days: int = 60,
+        max_bars_in_memory: int = 500
+    ):
+        """
+        Args:
+            data_client: 提供 get_historical_klines 的行情客户端
+            session_factory: 数据库会话上下文管理器，默认使用 database.get_db_session
+            backfill_days: 首次同步时回填的天数
+            max_bars_in_memory: 每个K线序列在内存中保留的最大条数
+        """
+        if session_factory is None:
+            from database import get_db_session
+            session_factory = get_db_session
+
+        self.data_client = data_client
+        self.session_factory = session_factory
+        self.backfill_days = backfill_days
+        self.max_bars_in_memory = max_bars_in_memory
+
+        self._lock = threading.RLock()
+        self._bars: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        self._synced_at: Dict[Tuple[str, str, str], datetime] = {}
+
+    def get_klines(
+        self,
+        stock_code: str,
+        interval: str = "d",
+        adjust: str = "n",
+        days: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        获取最近的K线（与 AKShareClient.get_historical_klines 返回格式一致）
+
+        Args:
+            stock_code: 股票代码
+            interval: 分时级别 (5/15/30/60/d/w/m/y)
+            adjust: 除权方式
+            days: 返回最近N条
+
+        Returns:
+            K线数据列表
+        """
+        key = (stock_code, interval, adjust)
+        self.sync(stock_code, interval, adjust)
+        with self._lock:
+            bars = self._bars.get(key, [])
+            return bars[-days:] if days else list(bars)
+
+    def get_klines_batch(
+        self,
+        stock_codes: List[str],
+        interval: str = "d",
+        adjust: str = "n",
+        days: int = 5
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        批量获取多只股票的K线
+
+        Returns:
+            {stock_code: klines}（没有数据的股票不包含在内）
+        """
+        result = {}
+        for stock_code in stock_codes:
+            klines = self.get_klines(stock_code, interval, adjust, days)
+            if klines:
+                result[stock_code] = klines
+        return result
+
+    def sync(self, stock_code: str, interval: str = "d", adjust: str = "n", force: bool = False) -> int:
+        """
+        增量同步一个K线序列
+
+        Args:
+            stock_code: 股票代码
+            interval: 分时级别
+            adjust: 除权方式
+            force: 忽略同步频率限制
+
+        Returns:
+            新增或更新的K线条数
+        """
+        key = (stock_code, interval, adjust)
+        with self._lock:
+            if key not in self._bars:
+                self._bars[key] = self._load(key)
+
+            now = datetime.now()
+            if not force and not self._needs_sync(key, now):
+                return 0
+
+            bars = self._bars[key]
+            last_time = bars[-1]['t'] if bars else None
+            days = self._days_to_fetch(bars, interval, now)
+
+            fetched = self.data_client.get_historical_klines(
+                stock_code=stock_code, interval=interval, adjust=adjust, days=days
+            )
+            if fetched is None:
+                # 上游失败：保留已有数据，下次访问再重试
+                logger.warning(f"K线同步失败 ({stock_code} {interval}/{adjust})，继续使用本地数据")
+                return 0
+
+            new_bars = [bar for bar in fetched if last_time is None or str(bar.get('t')) >= last_time]
+            if new_bars:
+                self._save(key, new_bars)
+                merged = {bar['t']: bar for bar in bars}
+                merged.update({str(bar['t']): self._normalize(bar) for bar in new_bars})
+                self._bars[key] = [merged[t] for t in sorted(merged)][-self.max_bars_in_memory:]
+
+            self._synced_at[key] = now
+            logger.debug(f"K线同步完成 ({stock_code} {interval}/{adjust})：{len(new_bars)} 条")
+            return len(new_bars)
+
+    def sync_all(self, stock_codes: List[str], interval: str = "d", adjust: str = "n") -> int:
+        """同步多只股票，返回新增或更新的K线总数"""
+        total = 0
+        for stock_code in stock_codes:
+            try:
+                total += self.sync(stock_code, interval, adjust)
+            except Exception as e:
+                logger.error(f"K线同步异常 ({stock_code}): {e}")
+        return total
+
+    def _needs_sync(self, key: Tuple[str, str, str], now: datetime) -> bool:
+        """判断K线序列是否需要再次同步"""
+        synced_at = self._synced_at.get(key)
+        if synced_at is None:
+            return True
+
+        interval = key[1]
+        if interval in INTRADAY_INTERVALS:
+            return (now - synced_at).total_seconds() >= INTRADAY_INTERVALS[interval] * 60
+
+        if synced_at.date() != now.date():
+            return True
+        # 收盘前同步过，收盘后当日K线才完整
+        return synced_at.time() < DAILY_BAR_READY_TIME <= now.time()
+
+    def _days_to_fetch(self, bars: List[Dict[str, Any]], interval: str, now: datetime) -> int:
+        """计算增量同步需要请求的天数"""
+        if not bars:
+            return self.backfill_days
+        last_date = _bar_date(bars[-1]['t'])
+        if last_date is None or interval in INTRADAY_INTERVALS:
+            return 2
+        # 多请求一天，覆盖最后一根可能未完成的K线
+        return min(self.backfill_days, max(2, (now.date() - last_date).days + 1))
+
+    def _normalize(self, bar: Dict[str, Any]) -> Dict[str, Any]:
+        """统一K线字段格式"""
+        return {
+            't': str(bar.get('t', '')),
+            'o': float(bar.get('o') or 0),
+            'h': float(bar.get('h') or 0),
+            'l': float(bar.get('l') or 0),
+            'c': float(bar.get('c') or 0),
+            'v': float(bar.get('v') or 0),
+            'a': float(bar.get('a') or 0),
+            'pc': float(bar.get('pc') or 0),
+            'sf': int(bar.get('sf') or 0),
+        }
+
+    def _load(self, key: Tuple[str, str, str]) -> List[Dict[str, Any]]:
+        """从数据库加载K线序列"""
+        stock_code, interval, adjust = key
+        try:
+            with self.session_factory() as db:
+                rows = db.query(KLineBar).filter(
+                    KLineBar.stock_code == stock_code,
+                    KLineBar.interval == interval,
+                    KLineBar.adjust == adjust
+                ).order_by(KLineBar.bar_time.desc()).limit(self.max_bars_in_memory).all()
+                return [_bar_to_dict(row) for row in reversed(rows)]
+        except Exception as e:
+            logger.error(f"加载本地K线失败 ({stock_code}): {e}")
+            return []
+
+    def _save(self, key: Tuple[str, str, str], bars: List[Dict[str, Any]]):
+        """写入数据库（已存在的K线覆盖更新）"""
+        stock_code, interval, adjust = key
+        try:
+            with self.session_factory() as db:
+                bar_times = [str(bar.get('t')) for bar in bars]
+                existing = {
+                    row.bar_time: row for row in db.query(KLineBar).filter(
+                        KLineBar.stock_code == stock_code,
+                        KLineBar.interval == interval,
+                        KLineBar.adjust == adjust,
+                        KLineBar.bar_time.in_(bar_times)
+                    ).all()
+                }
+                for bar in bars:
+                    data = self._normalize(bar)
+                    row = existing.get(data['t'])
+                    if row is None:
+                        row = KLineBar(stock_code=stock_code, interval=interval, adjust=adjust, bar_time=data['t'])
+                        db.add(row)
+                    row.open = data['o']
+                    row.high = data['h']
+                    row.low = data['l']
+                    row.close = data['c']
+                    row.volume = data['v']
+                    row.amount = data['a']
+                    row.pre_close = data['pc']
+                    row.suspended = data['sf']
+                db.commit()
+        except Exception as e:
+            logger.error(f"保存本地K线失败 ({stock_code}): {e}")
@@ -0,0 +1,179 @@
+"""
+列式行情
+将一批 Quote 存放在 NumPy 结构化数组中，支持按股票代码索引和向量化计算（涨跌停价、持仓估值、批量序列化）
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .akshare_client import Quote
+
+# 数值列（与 Quote 属性同名）
+NUMERIC_FIELDS = (
+    'price', 'open_price', 'high', 'low', 'close_yesterday',
+    'change_percent', 'change_amount', 'volume', 'amount',
+)
+
+QUOTE_DTYPE = np.dtype([(name, np.float64) for name in NUMERIC_FIELDS])
+
+# Quote.to_dict() 的字段顺序
+QUOTE_FIELDS = ('code', 'name') + NUMERIC_FIELDS + ('timestamp',)
+
+
+def _round_price(values: np.ndarray) -> np.ndarray:
+    """价格保留两位小数
+
+    np.round 与内置 round() 对 13.585 这类乘法结果的舍入方向不同，
+    这里逐个使用 round()，保证与 TradingRules 的计算结果完全一致。
+    """
+    return np.array([round(v, 2) for v in values.tolist()], dtype=np.float64)
+
+
+class QuoteFrame:
+    """列式行情（只读）
+
+    - 迭代时返回原始 Quote 对象，可以直接替代 List[Quote]
+    - 数值列存放在结构化数组 data 中，按股票代码通过 index_of 定位行号
+    """
+
+    __slots__ = ('quotes', 'codes', 'names', 'timestamps', 'data', '_index')
+
+    def __init__(self, quotes: Sequence[Quote]):
+        """
+        Args:
+            quotes: 行情列表
+        """
+        self.quotes: List[Quote] = list(quotes)
+        self.codes: List[str] = [q.code for q in self.quotes]
+        self.names: List[str] = [q.name for q in self.quotes]
+        self.timestamps: List[str] = [q.timestamp.isoformat() for q in self.quotes]
+
+        self.data = np.empty(len(self.quotes), dtype=QUOTE_DTYPE)
+        for name in NUMERIC_FIELDS:
+            self.data[name] = [getattr(q, name) for q in self.quotes]
+
+        self._index: Dict[str, int] = {code: i for i, code in enumerate(self.codes)}
+
+    @classmethod
+    def ensure(cls, quotes: Union['QuoteFrame', Sequence[Quote]]) -> 'QuoteFrame':
+        """已经是 QuoteFrame 时直接返回，否则构建一个"""
+        return quotes if isinstance(quotes, QuoteFrame) else cls(quotes)
+
+    def __len__(self) -> int:
+        return len(self.quotes)
+
+    def __iter__(self) -> Iterator[Quote]:
+        return iter(self.quotes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._index
+
+    def get(self, code: str) -> Optional[Quote]:
+        """按股票代码获取 Quote"""
+        i = self._index.get(code)
+        return self.quotes[i] if i is not None else None
+
+    def index_of(self, codes: Sequence[str]) -> np.ndarray:
+        """股票代码对应的行号，不存在时为 -1"""
+        return np.fromiter((self._index.get(code, -1) for code in codes), dtype=np.intp, count=len(codes))
+
+    def column(self, name: str) -> np.ndarray:
+        """数值列"""
+        return self.data[name]
+
+    def prices_for(self, codes: Sequence[str]) -> np.ndarray:
+        """按给定顺序取最新价，没有行情的股票为 NaN"""
+        rows = self.index_of(codes)
+        prices = np.full(len(codes), np.nan)
+        found = rows >= 0
+        prices[found] = self.data['price'][rows[found]]
+        return prices
+
+    def price_map(self) -> Dict[str, float]:
+        """{股票代码: 最新价}"""
+        return dict(zip(self.codes, self.data['price'].tolist()))
+
+    def limit_prices(
+        self,
+        limit_normal: float = 0.10,
+        limit_st: float = 0.05,
+        is_st: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        计算全部股票的涨跌停价（规则与 TradingRules.check_price_limit 一致）
+
+        Args:
+            limit_normal: 普通股票涨跌停幅度
+            limit_st: ST股票涨跌停幅度
+            is_st: 每只股票是否为ST，默认按 TradingRules 的方式根据股票代码判断
+
+        Returns:
+            (涨停价数组, 跌停价数组)
+        """
+        if is_st is None:
+            is_st = np.fromiter(
+                ('ST' in code or code.startswith('*') for code in self.codes),
+                dtype=bool, count=len(self.codes)
+            )
+        limit = np.where(is_st, limit_st, limit_normal)
+        close_yesterday = self.data['close_yesterday']
+        return _round_price(close_yesterday * (1 + limit)), _round_price(close_yesterday * (1 - limit))
+
+    def revalue(
+        self,
+        codes: Sequence[str],
+        quantities: Sequence[float],
+        avg_costs: Sequence[float]
+    ) -> Dict[str, np.ndarray]:
+        """
+        按最新价批量计算持仓市值和盈亏
+
+        Args:
+            codes: 持仓股票代码
+            quantities: 持仓数量
+            avg_costs: 持仓成本价
+
+        Returns:
+            {'found': 是否有行情, 'price': 最新价, 'market_value': 市值,
+             'profit': 盈亏, 'profit_rate': 盈亏比例(%)}，没有行情的持仓对应位置为 NaN
+        """
+        prices = self.prices_for(codes)
+        quantities = np.asarray(quantities, dtype=np.float64)
+        cost_basis = np.asarray(avg_costs, dtype=np.float64) * quantities
+
+        market_value = prices * quantities
+        profit = market_value - cost_basis
+        with np.errstate(divide='ignore', invalid='ignore'):
+            profit_rate = np.where(cost_basis > 0, profit / cost_basis * 100, 0.0)
+        profit_rate[np.isnan(prices)] = np.nan
+
+        return {
+            'found': ~np.isnan(prices),
+            'price': prices,
+            'market_value': market_value,
+            'profit': profit,
+            'profit_rate': profit_rate,
+        }
+
+    def to_dicts(self, fields: Sequence[str] = QUOTE_FIELDS) -> List[Dict[str, Any]]:
+        """
+        批量转换为字典列表（字段与 Quote.to_dict() 一致）
+
+        Args:
+            fields: 需要输出的字段
+
+        Returns:
+            字典列表
+        """
+        columns = []
+        for name in fields:
+            if name == 'code':
+                columns.append(self.codes)
+            elif name == 'name':
+                columns.append(self.names)
+            elif name == 'timestamp':
+                columns.append(self.timestamps)
+            else:
+                columns.append(self.data[name].tolist())
+        return [dict(zip(fields, row)) for row in zip(*columns)]
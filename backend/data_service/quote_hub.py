@@ -0,0 +1,222 @@
+"""
+进程级行情中心
+统一负责实时行情的获取，所有消费者（REST接口、WebSocket、AI调度器）共享同一份最新快照
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from .akshare_client import AKShareClient, Quote
+from .bar_aggregator import BarAggregator
+from .quote_frame import QuoteFrame
+from .tick_buffer import TickBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteSnapshot:
+    """行情快照（只读）"""
+
+    __slots__ = ('version', 'quotes', 'frame', 'updated_at', '_monotonic')
+
+    def __init__(self, version: int, quotes: List[Quote], updated_at: Optional[datetime], monotonic: float = 0.0):
+        """
+        Args:
+            version: 快照版本号，每次发布新行情递增
+            quotes: 行情列表
+            updated_at: 更新时间
+            monotonic: 更新时的单调时钟读数（用于计算快照年龄）
+        """
+        self.version = version
+        self.quotes = quotes
+        self.frame = QuoteFrame(quotes)  # 列式视图，同一版本的所有消费者共享
+        self.updated_at = updated_at
+        self._monotonic = monotonic
+
+    @property
+    def age(self) -> float:
+        """快照年龄（秒），从未更新过时为无穷大"""
+        if self.updated_at is None:
+            return float('inf')
+        return time.monotonic() - self._monotonic
+
+
+class QuoteHub:
+    """行情中心
+
+    - 读取快照不会触发网络请求，也不会等待正在进行的获取
+    - 同一时刻最多只有一个上游请求；快照未过期时不会重复请求
+    - AI调度器的行情更新任务通过 refresh() 驱动获取，未启动调度器时由读取方按需刷新
+    - 每次发布的行情同时计入分时K线聚合器（bar_aggregator）和当日分笔缓冲（tick_buffer）
+    """
+
+    def __init__(
+        self,
+        data_client: Optional[AKShareClient] = None,
+        refresh_interval: float = 15,
+        stock_codes: Optional[List[str]] = None,
+        bar_aggregator: Optional[BarAggregator] = None,
+        tick_buffer: Optional[TickBuffer] = None
+    ):
+        """
+        Args:
+            data_client: 行情数据客户端
+            refresh_interval: 快照有效期（秒），超过后读取方会触发刷新
+            stock_codes: 关注的股票列表，默认使用可交易股票
+            bar_aggregator: 分时K线聚合器，默认新建一个（1/5/15分钟）
+            tick_buffer: 当日分笔缓冲，默认新建一个
+        """
+        self.data_client = data_client or AKShareClient()
+        self.refresh_interval = refresh_interval
+        self.stock_codes = stock_codes
+        self.bar_aggregator = bar_aggregator or BarAggregator()
+        self.tick_buffer = tick_buffer or TickBuffer()
+
+        self._lock = threading.RLock()  # 保护快照
+        self._fetch_lock = threading.Lock()  # 保证只有一个上游请求
+        self._updated = threading.Condition(self._lock)
+        self._snapshot = QuoteSnapshot(0, [], None)
+
+    @property
+    def lock(self) -> threading.RLock:
+        """快照锁（兼容 AIScheduler.quotes_lock 的用法）"""
+        return self._lock
+
+    def get_snapshot(self) -> QuoteSnapshot:
+        """获取当前快照（不阻塞、不触发网络请求）"""
+        with self._lock:
+            return self._snapshot
+
+    @property
+    def version(self) -> int:
+        """当前快照版本号"""
+        return self.get_snapshot().version
+
+    def publish(self, quotes: List[Quote]) -> QuoteSnapshot:
+        """
+        发布一批新行情
+
+        Args:
+            quotes: 行情列表
+
+        Returns:
+            新快照
+        """
+        with self._lock:
+            self._snapshot = QuoteSnapshot(
+                self._snapshot.version + 1,
+                list(quotes),
+                datetime.now(),
+                time.monotonic()
+            )
+            self._updated.notify_all()
+            snapshot = self._snapshot
+
+        try:
+            self.bar_aggregator.update(snapshot.frame)
+            self.tick_buffer.append(snapshot.frame)
+        except Exception as e:
+            logger.error(f"更新分时K线/分笔缓冲失败: {e}")
+        return snapshot
+
+    def refresh(self) -> QuoteSnapshot:
+        """
+        立即从上游获取一次行情并发布
+
+        已有请求在进行时会等待其完成并直接使用其结果，不会再发起新请求。
+
+        Returns:
+            最新快照（获取失败时为旧快照）
+        """
+        version_before = self.version
+        with self._fetch_lock:
+            # 等锁期间其他线程已经完成了一次获取
+            if self.version != version_before:
+                return self.get_snapshot()
+            return self._fetch()
+
+    def refresh_if_stale(self) -> QuoteSnapshot:
+        """
+        快照过期时触发刷新，否则直接返回当前快照
+
+        已有获取在进行时不等待，直接返回旧快照；
+        只有在从未获取过行情时才会等待正在进行的获取完成。
+
+        Returns:
+            当前快照
+        """
+        snapshot = self.get_snapshot()
+        if snapshot.age < self.refresh_interval:
+            return snapshot
+
+        if self._fetch_lock.acquire(blocking=False):
+            try:
+                # 双重检查：获取锁前可能刚被其他线程刷新
+                snapshot = self.get_snapshot()
+                if snapshot.age < self.refresh_interval:
+                    return snapshot
+                return self._fetch()
+            finally:
+                self._fetch_lock.release()
+
+        if snapshot.version == 0:
+            return self.refresh()
+        return snapshot
+
+    def get_quotes(self) -> List[Quote]:
+        """获取最新行情列表（过期时按需刷新）"""
+        return list(self.refresh_if_stale().quotes)
+
+    def wait_for_update(self, version: int, timeout: Optional[float] = None) -> QuoteSnapshot:
+        """
+        等待快照版本超过指定版本
+
+        Args:
+            version: 已知的版本号
+            timeout: 超时时间（秒）
+
+        Returns:
+            当前快照（超时时可能仍是旧版本）
+        """
+        with self._updated:
+            self._updated.wait_for(lambda: self._snapshot.version > version, timeout=timeout)
+            return self._snapshot
+
+    def _fetch(self) -> QuoteSnapshot:
+        """调用上游获取行情（调用方需持有 _fetch_lock）"""
+        stock_codes = self.stock_codes
+        if stock_codes is None:
+            from stock_config import TRADING_STOCKS
+            stock_codes = list(TRADING_STOCKS.keys())
+
+        try:
+            quotes = self.data_client.get_realtime_quotes(stock_codes)
+        except Exception as e:
+            logger.error(f"行情中心获取行情失败: {e}")
+            quotes = []
+
+        if not quotes:
+            logger.warning("⚠️  行情中心未获取到数据，继续使用旧快照")
+            return self.get_snapshot()
+
+        snapshot = self.publish(quotes)
+        logger.debug(f"行情中心发布快照 v{snapshot.version}：{len(quotes)} 只股票")
+        return snapshot
+
+
+# 进程级单例
+_quote_hub: Optional[QuoteHub] = None
+_quote_hub_lock = threading.Lock()
+
+
+def get_quote_hub() -> QuoteHub:
+    """获取进程级行情中心（首次调用时创建）"""
+    global _quote_hub
+    with _quote_hub_lock:
+        if _quote_hub is None:
+            _quote_hub = QuoteHub()
+            logger.info("QuoteHub initialized")
+        return _quote_hub
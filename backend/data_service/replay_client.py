@@ -0,0 +1,243 @@
+"""
+行情回放
+从 TickRecorder 录制的文件回放实时行情和五档盘口，接口与 AKShareClient 一致，
+配合可加速的虚拟时钟，可以离线跑完一个交易日（压测、性能基准、问题复现）
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from stock_config import TRADING_STOCKS, get_stock_name
+from .akshare_client import Quote, StockInfo
+from .quote_frame import NUMERIC_FIELDS
+from .tick_recorder import KIND_BOOKS, KIND_QUOTES, read_ticks, tick_file_path
+
+logger = logging.getLogger(__name__)
+
+# 录制字段到 Quote 构造参数的映射
+_QUOTE_KEYS = {
+    'price': '最新价',
+    'open_price': '今开',
+    'high': '最高',
+    'low': '最低',
+    'close_yesterday': '昨收',
+    'change_percent': '涨跌幅',
+    'change_amount': '涨跌额',
+    'volume': '成交量',
+    'amount': '成交额',
+}
+
+
+class VirtualClock:
+    """虚拟时钟
+
+    - speed > 0：从 start 开始按 speed 倍速流逝，sleep() 相应缩短
+    - speed == 0：时间冻结，只通过 sleep()/advance() 推进（逐步回放、单元测试）
+    """
+
+    def __init__(self, start: datetime, speed: float = 1.0):
+        """
+        Args:
+            start: 起始时间
+            speed: 倍速
+        """
+        self.start = start
+        self.speed = speed
+        self._origin = time.monotonic()
+        self._offset = 0.0
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        """当前虚拟时间"""
+        with self._lock:
+            elapsed = (time.monotonic() - self._origin) * self.speed + self._offset
+        return self.start + timedelta(seconds=elapsed)
+
+    def sleep(self, seconds: float):
+        """按虚拟时间休眠"""
+        if seconds <= 0:
+            return
+        if self.speed > 0:
+            time.sleep(seconds / self.speed)
+        else:
+            self.advance(seconds)
+
+    def advance(self, seconds: float):
+        """直接推进虚拟时间"""
+        with self._lock:
+            self._offset += seconds
+
+    def jump_to(self, moment: datetime):
+        """跳到指定时间（例如跳过午间休市）"""
+        self.advance((moment - self.now()).total_seconds())
+
+
+class _TickIndex:
+    """录制数据按股票代码的时间索引"""
+
+    def __init__(self, records: np.ndarray):
+        self.records = records
+        self.rows: Dict[str, np.ndarray] = {}
+        self.ts: Dict[str, np.ndarray] = {}
+        if len(records) == 0:
+            return
+        codes, inverse = np.unique(records['code'], return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(codes) + 1))
+        for i, code in enumerate(codes):
+            rows = order[bounds[i]:bounds[i + 1]]
+            rows = rows[np.argsort(records['ts'][rows], kind='stable')]
+            self.rows[code.decode()] = rows
+            self.ts[code.decode()] = records['ts'][rows]
+
+    def latest(self, code: str, ts: int) -> Optional[np.void]:
+        """code 在 ts 时刻（含）之前的最后一条记录"""
+        code_ts = self.ts.get(code)
+        if code_ts is None:
+            return None
+        i = np.searchsorted(code_ts, ts, side='right') - 1
+        return self.records[self.rows[code][i]] if i >= 0 else None
+
+
+class ReplayDataClient:
+    """回放行情客户端（实现 AKShareClient 的行情接口）
+
+    - 实时行情/五档盘口：返回虚拟时钟当前时刻之前最后一次录制的数据
+    - 历史K线：来自注入的K线数据，只返回当前交易日之前的K线（避免未来数据）
+    """
+
+    def __init__(
+        self,
+        root: str,
+        day: Union[str, date],
+        clock: Optional[VirtualClock] = None,
+        speed: float = 60.0,
+        klines: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    ):
+        """
+        Args:
+            root: 录制根目录（TickRecorder 的 root）
+            day: 回放日期（YYYYMMDD 或 date）
+            clock: 虚拟时钟，默认从当日第一条录制数据开始按 speed 倍速运行
+            speed: 默认时钟的倍速
+            klines: 日线数据 {股票代码: [Biying K线格式, ...]}，例如从 KLineStore 导出
+        """
+        self.day = day.strftime("%Y%m%d") if isinstance(day, date) else day
+        self.quotes = _TickIndex(read_ticks(tick_file_path(root, self.day, KIND_QUOTES), KIND_QUOTES))
+        self.books = _TickIndex(read_ticks(tick_file_path(root, self.day, KIND_BOOKS), KIND_BOOKS))
+        self.klines = klines or {}
+
+        if clock is None:
+            clock = VirtualClock(self.first_tick_time or datetime.strptime(self.day, "%Y%m%d"), speed)
+        self.clock = clock
+        logger.info(
+            f"ReplayDataClient 已加载 {self.day}: {len(self.quotes.records)} 条行情, "
+            f"{len(self.books.records)} 条盘口"
+        )
+
+    @property
+    def first_tick_time(self) -> Optional[datetime]:
+        """当日第一条行情的时间"""
+        if len(self.quotes.records) == 0:
+            return None
+        return datetime.fromtimestamp(int(self.quotes.records['ts'].min()) / 1e9)
+
+    @property
+    def last_tick_time(self) -> Optional[datetime]:
+        """当日最后一条行情的时间"""
+        if len(self.quotes.records) == 0:
+            return None
+        return datetime.fromtimestamp(int(self.quotes.records['ts'].max()) / 1e9)
+
+    @property
+    def exhausted(self) -> bool:
+        """虚拟时间是否已超过最后一条行情"""
+        last = self.last_tick_time
+        return last is None or self.clock.now() > last
+
+    def _now_ns(self) -> int:
+        return int(self.clock.now().timestamp() * 1e9)
+
+    def get_realtime_quotes(self, stock_codes: Optional[List[str]] = None) -> List[Quote]:
+        """
+        获取虚拟时钟当前时刻的实时行情
+
+        Args:
+            stock_codes: 股票代码列表，为None则获取所有可交易股票
+
+        Returns:
+            行情数据列表（没有录制数据的股票不包含在内）
+        """
+        if stock_codes is None:
+            stock_codes = list(TRADING_STOCKS.keys())
+        now_ns = self._now_ns()
+
+        quotes = []
+        for code in (code.split('.')[0] for code in stock_codes):
+            record = self.quotes.latest(code, now_ns)
+            if record is None:
+                continue
+            data = {_QUOTE_KEYS[name]: float(record[name]) for name in NUMERIC_FIELDS}
+            data['代码'] = code
+            data['名称'] = get_stock_name(code) or TRADING_STOCKS.get(code, code)
+            quote = Quote(data)
+            quote.timestamp = datetime.fromtimestamp(int(record['ts']) / 1e9)
+            quotes.append(quote)
+        return quotes
+
+    def get_stock_info(self, stock_code: str) -> Optional[Dict]:
+        """获取单个股票的实时信息"""
+        quotes = self.get_realtime_quotes([stock_code])
+        if quotes:
+            return quotes[0].to_dict()
+        return None
+
+    def get_order_book(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        """获取虚拟时钟当前时刻的五档盘口（格式与 AKShareClient.get_order_book 一致）"""
+        record = self.books.latest(stock_code.split('.')[0], self._now_ns())
+        if record is None:
+            return None
+        return {
+            "ask_prices": record['ask_prices'].tolist(),
+            "bid_prices": record['bid_prices'].tolist(),
+            "ask_volumes": record['ask_volumes'].tolist(),
+            "bid_volumes": record['bid_volumes'].tolist(),
+            "timestamp": datetime.fromtimestamp(int(record['ts']) / 1e9).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def get_historical_klines(
+        self,
+        stock_code: str,
+        interval: str = "d",
+        adjust: str = "n",
+        days: int = 5
+    ) -> Optional[List[Dict[str, Any]]]:
+        """获取回放日之前的最近N条日线（只支持日线）"""
+        if interval != 'd':
+            return None
+        bars = self.klines.get(stock_code.split('.')[0])
+        if not bars:
+            return None
+        today = self.clock.now().strftime("%Y-%m-%d")
+        history = [bar for bar in bars if str(bar.get('t', ''))[:10] < today]
+        return history[-days:]
+
+    def get_all_stock_list(self) -> List[StockInfo]:
+        """回放数据中的股票列表"""
+        return [StockInfo(code, get_stock_name(code) or code) for code in sorted(self.quotes.rows)]
+
+    @staticmethod
+    def available_days(root: str) -> List[str]:
+        """录制目录中有行情数据的日期"""
+        if not os.path.isdir(root):
+            return []
+        return sorted(
+            day for day in os.listdir(root)
+            if os.path.exists(tick_file_path(root, day, KIND_QUOTES))
+        )
@@ -0,0 +1,131 @@
+"""
+请求合并（single-flight）
+同一个键同一时刻只有一个上游请求，其他调用方等待并共享它的结果
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """按键合并并发请求（线程安全）
+
+    - do(): 单个键，领头的调用方执行请求，其余调用方等待同一结果（包括异常）
+    - do_many(): 多个键，只请求当前没有在途请求的键，其余键等待已有请求的结果
+    """
+
+    def __init__(self, wait_timeout: Optional[float] = 30.0):
+        """
+        Args:
+            wait_timeout: 跟随方等待在途请求的最长时间（秒），None 表示一直等待
+        """
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        """键是否有在途请求"""
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        执行请求；同一个键已有在途请求时等待它的结果
+
+        Args:
+            key: 请求键
+            fn: 实际请求函数
+
+        Returns:
+            请求结果（跟随方等待超时抛出 concurrent.futures.TimeoutError）
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            logger.debug(f"合并请求: {key}")
+            return future.result(timeout=self.wait_timeout)
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def do_many(
+        self,
+        keys: List[Hashable],
+        fn: Callable[[List[Hashable]], Dict[Hashable, Any]]
+    ) -> Dict[Hashable, Any]:
+        """
+        批量执行请求；已有在途请求的键等待其结果，其余键合并为一次请求
+
+        Args:
+            keys: 请求键列表
+            fn: 实际请求函数，参数为需要请求的键，返回 {键: 结果}（缺失的键视为没有结果）
+
+        Returns:
+            {键: 结果}，只包含有结果的键；等待的请求失败或超时时对应的键缺失
+        """
+        owned: Dict[Hashable, Future] = {}
+        waiting: Dict[Hashable, Future] = {}
+        with self._lock:
+            for key in keys:
+                future = self._calls.get(key)
+                if future is None:
+                    future = Future()
+                    self._calls[key] = future
+                    owned[key] = future
+                elif key not in owned:
+                    waiting[key] = future
+
+        results: Dict[Hashable, Any] = {}
+        if owned:
+            try:
+                fetched = fn(list(owned)) or {}
+            except BaseException as e:
+                for future in owned.values():
+                    future.set_exception(e)
+                raise
+            else:
+                for key, future in owned.items():
+                    value = fetched.get(key)
+                    future.set_result(value)
+                    if value is not None:
+                        results[key] = value
+            finally:
+                with self._lock:
+                    for key in owned:
+                        self._calls.pop(key, None)
+
+        if waiting:
+            logger.debug(f"合并请求: {len(waiting)} 个键等待在途请求")
+        deadline = None if self.wait_timeout is None else time.monotonic() + self.wait_timeout
+        for key, future in waiting.items():
+            try:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                value = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                logger.warning(f"等待在途请求超时: {key}")
+                continue
+            except Exception as e:
+                logger.warning(f"在途请求失败: {key} ({e})")
+                continue
+            if value is not None:
+                results[key] = value
+        return results
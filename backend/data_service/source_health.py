@@ -0,0 +1,143 @@
+"""
+上游数据源健康状态
+按数据源统计最近请求的耗时和失败率，连续失败或失败率过高时熔断一段时间，冷却后由后台探测恢复
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'        # 正常
+STATE_OPEN = 'open'            # 熔断中，请求直接跳过
+STATE_HALF_OPEN = 'half_open'  # 冷却结束，正在探测
+
+
+class SourceHealth:
+    """单个数据源的熔断器（线程安全）
+
+    - 连续失败达到 max_consecutive_failures，或最近 window 次请求的失败率达到 error_rate_threshold 时熔断
+    - 熔断期间 allow_request() 返回 False，调用方直接使用备用数据源
+    - 冷却 cooldown 秒后 begin_probe() 返回 True（只返回一次），由调用方在后台发起一次探测请求，
+      探测成功恢复正常，失败则重新熔断
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 50,
+        min_calls: int = 5,
+        error_rate_threshold: float = 0.5,
+        max_consecutive_failures: int = 3,
+        cooldown: float = 60.0
+    ):
+        """
+        Args:
+            name: 数据源名称
+            window: 统计最近多少次请求
+            min_calls: 按失败率熔断前至少需要的请求次数
+            error_rate_threshold: 熔断的失败率阈值
+            max_consecutive_failures: 熔断的连续失败次数
+            cooldown: 熔断后的冷却时间（秒）
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.max_consecutive_failures = max_consecutive_failures
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._results: deque = deque(maxlen=window)    # 最近请求是否成功
+        self._latencies: deque = deque(maxlen=window)  # 最近请求耗时（毫秒）
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.total_calls = 0
+        self.total_failures = 0
+        self.trip_count = 0
+        self.last_error: Optional[str] = None
+        self._opened_at = 0.0
+
+    def allow_request(self) -> bool:
+        """当前是否可以请求该数据源"""
+        with self._lock:
+            return self.state == STATE_CLOSED
+
+    def begin_probe(self) -> bool:
+        """冷却结束时进入探测状态；返回 True 表示调用方应发起一次探测请求"""
+        with self._lock:
+            if self.state == STATE_OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = STATE_HALF_OPEN
+                return True
+            return False
+
+    def record_success(self, latency_ms: float):
+        """记录一次成功请求"""
+        with self._lock:
+            self._record(True, latency_ms)
+            self.consecutive_failures = 0
+            if self.state != STATE_CLOSED:
+                logger.info(f"数据源 {self.name} 已恢复")
+                self.state = STATE_CLOSED
+                self._results.clear()
+
+    def record_failure(self, latency_ms: float, error: Any = None):
+        """记录一次失败请求"""
+        with self._lock:
+            self._record(False, latency_ms)
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.last_error = str(error) if error is not None else None
+
+            if self.state == STATE_HALF_OPEN:
+                self._trip("探测失败")
+            elif self.state == STATE_CLOSED:
+                if self.consecutive_failures >= self.max_consecutive_failures:
+                    self._trip(f"连续失败 {self.consecutive_failures} 次")
+                elif len(self._results) >= self.min_calls and self._error_rate() >= self.error_rate_threshold:
+                    self._trip(f"失败率 {self._error_rate():.0%}")
+
+    def _record(self, success: bool, latency_ms: float):
+        self._results.append(success)
+        self._latencies.append(latency_ms)
+        self.total_calls += 1
+
+    def _error_rate(self) -> float:
+        if not self._results:
+            return 0.0
+        return 1 - sum(self._results) / len(self._results)
+
+    def _trip(self, reason: str):
+        self.state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self.trip_count += 1
+        logger.warning(f"⚠️ 数据源 {self.name} 熔断 {self.cooldown:.0f} 秒（{reason}）: {self.last_error}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """健康状态与最近请求的耗时统计"""
+        with self._lock:
+            latencies = np.array(self._latencies, dtype=np.float64)
+            cooldown_remaining = 0.0
+            if self.state == STATE_OPEN:
+                cooldown_remaining = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+            return {
+                'name': self.name,
+                'state': self.state,
+                'error_rate': round(self._error_rate(), 4),
+                'consecutive_failures': self.consecutive_failures,
+                'total_calls': self.total_calls,
+                'total_failures': self.total_failures,
+                'trip_count': self.trip_count,
+                'cooldown_remaining': round(cooldown_remaining, 1),
+                'last_error': self.last_error,
+                'latency_ms': {
+                    'avg': round(float(latencies.mean()), 1) if len(latencies) else None,
+                    'p50': round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+                    'p95': round(float(np.percentile(latencies, 95)), 1) if len(latencies) else None,
+                    'max': round(float(latencies.max()), 1) if len(latencies) else None,
+                },
+            }
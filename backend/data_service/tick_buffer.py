@@ -0,0 +1,209 @@
+"""
+分笔行情缓冲
+按股票保存当日每次轮询得到的 (时间, 价格, 累计成交量, 累计成交额)，
+预分配的环形数组支持 O(1) 追加和零拷贝的"最近N笔/最近N分钟"切片，供撮合、提示词和推送使用
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .quote_frame import QuoteFrame
+
+logger = logging.getLogger(__name__)
+
+# ts 为 Unix 秒（浮点）
+TICK_DTYPE = np.dtype([
+    ('ts', np.float64),
+    ('price', np.float64),
+    ('volume', np.float64),
+    ('amount', np.float64),
+])
+
+
+class TickRing:
+    """单只股票的分笔环形缓冲区
+
+    底层数组长度为 2 × capacity，每笔同时写入 i 和 i + capacity 两个位置，
+    因此最近任意 N 笔（N <= capacity）总是一段连续内存，view() 直接返回切片而不复制。
+    """
+
+    __slots__ = ('capacity', 'data', 'pos', 'count')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros(2 * capacity, dtype=TICK_DTYPE)
+        self.pos = 0    # 下一笔的写入位置（0 ~ capacity-1）
+        self.count = 0
+
+    def append(self, ts: float, price: float, volume: float, amount: float):
+        """追加一笔（写满后覆盖最早的一笔）"""
+        record = (ts, price, volume, amount)
+        self.data[self.pos] = record
+        self.data[self.pos + self.capacity] = record
+        self.pos = (self.pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    @property
+    def last_ts(self) -> Optional[float]:
+        return float(self.data[self.pos + self.capacity - 1]['ts']) if self.count else None
+
+    def view(self, count: Optional[int] = None) -> np.ndarray:
+        """最近 count 笔（按时间正序的只读视图，默认全部）"""
+        n = self.count if count is None else max(0, min(count, self.count))
+        end = self.pos + self.capacity
+        view = self.data[end - n:end]
+        view.flags.writeable = False
+        return view
+
+    def clear(self):
+        self.pos = 0
+        self.count = 0
+
+
+class TickBuffer:
+    """当日分笔行情缓冲（线程安全）
+
+    - append() 接收每轮轮询的行情，行情时间没有变化（缓存中的同一笔）时不重复写入
+    - 日期变化时清空前一日的数据，内存占用固定为 股票数 × 2 × capacity 笔
+    - 返回的视图直接引用缓冲区，写满回绕后会被新数据覆盖，需要长期保留时请 copy()
+    """
+
+    def __init__(self, capacity: int = 1200):
+        """
+        Args:
+            capacity: 每只股票保留的笔数（15秒轮询一次时 960 笔即一个完整交易日）
+        """
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._rings: Dict[str, TickRing] = {}
+        self._days: Dict[str, str] = {}
+
+    @property
+    def symbols(self) -> List[str]:
+        """有数据的股票代码"""
+        with self._lock:
+            return [code for code, ring in self._rings.items() if ring.count]
+
+    def append(self, quotes) -> int:
+        """
+        追加一批实时行情
+
+        Args:
+            quotes: QuoteFrame 或行情列表
+
+        Returns:
+            实际写入的笔数
+        """
+        frame = QuoteFrame.ensure(quotes)
+        if not len(frame):
+            return 0
+        prices = frame.column('price').tolist()
+        volumes = frame.column('volume').tolist()
+        amounts = frame.column('amount').tolist()
+
+        written = 0
+        with self._lock:
+            for i, quote in enumerate(frame.quotes):
+                if not prices[i] or prices[i] <= 0:
+                    continue
+                ring = self._rings.get(quote.code)
+                if ring is None:
+                    ring = self._rings[quote.code] = TickRing(self.capacity)
+                day = quote.timestamp.strftime("%Y%m%d")
+                if self._days.get(quote.code) != day:
+                    ring.clear()
+                    self._days[quote.code] = day
+                ts = quote.timestamp.timestamp()
+                last_ts = ring.last_ts
+                if last_ts is not None and ts <= last_ts:
+                    continue
+                ring.append(ts, prices[i], volumes[i] or 0.0, amounts[i] or 0.0)
+                written += 1
+        return written
+
+    def view(self, stock_code: str, count: Optional[int] = None) -> np.ndarray:
+        """
+        最近 count 笔（TICK_DTYPE 只读视图，按时间正序）
+
+        Args:
+            stock_code: 股票代码
+            count: 笔数，默认全部
+        """
+        with self._lock:
+            ring = self._rings.get(stock_code.split('.')[0])
+            return ring.view(count) if ring is not None else np.zeros(0, dtype=TICK_DTYPE)
+
+    def since(self, stock_code: str, since: datetime, until: Optional[datetime] = None) -> np.ndarray:
+        """since（不含）之后、until（不含）之前的所有笔（只读视图）"""
+        ticks = self.view(stock_code)
+        start = np.searchsorted(ticks['ts'], since.timestamp(), side='right')
+        stop = len(ticks) if until is None else np.searchsorted(ticks['ts'], until.timestamp(), side='left')
+        return ticks[start:stop]
+
+    def last_minutes(self, stock_code: str, minutes: float, now: Optional[datetime] = None) -> np.ndarray:
+        """
+        最近 minutes 分钟内的所有笔（只读视图）
+
+        Args:
+            stock_code: 股票代码
+            minutes: 分钟数
+            now: 截止时间，默认为该股票最后一笔的时间
+        """
+        ticks = self.view(stock_code)
+        if not len(ticks):
+            return ticks
+        end = now.timestamp() if now is not None else ticks['ts'][-1]
+        start = np.searchsorted(ticks['ts'], end - minutes * 60, side='left')
+        stop = np.searchsorted(ticks['ts'], end, side='right')
+        return ticks[start:stop]
+
+    def price_range(
+        self, stock_code: str, since: datetime, until: Optional[datetime] = None
+    ) -> Optional[Tuple[float, float]]:
+        """since 之后（until 之前）的 (最低价, 最高价)，没有数据时返回None"""
+        ticks = self.since(stock_code, since, until)
+        if not len(ticks):
+            return None
+        prices = ticks['price']
+        return float(prices.min()), float(prices.max())
+
+    def crossed(
+        self, stock_code: str, level: float, direction: str, since: datetime, until: Optional[datetime] = None
+    ) -> bool:
+        """
+        since 之后（until 之前）价格是否触及 level
+
+        Args:
+            stock_code: 股票代码
+            level: 价格
+            direction: 'buy' 检查是否跌到 level 及以下，'sell' 检查是否涨到 level 及以上
+            since: 起始时间（不含）
+            until: 截止时间（不含），默认不限
+        """
+        price_range = self.price_range(stock_code, since, until)
+        if price_range is None:
+            return False
+        low, high = price_range
+        return low <= level if direction == 'buy' else high >= level
+
+    def change_pct(self, stock_codes: Sequence[str], minutes: float) -> Dict[str, Optional[float]]:
+        """
+        最新价相对 minutes 分钟前的涨跌幅（%）
+
+        Returns:
+            {股票代码: 涨跌幅}，数据不足 minutes 分钟时为None
+        """
+        result = {}
+        for code in stock_codes:
+            ticks = self.view(code)
+            value = None
+            if len(ticks) >= 2:
+                i = np.searchsorted(ticks['ts'], ticks['ts'][-1] - minutes * 60, side='right') - 1
+                if i >= 0 and ticks['price'][i] > 0:
+                    value = round(float(ticks['price'][-1] / ticks['price'][i] - 1) * 100, 2)
+            result[code] = value
+        return result
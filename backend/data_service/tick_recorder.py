@@ -0,0 +1,236 @@
+"""
+行情录制
+将每次从上游获取的实时行情和五档盘口追加写入按日分区的二进制文件（定长记录，可用 np.memmap 直接读取），
+写入由后台线程完成，获取行情的线程只做一次入队
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .akshare_client import Quote
+from .quote_frame import NUMERIC_FIELDS
+
+logger = logging.getLogger(__name__)
+
+KIND_QUOTES = 'quotes'
+KIND_BOOKS = 'books'
+
+BOOK_LEVELS = 5
+
+# 定长记录格式（小端，文件即记录数组，没有文件头）
+QUOTE_RECORD = np.dtype(
+    [('ts', '<i8'), ('code', 'S8')] + [(name, '<f8') for name in NUMERIC_FIELDS]
+)
+
+BOOK_RECORD = np.dtype([
+    ('ts', '<i8'),
+    ('code', 'S8'),
+    ('ask_prices', '<f8', (BOOK_LEVELS,)),    # 卖五到卖一
+    ('ask_volumes', '<f8', (BOOK_LEVELS,)),
+    ('bid_prices', '<f8', (BOOK_LEVELS,)),    # 买一到买五
+    ('bid_volumes', '<f8', (BOOK_LEVELS,)),
+])
+
+RECORD_DTYPES = {KIND_QUOTES: QUOTE_RECORD, KIND_BOOKS: BOOK_RECORD}
+
+
+def tick_file_path(root: str, day: str, kind: str) -> str:
+    """录制文件路径：{root}/{YYYYMMDD}/{kind}.bin"""
+    return os.path.join(root, day, f"{kind}.bin")
+
+
+def read_ticks(path: str, kind: str) -> np.ndarray:
+    """
+    以内存映射方式读取录制文件
+
+    Args:
+        path: 文件路径
+        kind: quotes / books
+
+    Returns:
+        只读的记录数组（末尾不完整的记录会被忽略）
+    """
+    dtype = RECORD_DTYPES[kind]
+    count = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def _levels(values: List[Any]) -> List[float]:
+    """盘口一侧补齐/截断为5档"""
+    values = [float(v or 0) for v in (values or [])][:BOOK_LEVELS]
+    return values + [0.0] * (BOOK_LEVELS - len(values))
+
+
+class TickRecorder:
+    """行情录制器
+
+    - record_quotes / record_order_book 只把数据放入队列，不做格式转换和磁盘IO
+    - 后台线程批量转换为定长记录并追加到当日文件
+    - 队列满时丢弃新数据并计数，不阻塞行情获取
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_queue: int = 10000,
+        flush_interval: float = 1.0
+    ):
+        """
+        Args:
+            root: 录制根目录
+            max_queue: 队列最大长度
+            flush_interval: 后台线程最长多久写一次磁盘（秒）
+        """
+        self.root = root
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.written = {KIND_QUOTES: 0, KIND_BOOKS: 0}
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._files: Dict[Tuple[str, str], Any] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="TickRecorder", daemon=True)
+        self._thread.start()
+        logger.info(f"TickRecorder 已启动，录制目录: {root}")
+
+    def record_quotes(self, quotes: List[Quote]):
+        """录制一批实时行情"""
+        if quotes:
+            self._put((KIND_QUOTES, time.time_ns(), list(quotes)))
+
+    def record_order_book(self, stock_code: str, order_book: Dict[str, Any]):
+        """录制一只股票的五档盘口"""
+        if order_book:
+            self._put((KIND_BOOKS, time.time_ns(), (stock_code, order_book)))
+
+    def _put(self, item: Tuple):
+        if self._stopped.is_set():
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # 多个获取行情的线程会同时录制，计数需要加锁
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def flush(self, timeout: float = 5.0):
+        """等待队列中已有的数据写入磁盘"""
+        done = threading.Event()
+        self._queue.put((None, 0, done))
+        done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """写完剩余数据并停止后台线程"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._queue.put((None, 0, None))
+        self._thread.join(timeout)
+        if self.dropped:
+            logger.warning(f"TickRecorder 队列满，共丢弃 {self.dropped} 批数据")
+
+    def _run(self):
+        """后台写入线程：攒批后按 日期/类型 追加写入"""
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < 1000:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            stop = False
+            waiters = []
+            records: Dict[Tuple[str, str], List[Tuple]] = {}
+            for kind, ts, payload in batch:
+                if kind is None:
+                    if payload is None:
+                        stop = True
+                    else:
+                        waiters.append(payload)
+                    continue
+                day = datetime.fromtimestamp(ts / 1e9).strftime("%Y%m%d")
+                records.setdefault((day, kind), []).extend(self._to_rows(kind, ts, payload))
+
+            for (day, kind), rows in records.items():
+                try:
+                    self._append(day, kind, np.array(rows, dtype=RECORD_DTYPES[kind]))
+                except Exception as e:
+                    logger.error(f"写入行情录制文件失败 ({day}/{kind}): {e}")
+
+            for handle in self._files.values():
+                handle.flush()
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                break
+
+        for handle in self._files.values():
+            handle.close()
+        self._files.clear()
+
+    def _to_rows(self, kind: str, ts: int, payload: Any) -> List[Tuple]:
+        """转换为记录行"""
+        if kind == KIND_QUOTES:
+            return [
+                (ts, q.code.encode()) + tuple(float(getattr(q, name) or 0) for name in NUMERIC_FIELDS)
+                for q in payload
+            ]
+        stock_code, book = payload
+        return [(
+            ts, stock_code.encode(),
+            _levels(book.get('ask_prices')), _levels(book.get('ask_volumes')),
+            _levels(book.get('bid_prices')), _levels(book.get('bid_volumes')),
+        )]
+
+    def _append(self, day: str, kind: str, records: np.ndarray):
+        """追加写入当日文件（日期变化时关闭前一天的文件）"""
+        key = (day, kind)
+        handle = self._files.get(key)
+        if handle is None:
+            for old_key in [k for k in self._files if k[1] == kind]:
+                self._files.pop(old_key).close()
+            path = tick_file_path(self.root, day, kind)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handle = open(path, 'ab')
+            self._files[key] = handle
+        handle.write(records.tobytes())
+        self.written[kind] += len(records)
+
+
+# 进程级单例（配置开启录制时由行情客户端共享）
+_tick_recorder: Optional[TickRecorder] = None
+_tick_recorder_lock = threading.Lock()
+
+
+def get_tick_recorder() -> Optional[TickRecorder]:
+    """获取进程级行情录制器，未开启录制时返回None"""
+    global _tick_recorder
+    from config import settings
+    if not settings.tick_recorder_enabled:
+        return None
+    with _tick_recorder_lock:
+        if _tick_recorder is None:
+            _tick_recorder = TickRecorder(settings.tick_recorder_dir)
+        return _tick_recorder
+
+
+def close_tick_recorder():
+    """关闭进程级行情录制器（应用退出时调用）"""
+    global _tick_recorder
+    with _tick_recorder_lock:
+        if _tick_recorder is not None:
+            _tick_recorder.close()
+            _tick_recorder = None
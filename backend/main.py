@@ -29,6 +29,7 @@ from config import settings
 from database import init_db, get_db_session
 from api.routes import router
 from data_service.akshare_client import AKShareClient
+from data_service.quote_hub import get_quote_hub
 from rules.trading_rules import TradingRules
 from portfolio.portfolio_manager import PortfolioManager
 from trading_engine.order_manager import OrderManager
@@ -63,6 +64,10 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down application...")
     if scheduler:
         scheduler.stop()
+    from data_service.async_client import get_async_market_client
+    from data_service.tick_recorder import close_tick_recorder
+    await get_async_market_client().aclose()
+    close_tick_recorder()
     logger.info("Application shutdown complete")
 
 
@@ -104,8 +109,8 @@ def debug_scheduler():
             "scheduler_exists": scheduler is not None,
             "scheduler_type": type(scheduler).__name__ if scheduler else None,
             "is_running": scheduler.is_running if scheduler else False,
-            "has_thread": scheduler.schedule_thread is not None if scheduler else False,
-            "thread_alive": scheduler.schedule_thread.is_alive() if scheduler and scheduler.schedule_thread else False,
+            "thread_alive": scheduler.job_scheduler.is_running if scheduler and scheduler.job_scheduler else False,
+            "jobs": scheduler.get_status()["jobs"] if scheduler else [],
             "scheduler_object": str(scheduler) if scheduler else None,
         }
     except Exception as e:
@@ -169,6 +174,9 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+# 交易WebSocket推送的行情字段
+TRADING_QUOTE_FIELDS = ('code', 'name', 'price', 'change_percent')
+
 
 @app.websocket("/ws/market")
 async def websocket_market(websocket: WebSocket):
@@ -176,21 +184,26 @@ async def websocket_market(websocket: WebSocket):
     await manager.connect(websocket)
     
     try:
-        # 定期推送市场数据
-        akshare_client = AKShareClient()
+        # 定期推送市场数据（来自进程级行情中心，不单独请求上游）
+        quote_hub = get_quote_hub()
+        last_version = None
         
         while True:
-            # 获取实时行情
-            from stock_config import TRADING_STOCKS
-            quotes = akshare_client.get_realtime_quotes(TRADING_STOCKS)
+            # 获取实时行情（快照过期时由行情中心统一刷新）
+            snapshot = await asyncio.to_thread(quote_hub.refresh_if_stale)
             
-            await websocket.send_json({
-                "type": "market_update",
-                "data": {
-                    "timestamp": quotes[0].timestamp.isoformat() if quotes else None,
-                    "quotes": [q.to_dict() for q in quotes]
-                }
-            })
+            if snapshot.version != last_version:
+                quotes = snapshot.quotes
+                await websocket.send_json({
+                    "type": "market_update",
+                    "data": {
+                        "timestamp": quotes[0].timestamp.isoformat() if quotes else None,
+                        "version": snapshot.version,
+                        "quotes": snapshot.frame.to_dicts(),
+                        "changes_5m": quote_hub.tick_buffer.change_pct(snapshot.frame.codes, 5)
+                    }
+                })
+                last_version = snapshot.version
             
             await asyncio.sleep(10)  # 每10秒更新一次
             
@@ -246,21 +259,11 @@ async def websocket_trading(websocket: WebSocket):
                     'created_at': order.created_at.isoformat()
                 } for order in ai_orders])
 
-            # 获取最新行情数据
-            from data_service.akshare_client import AKShareClient
-            from stock_config import TRADING_STOCKS
-            
-            data_client = AKShareClient()
-            stock_codes = list(TRADING_STOCKS.keys())
-            quotes_data = data_client.get_realtime_quotes(stock_codes)
+            # 获取最新行情数据（来自进程级行情中心）
+            snapshot = await asyncio.to_thread(get_quote_hub().refresh_if_stale)
             
             # 转换为前端需要的格式
-            quotes = [{
-                'code': quote.code,
-                'name': quote.name,
-                'price': quote.price,
-                'change_percent': quote.change_percent
-            } for quote in quotes_data]
+            quotes = snapshot.frame.to_dicts(TRADING_QUOTE_FIELDS)
 
             await websocket.send_json({
                 "type": "trading_update",
@@ -268,7 +271,8 @@ async def websocket_trading(websocket: WebSocket):
                     "timestamp": datetime.now().isoformat(),
                     "portfolios": portfolios,
                     "orders": orders,
-                    "quotes": quotes  # 添加行情数据
+                    "quotes": quotes,  # 添加行情数据
+                    "quotes_version": snapshot.version
                 }
             })
 
@@ -310,21 +314,11 @@ async def websocket_trading(websocket: WebSocket):
                         'created_at': order.created_at.isoformat()
                     } for order in ai_orders])
 
-                # 获取最新行情数据
-                from data_service.akshare_client import AKShareClient
-                from stock_config import TRADING_STOCKS
-                
-                data_client = AKShareClient()
-                stock_codes = list(TRADING_STOCKS.keys())
-                quotes_data = data_client.get_realtime_quotes(stock_codes)
+                # 获取最新行情数据（快照未过期时不请求上游）
+                snapshot = await asyncio.to_thread(get_quote_hub().refresh_if_stale)
                 
                 # 转换为前端需要的格式
-                quotes = [{
-                    'code': quote.code,
-                    'name': quote.name,
-                    'price': quote.price,
-                    'change_percent': quote.change_percent
-                } for quote in quotes_data]
+                quotes = snapshot.frame.to_dicts(TRADING_QUOTE_FIELDS)
 
                 await websocket.send_json({
                     "type": "trading_update",
@@ -332,7 +326,8 @@ async def websocket_trading(websocket: WebSocket):
                         "timestamp": datetime.now().isoformat(),
                         "portfolios": portfolios,
                         "orders": orders,
-                        "quotes": quotes  # 持续推送行情数据
+                        "quotes": quotes,  # 持续推送行情数据
+                        "quotes_version": snapshot.version
                     }
                 })
 
@@ -546,8 +541,9 @@ async def start_trading(force_run: bool = False):
         logger.info("=== 开始初始化交易系统组件 ===")
 
         # 初始化组件（在session外面）
-        logger.info("初始化AKShare客户端...")
-        akshare_client = AKShareClient()
+        logger.info("初始化AKShare客户端（复用行情中心的数据源）...")
+        quote_hub = get_quote_hub()
+        akshare_client = quote_hub.data_client
 
         logger.info("初始化交易规则...")
         trading_rules = TradingRules()
@@ -561,7 +557,8 @@ async def start_trading(force_run: bool = False):
 
             logger.info("初始化订单匹配引擎...")
             matching_engine = MatchingEngine(
-                db, trading_rules, portfolio_manager, akshare_client
+                db, trading_rules, portfolio_manager, akshare_client,
+                tick_buffer=quote_hub.tick_buffer
             )
 
             logger.info("创建AI调度器...")
@@ -576,7 +573,8 @@ async def start_trading(force_run: bool = False):
                 decision_interval=1800,        # AI决策：30分钟 = 1800秒
                 matching_interval=15,          # 订单撮合：15秒
                 llm_timeout=settings.llm_timeout,
-                force_run=force_run            # 是否强制运行（测试模式）
+                force_run=force_run,           # 是否强制运行（测试模式）
+                quote_hub=quote_hub            # 与WebSocket/REST共享行情中心
             )
 
             logger.info(f"调度器创建完成，is_running初始状态: {scheduler.is_running}")
@@ -616,13 +614,15 @@ def get_system_status():
         active_ais = db.query(AI).filter(AI.is_active == True).count()
 
     is_running = scheduler.is_running if scheduler else False
-    trading_time = TradingRules().check_trading_time()
+    calendar = TradingRules().calendar
+    trading_time = calendar.is_trading_time()
 
     logger.info(f"系统状态: is_running={is_running}, trading_time={trading_time}, total_ais={total_ais}, active_ais={active_ais}")
 
     return {
         "is_running": is_running,
         "trading_time": trading_time,
+        "next_session_start": None if trading_time else calendar.next_session_start().isoformat(),
         "total_ais": total_ais,
         "active_ais": active_ais
     }
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+数据库迁移：为AI表添加decision_interval/decision_offset字段
+支持按AI设置决策间隔和相位，调度器据此错开各AI的决策时间
+"""
+
+from database import get_db_session
+from models.models import AI
+from sqlalchemy import text
+
+NEW_COLUMNS = {
+    'decision_interval': 'INTEGER',
+    'decision_offset': 'INTEGER',
+}
+
+
+def migrate():
+    """执行迁移"""
+    print("=" * 60)
+    print("📦 数据库迁移：添加 decision_interval / decision_offset 字段")
+    print("=" * 60)
+
+    with get_db_session() as db:
+        try:
+            # 1. 检查字段是否已存在
+            result = db.execute(text("PRAGMA table_info(ai)")).fetchall()
+            columns = [row[1] for row in result]
+
+            missing = [name for name in NEW_COLUMNS if name not in columns]
+            if not missing:
+                print("✅ decision_interval / decision_offset 字段已存在，无需迁移")
+                return
+
+            # 2. 添加新字段（保持为空：使用调度器的默认间隔，并自动错开相位）
+            for name in missing:
+                print(f"\n📝 添加 {name} 字段...")
+                db.execute(text(f"ALTER TABLE ai ADD COLUMN {name} {NEW_COLUMNS[name]}"))
+
+            db.commit()
+
+            print("✅ 字段添加成功")
+
+            # 3. 验证迁移结果
+            ais = db.query(AI).all()
+            print(f"\n📊 验证迁移结果：")
+            print(f"   AI数量: {len(ais)}")
+
+            for ai in ais:
+                print(f"   - {ai.name}: decision_interval = {ai.decision_interval}, decision_offset = {ai.decision_offset}")
+
+            print("\n✅ 迁移完成！")
+            print("\n💡 提示：字段为空时使用默认决策间隔并自动错开，可按AI单独设置（单位：秒）")
+
+        except Exception as e:
+            print(f"❌ 迁移失败: {e}")
+            db.rollback()
+            raise
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+数据库迁移：为决策日志添加token用量明细和费用字段，为AI表添加每日预算字段
+决策日志记录服务商返回的真实token用量，调度器据此按AI控制每日用量
+"""
+
+from database import get_db_session
+from models.models import AI
+from sqlalchemy import text
+
+NEW_COLUMNS = {
+    'decision_log': {
+        'prompt_tokens': 'INTEGER',
+        'completion_tokens': 'INTEGER',
+        'cached_tokens': 'INTEGER',
+        'cost': 'FLOAT',
+    },
+    'ai': {
+        'daily_token_budget': 'INTEGER',
+        'daily_cost_budget': 'FLOAT',
+    },
+}
+
+
+def migrate():
+    """执行迁移"""
+    print("=" * 60)
+    print("📦 数据库迁移：添加token用量明细和每日预算字段")
+    print("=" * 60)
+
+    with get_db_session() as db:
+        try:
+            added = 0
+            for table, columns in NEW_COLUMNS.items():
+                # 1. 检查字段是否已存在
+                result = db.execute(text(f"PRAGMA table_info({table})")).fetchall()
+                existing = [row[1] for row in result]
+
+                # 2. 添加缺少的字段（保持为空：旧的决策日志没有用量明细，预算使用配置的默认值）
+                for name, column_type in columns.items():
+                    if name in existing:
+                        continue
+                    print(f"\n📝 添加 {table}.{name} 字段...")
+                    db.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+                    added += 1
+
+            if not added:
+                print("✅ 字段已存在，无需迁移")
+                return
+
+            db.commit()
+
+            print("✅ 字段添加成功")
+
+            # 3. 验证迁移结果
+            ais = db.query(AI).all()
+            print(f"\n📊 验证迁移结果：")
+            print(f"   AI数量: {len(ais)}")
+
+            for ai in ais:
+                print(f"   - {ai.name}: daily_token_budget = {ai.daily_token_budget}, daily_cost_budget = {ai.daily_cost_budget}")
+
+            print("\n✅ 迁移完成！")
+            print("\n💡 提示：预算为空时使用配置 AI_DAILY_TOKEN_BUDGET / AI_DAILY_COST_BUDGET，0 表示不限制；"
+                  "费用需要配置 LLM_TOKEN_PRICES")
+
+        except Exception as e:
+            print(f"❌ 迁移失败: {e}")
+            db.rollback()
+            raise
+
+if __name__ == "__main__":
+    migrate()
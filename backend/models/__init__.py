@@ -2,9 +2,9 @@
 数据库模型
 """
 
-from .models import Base, AI, Position, Order, Transaction, PortfolioSnapshot, DecisionLog
+from .models import Base, AI, Position, Order, Transaction, PortfolioSnapshot, DecisionLog, KLineBar
 
 __all__ = [
     'Base', 'AI', 'Position', 'Order', 'Transaction', 
-    'PortfolioSnapshot', 'DecisionLog'
+    'PortfolioSnapshot', 'DecisionLog', 'KLineBar'
 ]
@@ -2,7 +2,7 @@
 数据库模型定义
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, JSON, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -33,6 +33,14 @@ class AI(Base):
     win_count = Column(Integer, default=0)  # 盈利次数
     win_rate = Column(Float, default=0.0)  # 胜率(%)
     
+    # 决策时间表（为空时使用调度器的默认间隔，并在同一间隔的AI之间自动错开）
+    decision_interval = Column(Integer, nullable=True)  # 决策间隔（秒）
+    decision_offset = Column(Integer, nullable=True)  # 决策相位（秒，0 ~ 间隔）
+    
+    # 每日LLM用量预算（为空时使用配置的默认值，0 表示不限制）
+    daily_token_budget = Column(Integer, nullable=True)  # 每日token预算
+    daily_cost_budget = Column(Float, nullable=True)  # 每日费用预算（元）
+    
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -168,7 +176,11 @@ class DecisionLog(Base):
     
     # 性能指标
     latency_ms = Column(Integer)  # LLM响应延迟（毫秒）
-    tokens_used = Column(Integer)  # Token消耗
+    tokens_used = Column(Integer)  # Token消耗（服务商返回的总token数）
+    prompt_tokens = Column(Integer)  # 提示token数（含缓存命中）
+    completion_tokens = Column(Integer)  # 输出token数
+    cached_tokens = Column(Integer)  # 命中服务商提示缓存的token数
+    cost = Column(Float)  # 估算费用（元，未配置单价时为空）
     
     # 错误信息
     error = Column(Text)  # 错误信息
@@ -179,3 +191,26 @@ class DecisionLog(Base):
     ai = relationship("AI", back_populates="decision_logs")
 
 
+class KLineBar(Base):
+    """K线数据模型（本地K线库，按 股票/周期/复权方式 增量同步）"""
+    __tablename__ = 'kline_bar'
+    __table_args__ = (
+        UniqueConstraint('stock_code', 'interval', 'adjust', 'bar_time', name='uq_kline_bar'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    stock_code = Column(String(20), nullable=False, index=True)
+    interval = Column(String(10), nullable=False)  # 5/15/30/60/d/w/m/y
+    adjust = Column(String(10), nullable=False)  # n/f/b/fr/br
+    bar_time = Column(String(32), nullable=False)  # K线时间（Biying原始格式，字符串可直接排序）
+    
+    open = Column(Float, default=0.0)
+    high = Column(Float, default=0.0)
+    low = Column(Float, default=0.0)
+    close = Column(Float, default=0.0)
+    volume = Column(Float, default=0.0)  # 成交量
+    amount = Column(Float, default=0.0)  # 成交额
+    pre_close = Column(Float, default=0.0)  # 前收盘
+    suspended = Column(Integer, default=0)  # 停牌标记
+    
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -8,6 +8,8 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime, date
 import logging
 
+import numpy as np
+
 from models.models import AI, Position, Transaction
 from rules.trading_rules import TradingRules
 
@@ -352,6 +354,57 @@ class PortfolioManager:
         
         self.db.commit()
     
+    def revalue_all(self, quote_frame) -> int:
+        """
+        按最新行情批量更新所有AI的持仓市值和总资产（一次查询、向量化计算、一次提交）
+        
+        计算规则与 update_market_value 一致：没有行情的持仓保持不变，也不计入总资产
+        
+        Args:
+            quote_frame: 最新行情（QuoteFrame）
+            
+        Returns:
+            更新的AI数量
+        """
+        positions = self.db.query(Position).all()
+        ais = self.db.query(AI).all()
+        if not ais:
+            return 0
+        
+        ai_rows = {ai.id: i for i, ai in enumerate(ais)}
+        total_market_value = np.zeros(len(ais))
+        
+        if positions:
+            result = quote_frame.revalue(
+                [p.stock_code for p in positions],
+                [p.quantity for p in positions],
+                [p.avg_cost for p in positions]
+            )
+            found = result['found']
+            prices = result['price'].tolist()
+            market_values = result['market_value'].tolist()
+            profits = result['profit'].tolist()
+            profit_rates = result['profit_rate'].tolist()
+            
+            for i, position in enumerate(positions):
+                if found[i]:
+                    position.current_price = prices[i]
+                    position.market_value = market_values[i]
+                    position.profit = profits[i]
+                    position.profit_rate = profit_rates[i]
+            
+            owners = np.fromiter((ai_rows.get(p.ai_id, -1) for p in positions), dtype=np.intp, count=len(positions))
+            counted = found & (owners >= 0)
+            total_market_value = np.bincount(
+                owners[counted], weights=result['market_value'][counted], minlength=len(ais)
+            )
+        
+        for ai, market_value in zip(ais, total_market_value.tolist()):
+            ai.total_assets = ai.current_cash + market_value
+        
+        self.db.commit()
+        return len(ais)
+    
     def get_portfolio_snapshot(self, ai_id: int) -> Dict:
         """
         获取持仓快照（用于记录和展示）
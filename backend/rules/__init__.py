@@ -2,8 +2,9 @@
 A股交易规则引擎
 """
 
+from .trading_calendar import TradingCalendar, get_trading_calendar
 from .trading_rules import TradingRules
 
-__all__ = ['TradingRules']
+__all__ = ['TradingCalendar', 'TradingRules', 'get_trading_calendar']
 
 
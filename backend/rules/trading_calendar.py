@@ -0,0 +1,176 @@
+"""
+A股交易日历
+从本地文件加载交易所休市安排，预先计算每个交易时段的开盘/收盘时刻，
+用于判断是否在交易时间以及计算下一次开盘时间
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOLIDAYS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "holidays.json")
+
+# 连续竞价时段
+SESSIONS: List[Tuple[time, time]] = [
+    (time(9, 30), time(11, 30)),
+    (time(13, 0), time(15, 0)),
+]
+
+
+class TradingCalendar:
+    """交易日历
+
+    - 交易日：周一至周五且不在休市表中
+    - 休市表覆盖的年份内，所有交易时段的 (开盘, 收盘) 在加载时预先计算并排序，查询使用二分查找
+    - 超出休市表覆盖的年份时退化为只按周末判断（记录一次警告）
+    """
+
+    def __init__(self, holidays_file: Optional[str] = None, holidays: Optional[Set[date]] = None):
+        """
+        Args:
+            holidays_file: 休市表文件（JSON，{年份: ["YYYY-MM-DD", ...]}），默认使用 rules/holidays.json
+            holidays: 直接指定休市日（优先于文件，主要用于测试）
+        """
+        if holidays is None:
+            holidays, years = self._load(holidays_file or DEFAULT_HOLIDAYS_FILE)
+        else:
+            years = {d.year for d in holidays}
+        self.holidays: Set[date] = set(holidays)
+        self.years: Set[int] = years
+        self._warned_years: Set[int] = set()
+        self._lock = threading.Lock()
+
+        # 预计算休市表覆盖年份内的所有交易时段
+        self._opens: List[datetime] = []
+        self._closes: List[datetime] = []
+        for year in sorted(years):
+            day = date(year, 1, 1)
+            while day.year == year:
+                if self.is_trading_day(day):
+                    for open_time, close_time in SESSIONS:
+                        self._opens.append(datetime.combine(day, open_time))
+                        self._closes.append(datetime.combine(day, close_time))
+                day += timedelta(days=1)
+        logger.info(f"TradingCalendar initialized: {len(self.holidays)} 个休市日，覆盖 {sorted(years)}")
+
+    @staticmethod
+    def _load(path: str) -> Tuple[Set[date], Set[int]]:
+        """读取休市表，文件不存在或格式错误时返回空表"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data: Dict[str, List[str]] = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"休市表文件不存在: {path}，只按周末判断休市")
+            return set(), set()
+        except Exception as e:
+            logger.error(f"读取休市表失败 ({path}): {e}")
+            return set(), set()
+
+        holidays, years = set(), set()
+        for year, days in data.items():
+            if not year.isdigit():
+                continue
+            years.add(int(year))
+            holidays.update(datetime.strptime(day, "%Y-%m-%d").date() for day in days)
+        return holidays, years
+
+    def _covered(self, day: date) -> bool:
+        if day.year in self.years:
+            return True
+        with self._lock:
+            if day.year not in self._warned_years:
+                self._warned_years.add(day.year)
+                logger.warning(f"⚠️  休市表未包含 {day.year} 年，节假日将按交易日处理，请更新休市表")
+        return False
+
+    def is_trading_day(self, day: date) -> bool:
+        """是否为交易日"""
+        return day.weekday() < 5 and day not in self.holidays
+
+    def is_trading_time(self, moment: Optional[datetime] = None) -> bool:
+        """是否在交易时段内（开盘和收盘时刻都算在内）"""
+        moment = moment or datetime.now()
+        if not self.is_trading_day(moment.date()):
+            return False
+        if self._covered(moment.date()):
+            i = bisect.bisect_right(self._opens, moment) - 1
+            return i >= 0 and moment <= self._closes[i]
+        return any(
+            datetime.combine(moment.date(), open_time) <= moment <= datetime.combine(moment.date(), close_time)
+            for open_time, close_time in SESSIONS
+        )
+
+    def sessions(self, day: date) -> List[Tuple[datetime, datetime]]:
+        """某天的所有交易时段 [(开盘, 收盘), ...]，非交易日返回空列表"""
+        if not self.is_trading_day(day):
+            return []
+        return [(datetime.combine(day, o), datetime.combine(day, c)) for o, c in SESSIONS]
+
+    def next_session_start(self, after: Optional[datetime] = None) -> datetime:
+        """
+        after 之后（不含）的下一次开盘时刻（上午开盘或午后开盘）
+
+        Args:
+            after: 起始时间，默认为当前时间
+        """
+        after = after or datetime.now()
+        if self._covered(after.date()):
+            i = bisect.bisect_right(self._opens, after)
+            if i < len(self._opens):
+                return self._opens[i]
+        day = after.date()
+        while True:
+            for open_time, _ in SESSIONS:
+                moment = datetime.combine(day, open_time)
+                if moment > after and self.is_trading_day(day):
+                    return moment
+            day += timedelta(days=1)
+
+    def next_trading_day(self, day: date) -> date:
+        """day 之后（不含）的下一个交易日"""
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def previous_trading_day(self, day: date) -> date:
+        """day 之前（不含）的上一个交易日"""
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def describe(self, moment: Optional[datetime] = None) -> str:
+        """当前所处时段的说明（用于日志）"""
+        moment = moment or datetime.now()
+        if self.is_trading_time(moment):
+            return "上午交易时段" if moment.time() <= SESSIONS[0][1] else "下午交易时段"
+
+        next_open = self.next_session_start(moment)
+        if next_open.date() == moment.date():
+            if next_open.time() == SESSIONS[1][0]:
+                return f"午休，{next_open:%H:%M} 继续交易"
+            return f"盘前，今日 {next_open:%H:%M} 开市"
+        reason = "已收盘" if self.is_trading_day(moment.date()) else "休市"
+        return f"{reason}，下次开市 {next_open:%Y-%m-%d %H:%M}"
+
+
+# 进程级单例
+_trading_calendar: Optional[TradingCalendar] = None
+_trading_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """获取进程级交易日历（首次调用时加载休市表）"""
+    global _trading_calendar
+    with _trading_calendar_lock:
+        if _trading_calendar is None:
+            from config import settings
+            _trading_calendar = TradingCalendar(settings.trading_holidays_file)
+        return _trading_calendar
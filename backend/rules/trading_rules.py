@@ -3,10 +3,12 @@ A股交易规则引擎
 实现T+1、涨跌停、最小交易单位、手续费等规则
 """
 
-from datetime import datetime, time
+from datetime import datetime
 from typing import Tuple, Optional, Dict
 import logging
 
+from .trading_calendar import TradingCalendar, get_trading_calendar
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,7 +22,8 @@ class TradingRules:
         transfer_fee_rate: float = 0.00001,
         min_lot_size: int = 100,
         price_limit_normal: float = 0.10,
-        price_limit_st: float = 0.05
+        price_limit_st: float = 0.05,
+        calendar: Optional[TradingCalendar] = None
     ):
         """
         初始化交易规则
@@ -32,6 +35,7 @@ class TradingRules:
             min_lot_size: 最小交易单位（1手=100股）
             price_limit_normal: 普通股票涨跌停限制（10%）
             price_limit_st: ST股票涨跌停限制（5%）
+            calendar: 交易日历，默认使用进程级交易日历
         """
         self.commission_rate = commission_rate
         self.stamp_tax_rate = stamp_tax_rate
@@ -39,6 +43,7 @@ class TradingRules:
         self.min_lot_size = min_lot_size
         self.price_limit_normal = price_limit_normal
         self.price_limit_st = price_limit_st
+        self.calendar = calendar or get_trading_calendar()
         
         logger.info("TradingRules initialized")
     
@@ -47,7 +52,7 @@ class TradingRules:
         检查是否在交易时间内
         
         A股交易时间：
-        - 周一至周五
+        - 交易日（周一至周五，且不是交易所休市日）
         - 上午：9:30-11:30
         - 下午：13:00-15:00
         
@@ -60,24 +65,7 @@ class TradingRules:
         if check_time is None:
             check_time = datetime.now()
         
-        # 检查是否为工作日（周一到周五）
-        if check_time.weekday() >= 5:
-            return False
-        
-        current_time = check_time.time()
-        
-        # 上午交易时间：9:30-11:30
-        morning_start = time(9, 30)
-        morning_end = time(11, 30)
-        
-        # 下午交易时间：13:00-15:00
-        afternoon_start = time(13, 0)
-        afternoon_end = time(15, 0)
-        
-        in_morning = morning_start <= current_time <= morning_end
-        in_afternoon = afternoon_start <= current_time <= afternoon_end
-        
-        return in_morning or in_afternoon
+        return self.calendar.is_trading_time(check_time)
     
     def validate_lot_size(self, quantity: int) -> Tuple[bool, str]:
         """
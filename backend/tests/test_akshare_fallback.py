@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+测试AKShare回退路径的并发获取与截止时间
+"""
+
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from data_service import akshare_client as client_module
+from data_service.akshare_client import AKShareClient
+
+
+def _fake_bid_ask(delays):
+    """构造模拟的 ak.stock_bid_ask_em，按股票代码延迟返回"""
+    def fetch(symbol):
+        delay = delays.get(symbol, 0)
+        if delay < 0:
+            raise RuntimeError(f"upstream error for {symbol}")
+        time.sleep(delay)
+        return pd.DataFrame({
+            'item': ['最新', '今开', '最高', '最低', '昨收', '涨幅', '涨跌', '总手', '金额'],
+            'value': [10.0, 9.9, 10.2, 9.8, 9.9, 1.01, 0.1, 1000, 1000000.0],
+        })
+    return fetch
+
+
+def test_fallback_runs_concurrently(monkeypatch):
+    """多只股票并发获取，总耗时接近单只耗时"""
+    codes = ['000063', '300750', '600703', '002594', '688256', '600276']
+    monkeypatch.setattr(client_module.ak, 'stock_bid_ask_em', _fake_bid_ask({c: 0.3 for c in codes}))
+
+    client = AKShareClient(fallback_workers=6, fallback_deadline=5)
+    start = time.time()
+    quotes = client._get_realtime_quotes_akshare(codes)
+    elapsed = time.time() - start
+
+    assert [q.code for q in quotes] == codes
+    assert quotes[0].volume == 100000  # 总手转换为股数
+    assert elapsed < 1.0
+
+
+def test_fallback_deadline_returns_partial(monkeypatch):
+    """慢股票超过截止时间后被跳过，其余结果正常返回"""
+    delays = {'000063': 0, '300750': 3, '600703': -1}
+    monkeypatch.setattr(client_module.ak, 'stock_bid_ask_em', _fake_bid_ask(delays))
+
+    client = AKShareClient(max_retries=1, fallback_deadline=0.5)
+    start = time.time()
+    quotes = client._get_realtime_quotes_akshare(list(delays.keys()))
+    elapsed = time.time() - start
+
+    assert [q.code for q in quotes] == ['000063']
+    assert elapsed < 1.5
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
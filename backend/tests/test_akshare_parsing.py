@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+测试 AKShare 表格解析（向量化列提取）及其耗时对比
+"""
+
+import sys
+import os
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from data_service.akshare_client import parse_bid_ask, parse_stock_list
+
+
+def _bid_ask_df():
+    """与 ak.stock_bid_ask_em 相同结构的表格（item/value 两列）"""
+    items = [f"sell_{i}" for i in range(5, 0, -1)] + [f"sell_{i}_vol" for i in range(5, 0, -1)]
+    items += [f"buy_{i}" for i in range(1, 6)] + [f"buy_{i}_vol" for i in range(1, 6)]
+    items += ['最新', '均价', '涨幅', '涨跌', '总手', '金额', '换手', '量比', '最高', '最低', '今开', '昨收', '涨停', '跌停', '外盘', '内盘']
+    return pd.DataFrame({'item': items, 'value': [float(i) + 0.5 for i in range(len(items))]})
+
+
+def _stock_list_df(rows=5500):
+    """与 ak.stock_info_a_code_name 相同结构的表格"""
+    return pd.DataFrame({
+        'code': [f"{600000 + i:06d}" for i in range(rows)],
+        'name': [f"股票{i}" for i in range(rows)],
+    })
+
+
+def _parse_bid_ask_iterrows(df):
+    data = {}
+    for _, row in df.iterrows():
+        data[row['item']] = row['value']
+    return data
+
+
+def _parse_stock_list_iterrows(df):
+    return [(row['code'], row['name']) for _, row in df.iterrows()]
+
+
+def _per_call_ms(func, df, number):
+    return min(timeit.repeat(lambda: func(df), number=number, repeat=3)) / number * 1000
+
+
+def test_parse_bid_ask_matches_iterrows():
+    df = _bid_ask_df()
+    assert parse_bid_ask(df) == _parse_bid_ask_iterrows(df)
+
+
+def test_parse_stock_list_matches_iterrows():
+    df = _stock_list_df(100)
+    stocks = parse_stock_list(df)
+    assert [(s.code, s.name) for s in stocks] == _parse_stock_list_iterrows(df)
+
+
+def test_parsing_benchmark():
+    """单只行情与全量股票列表两种场景下 iterrows 与向量化解析的耗时（只打印，不断言：解析结果由上面的等价性测试覆盖）"""
+    bid_ask = _bid_ask_df()
+    stock_list = _stock_list_df()
+
+    results = {
+        '单只行情 stock_bid_ask_em': (
+            _per_call_ms(_parse_bid_ask_iterrows, bid_ask, 200),
+            _per_call_ms(parse_bid_ask, bid_ask, 200),
+        ),
+        f'股票列表 stock_info_a_code_name ({len(stock_list)} 行)': (
+            _per_call_ms(_parse_stock_list_iterrows, stock_list, 3),
+            _per_call_ms(parse_stock_list, stock_list, 3),
+        ),
+    }
+
+    print()
+    for name, (before, after) in results.items():
+        print(f"   {name}: iterrows {before:.3f}ms -> 向量化 {after:.3f}ms ({before / after:.0f}x)")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v", "-s"]))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+测试异步行情客户端（连接池复用与并发请求）
+"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from data_service import async_client as async_module
+from data_service.akshare_client import Quote
+from data_service.async_client import AsyncAKShareClient
+
+
+def _mock_transport(delay=0.2):
+    """模拟 Biying 接口：五档盘口与K线"""
+    async def handler(request):
+        await asyncio.sleep(delay)
+        if '/real/five/' in request.url.path:
+            return httpx.Response(200, json={'ps': [10.02, 10.01], 'pb': [10.0, 9.99], 'vs': [5, 3], 'vb': [4, 2], 't': '2025-01-02 10:00:00'})
+        if '/history/' in request.url.path:
+            return httpx.Response(200, json=[{'t': f'2025-01-0{i}', 'c': 10 + i} for i in range(1, 9)])
+        return httpx.Response(404)
+    return httpx.MockTransport(handler)
+
+
+def _make_client(monkeypatch):
+    monkeypatch.setattr(async_module.settings, 'biying_license', 'test-license')
+    client = AsyncAKShareClient()
+    transport = _mock_transport()
+    original = client._get_client
+
+    def get_client():
+        loop = asyncio.get_running_loop()
+        if loop not in client._clients:
+            client._clients[loop] = httpx.AsyncClient(transport=transport)
+        return original()
+
+    monkeypatch.setattr(client, '_get_client', get_client)
+    return client
+
+
+def test_batch_requests_run_concurrently(monkeypatch):
+    """批量盘口/K线请求并发发出，并复用同一个连接池"""
+    client = _make_client(monkeypatch)
+    codes = ['000063', '300750', '600703', '002594', '688256', '600276']
+
+    async def run():
+        start = time.time()
+        books = await client.get_order_books(codes)
+        klines = await client.get_historical_klines_batch(codes, days=5)
+        pool = client._get_client()
+        await client.aclose()
+        return time.time() - start, books, klines, pool
+
+    elapsed, books, klines, pool = asyncio.run(run())
+
+    assert elapsed < 1.0  # 两轮各 6 个请求，串行需要 2.4 秒
+    assert books['000063']['ask_prices'] == [10.02, 10.01]
+    assert len(klines['600276']) == 5
+    assert pool.is_closed
+
+
+
+def test_each_event_loop_keeps_its_own_pool(monkeypatch):
+    """另一个事件循环中的调用不会替换（并泄漏）当前事件循环的连接池，aclose() 关闭所有连接池"""
+    client = _make_client(monkeypatch)
+
+    async def other_loop():
+        await client.get_order_books(['000063'])
+        return client._get_client()
+
+    async def run():
+        await client.get_order_books(['000063'])
+        pool = client._get_client()
+        other_pool = await asyncio.to_thread(asyncio.run, other_loop())
+        assert client._get_client() is pool and other_pool is not pool
+        await client.aclose()
+        return pool
+
+    pool = asyncio.run(run())
+    assert pool.is_closed and not client._clients
+
+
+
+def test_partial_biying_result_is_filled_from_akshare(monkeypatch):
+    """Biying 部分批次失败时，缺失的股票用 AKShare 补齐并按输入顺序返回"""
+    client = _make_client(monkeypatch)
+    sync_client = client._get_sync_client()
+    requested = []
+
+    async def partial_biying(codes):
+        return [Quote({'代码': code, '最新价': 10.0}) for code in codes if code != '300750']
+
+    def akshare(codes):
+        requested.append(list(codes))
+        return [Quote({'代码': code, '最新价': 20.0}) for code in codes]
+
+    monkeypatch.setattr(client, '_get_realtime_quotes_biying', partial_biying)
+    monkeypatch.setattr(sync_client, '_fetch_akshare_tracked', akshare)
+
+    quotes = asyncio.run(client._fetch_realtime_quotes(['000063', '300750', '600703']))
+    assert requested == [['300750']]
+    assert [(q.code, q.price) for q in quotes] == [('000063', 10.0), ('300750', 20.0), ('600703', 10.0)]
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+测试分时K线聚合器
+"""
+
+import sys
+import os
+from datetime import date, datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from data_service.akshare_client import Quote
+from data_service.bar_aggregator import BarAggregator
+from data_service.indicators import IndicatorEngine
+from data_service.quote_hub import QuoteHub
+
+START = datetime(2025, 3, 3, 9, 30, 0)
+
+
+def _quote(code, moment, price, volume, amount=None):
+    quote = Quote({'代码': code, '最新价': price, '成交量': volume, '成交额': amount if amount is not None else price * volume})
+    quote.timestamp = moment
+    return quote
+
+
+def test_builds_ohlcv_from_cumulative_ticks():
+    agg = BarAggregator()
+    ticks = [(0, 10.0, 1000), (15, 10.5, 1200), (30, 9.8, 1500), (45, 10.2, 1600), (60, 10.3, 1900)]
+    for seconds, price, volume in ticks:
+        agg.update([_quote('000063', START + timedelta(seconds=seconds), price, volume)])
+
+    bars = agg.get_bars('000063', 1)
+    assert [b['t'] for b in bars] == ['2025-03-03 09:30:00', '2025-03-03 09:31:00']
+    first = bars[0]
+    assert (first['o'], first['h'], first['l'], first['c']) == (10.0, 10.5, 9.8, 10.2)
+    assert first['v'] == 600  # 当日第一笔只作为基准
+    assert bars[1]['v'] == 300
+
+    five = agg.get_bars('000063', 5)
+    assert len(five) == 1 and five[0]['v'] == 900 and five[0]['c'] == 10.3
+
+
+def test_ring_buffer_keeps_fixed_capacity():
+    agg = BarAggregator(intervals=(1,), capacity=10)
+    for minute in range(25):
+        agg.update([_quote('600519', START + timedelta(minutes=minute), 100.0 + minute, 100 * minute)])
+
+    array = agg.get_array('600519', 1)
+    assert len(array) == 10
+    assert list(array['close']) == [100.0 + m for m in range(15, 25)]
+    assert list(agg.get_array('600519', 1, 3)['close']) == [122.0, 123.0, 124.0]
+
+    with pytest.raises(ValueError):
+        agg.get_array('600519', 5)
+
+
+def test_new_day_resets_volume_baseline_and_ignores_late_ticks():
+    agg = BarAggregator(intervals=(1,))
+    agg.update([_quote('000001', START, 12.0, 5000)])
+    agg.update([_quote('000001', START + timedelta(minutes=2), 12.1, 6000)])
+    agg.update([_quote('000001', START + timedelta(minutes=1), 99.0, 7000)])  # 迟到的行情
+    next_day = START + timedelta(days=1)
+    agg.update([_quote('000001', next_day, 12.3, 800)])
+    agg.update([_quote('000001', next_day + timedelta(seconds=20), 12.4, 1000)])
+
+    bars = agg.get_bars('000001', 1)
+    assert 99.0 not in [b['c'] for b in bars]
+    assert bars[-1]['v'] == 200 and bars[-1]['c'] == 12.4
+
+
+def test_quotes_outside_sessions_are_skipped():
+    """午休、开盘前和收盘后的刷新不生成K线，开盘前的行情也不作为当日成交量基准"""
+    agg = BarAggregator(intervals=(1,))
+    day = START.date()
+    agg.update([_quote('000063', datetime(2025, 2, 28, 14, 59, 30), 20.0, 90000)])
+    agg.update([_quote('000063', datetime.combine(day, START.time()) - timedelta(minutes=20), 20.1, 90000)])  # 开盘前（前一日累计量）
+    agg.update([_quote('000063', START, 20.2, 1000)])
+    agg.update([_quote('000063', START + timedelta(seconds=30), 20.3, 1500)])
+    agg.update([_quote('000063', datetime(2025, 3, 3, 11, 30), 20.4, 1800)])       # 上午收盘时刻
+    agg.update([_quote('000063', datetime(2025, 3, 3, 12, 10), 20.4, 1800)])       # 午休
+    agg.update([_quote('000063', datetime(2025, 3, 3, 13, 0, 10), 20.5, 2000)])
+    agg.update([_quote('000063', datetime(2025, 3, 3, 19, 0), 20.5, 2000)])        # 收盘后
+
+    bars = agg.get_bars('000063', 1)
+    assert [b['t'][-8:] for b in bars[-3:]] == ['09:30:00', '11:29:00', '13:00:00']
+    assert bars[-3]['v'] == 500 and bars[-3]['o'] == 20.2
+    assert bars[-2]['v'] == 300 and bars[-1]['v'] == 200
+
+
+class FakeClient:
+    def __init__(self):
+        self.minute = 0
+
+    def get_realtime_quotes(self, stock_codes):
+        self.minute += 1
+        return [_quote('000063', START + timedelta(minutes=self.minute), 20.0 + self.minute * 0.1, 1000 * self.minute)]
+
+
+class EmptyKLines:
+    def get_klines_batch(self, stock_codes, interval='d', adjust='n', days=5):
+        return {}
+
+
+def test_quote_hub_feeds_aggregator_and_indicators():
+    hub = QuoteHub(FakeClient(), stock_codes=['000063'])
+    for _ in range(70):
+        hub.refresh()
+
+    assert len(hub.bar_aggregator.get_bars('000063', 15)) == 5
+    engine = IndicatorEngine(EmptyKLines(), bar_source=hub.bar_aggregator)
+    ind = engine.get_indicators(hub.get_snapshot().frame, date(2025, 3, 3))['000063']
+    price = 20.0 + 70 * 0.1
+    closes = hub.bar_aggregator.get_array('000063', 15)['close']
+    assert ind['chg_15m_pct'] == round((price / closes[-2] - 1) * 100, 2)
+    assert ind['chg_60m_pct'] == round((price / closes[-5] - 1) * 100, 2)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
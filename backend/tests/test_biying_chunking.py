@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+测试 Biying 多股行情的分批并发请求
+"""
+
+import sys
+import os
+import time
+from urllib.parse import urlparse, parse_qs
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_service import akshare_client as client_module
+from data_service.akshare_client import AKShareClient
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+class FakeSession:
+    """模拟 Biying 多股接口，超过20只或包含故障代码时报错"""
+
+    def __init__(self, delay=0.3, failing_code=None):
+        self.delay = delay
+        self.failing_code = failing_code
+        self.requests = []
+
+    def get(self, url, timeout=None, verify=None):
+        codes = parse_qs(urlparse(url).query)['stock_codes'][0].split(',')
+        self.requests.append(codes)
+        time.sleep(self.delay)
+        if len(codes) > 20:
+            raise RuntimeError("too many codes")
+        if self.failing_code in codes:
+            raise RuntimeError("upstream 502")
+        return FakeResponse([{'dm': f"{code}.SZ", 'p': 10.0, 'yc': 9.9} for code in codes])
+
+
+def _make_client(monkeypatch, session):
+    monkeypatch.setattr(client_module.settings, 'biying_license', 'test-license')
+    client = AKShareClient()
+    monkeypatch.setattr(client, '_get_session', lambda: session)
+    return client
+
+
+def test_large_universe_is_chunked_and_ordered(monkeypatch):
+    """超过20只股票时分批并发请求，结果保持原顺序"""
+    codes = [f"{600000 + i}" for i in range(45)]
+    session = FakeSession()
+    client = _make_client(monkeypatch, session)
+
+    start = time.time()
+    quotes = client._get_realtime_quotes_biying(codes)
+    elapsed = time.time() - start
+
+    assert [q.code for q in quotes] == codes
+    assert sorted(len(r) for r in session.requests) == [5, 20, 20]
+    assert elapsed < 0.8  # 三批串行需要 0.9 秒
+    assert [s['size'] for s in client.last_biying_chunk_stats] == [20, 20, 5]
+    assert all(s['success'] for s in client.last_biying_chunk_stats)
+
+
+def test_failed_chunk_returns_partial_with_stats(monkeypatch):
+    """单个批次失败时返回其余批次，并记录失败信息"""
+    codes = [f"{600000 + i}" for i in range(45)]
+    session = FakeSession(delay=0, failing_code='600021')
+    client = _make_client(monkeypatch, session)
+
+    quotes = client._get_realtime_quotes_biying(codes)
+
+    assert len(quotes) == 25
+    failed = [s for s in client.last_biying_chunk_stats if not s['success']]
+    assert len(failed) == 1 and failed[0]['chunk'] == 1
+    assert 'upstream 502' in failed[0]['error']
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
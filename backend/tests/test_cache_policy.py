@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+测试行情缓存的过期策略
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_service.cache import (
+    MarketDataCache, TTLPolicy, TradingSessionPolicy,
+    KIND_QUOTE, KIND_KLINE_DAILY, KIND_ORDER_BOOK,
+    default_policies, kline_kind,
+)
+from data_service.akshare_client import AKShareClient
+
+
+def test_ttl_uses_total_seconds():
+    """超过一天的旧数据不会因 timedelta.seconds 回绕而被当作新数据"""
+    policy = TTLPolicy(10)
+    now = datetime(2025, 1, 6, 10, 0, 0)
+    assert policy.is_fresh(now - timedelta(seconds=5), now)
+    assert not policy.is_fresh(now - timedelta(days=1, seconds=5), now)
+    assert not TTLPolicy(0.5).is_fresh(now - timedelta(milliseconds=600), now)
+
+
+def test_session_policy_survives_closed_market():
+    """周五收盘后缓存的日线在周一开盘前一直有效"""
+    policy = TradingSessionPolicy()
+    stored = datetime(2025, 1, 3, 15, 30)  # 周五
+    assert policy.next_boundary(stored) == datetime(2025, 1, 6, 9, 30)
+    assert policy.is_fresh(stored, datetime(2025, 1, 6, 9, 0))
+    assert not policy.is_fresh(stored, datetime(2025, 1, 6, 9, 31))
+    # 盘中缓存在收盘时失效
+    assert not policy.is_fresh(datetime(2025, 1, 6, 10, 0), datetime(2025, 1, 6, 15, 1))
+
+
+def test_lru_eviction_and_kinds():
+    cache = MarketDataCache(default_policies(), max_entries=2)
+    cache.set('a', 1, KIND_QUOTE)
+    cache.set('b', 2, KIND_KLINE_DAILY)
+    assert cache.get('a', KIND_QUOTE) == 1  # a 变为最近使用
+    cache.set('c', 3, KIND_ORDER_BOOK)
+    assert 'b' not in cache
+    assert len(cache) == 2
+    assert kline_kind('d') == KIND_KLINE_DAILY and kline_kind('5') != KIND_KLINE_DAILY
+
+
+def test_client_policy_override():
+    """客户端可按数据类型覆盖默认策略"""
+    client = AKShareClient(cache_policies={KIND_ORDER_BOOK: TTLPolicy(0)})
+    client._set_cache('order_book_000063', {'bid_prices': []}, KIND_ORDER_BOOK)
+    assert client._get_from_cache('order_book_000063', KIND_ORDER_BOOK) is None
+    client._set_cache('quotes_x', ['q'])
+    assert client._get_from_cache('quotes_x') == ['q']
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
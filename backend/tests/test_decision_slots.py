@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+测试AI决策时间表（按AI错开决策）
+"""
+
+import sys
+import os
+import asyncio
+from collections import Counter
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_service.job_scheduler as job_scheduler_module
+from ai_service.ai_scheduler import AIScheduler
+from ai_service.job_scheduler import JobScheduler
+from data_service.replay_client import VirtualClock
+
+
+def make_scheduler(clock=None):
+    return AIScheduler(
+        data_client=object(), kline_store=object(), clock=clock, force_run=True,
+        decision_interval=1800, decision_slot=60
+    )
+
+
+def test_auto_offsets_spread_evenly():
+    scheduler = make_scheduler()
+    schedule = scheduler._decision_slots([(1, None, None), (2, None, None), (3, None, None)])
+    assert schedule == {1: (1800, 0), 2: (1800, 600), 3: (1800, 1200)}
+
+
+def test_explicit_interval_and_offset_are_rounded_to_slot():
+    scheduler = make_scheduler()
+    schedule = scheduler._decision_slots([(1, 890, None), (2, None, 4000), (3, 30, 95), (4, None, None)])
+    assert schedule[1] == (900, 0)
+    assert schedule[2] == (1800, 360)     # 4000 % 1800 = 400，取整到60秒
+    assert schedule[3] == (60, 0)         # 间隔不小于一个刻度
+    assert schedule[4] == (1800, 0)       # 只和同一间隔、未指定相位的AI一起分布
+
+
+def test_ticks_run_each_ai_at_its_own_slot():
+    clock = VirtualClock(datetime(2025, 4, 3, 9, 30, 0), speed=0)
+    scheduler = make_scheduler(clock)
+    scheduler._get_decision_settings = lambda: [(1, None, None), (2, None, None), (3, None, None), (4, 900, 120)]
+    runs = []
+
+    async def record(ai_ids=None, events=None):
+        runs.append((clock.now(), tuple(ai_ids)))
+
+    scheduler._aexecute_ai_decisions = record
+    jobs = scheduler._create_job_scheduler()
+    jobs.jobs[0].func = jobs.jobs[2].func = lambda: None
+    jobs.jobs[1].func = scheduler._adecision_tick
+    jobs.run_until(datetime(2025, 4, 3, 10, 30, 10))
+
+    per_ai = Counter(ai_id for _, ai_ids in runs for ai_id in ai_ids)
+    assert per_ai == {1: 3, 2: 2, 3: 2, 4: 4}
+    assert all(len(ai_ids) == 1 for _, ai_ids in runs)  # 任何刻度都只有一个AI决策
+    assert (datetime(2025, 4, 3, 9, 40, 10), (2,)) in runs
+    assert (datetime(2025, 4, 3, 9, 47, 10), (4,)) in runs
+
+
+def test_thread_pool_sized_from_llm_concurrency():
+    """线程池容得下所有任务和每个进行中的LLM调用的数据库操作"""
+    scheduler = make_scheduler()
+    scheduler.llm_concurrency = 6
+    jobs = scheduler._create_job_scheduler()
+    assert jobs.max_workers == len(jobs.jobs) + 12
+
+
+def test_slow_ai_only_delays_its_own_slot():
+    scheduler = make_scheduler()
+    scheduler._get_decision_settings = lambda: [(1, None, None), (2, None, None), (3, None, None)]
+    now = datetime(2025, 4, 3, 10, 0, 10)
+    scheduler._now = lambda: now
+    runs = []
+
+    async def run():
+        nonlocal now
+        jobs = JobScheduler()
+        job_scheduler_module._current_scheduler.set(jobs)
+        release = asyncio.Event()
+
+        async def record(ai_ids=None, events=None):
+            runs.append((now, tuple(ai_ids)))
+            if ai_ids == [1]:
+                await release.wait()   # AI 1 的LLM调用超过一个间隔
+
+        scheduler._aexecute_ai_decisions = record
+        await scheduler._adecision_tick()             # 10:00:10 AI 1，刻度立即返回
+        await asyncio.sleep(0)
+        for moment in ['10:10:10', '10:20:10', '10:30:10', '10:31:10']:
+            now = datetime.strptime(f"2025-04-03 {moment}", "%Y-%m-%d %H:%M:%S")
+            await scheduler._adecision_tick()
+            await asyncio.sleep(0)
+        busy = set(scheduler._decision_tasks)
+        release.set()
+        await jobs._drain()
+        return busy
+
+    busy = asyncio.run(run())
+    assert busy == {1}
+    assert [(f"{t:%H:%M}", ai_ids) for t, ai_ids in runs] == [('10:00', (1,)), ('10:10', (2,)), ('10:20', (3,))]
+    assert not scheduler._decision_tasks
+
+
+def test_late_tick_still_runs_overdue_ai():
+    scheduler = make_scheduler()
+    schedule = {1: (1800, 0)}
+    assert scheduler._due_ais(schedule, datetime(2025, 4, 3, 10, 0, 10)) == [1]
+    # 10:30:10 的刻度被跳过，下一个刻度补上
+    assert scheduler._due_ais(schedule, datetime(2025, 4, 3, 10, 15, 10)) == []
+    assert scheduler._due_ais(schedule, datetime(2025, 4, 3, 10, 31, 10)) == [1]
+    assert scheduler._due_ais(schedule, datetime(2025, 4, 3, 10, 32, 10)) == []
+
+
+def test_new_ai_waits_for_its_slot():
+    scheduler = make_scheduler()
+    assert scheduler._due_ais({1: (1800, 600)}, datetime(2025, 4, 3, 10, 5, 10)) == []
+    assert scheduler._due_ais({1: (1800, 600)}, datetime(2025, 4, 3, 10, 10, 10)) == [1]
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
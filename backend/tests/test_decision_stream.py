@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试流式决策解析
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service.decision_parser import DecisionParser, IncrementalDecisionParser
+
+RESPONSE = (
+    '```json\n{"actions": ['
+    '{"action": "buy", "stock_code": "000063", "quantity": 100, "price_type": "limit", "price": 30.5, "reason": "突破{前高}\\"放量\\""}, '
+    '{"action": "sell", "stock_code": "300750", "quantity": 200}'
+    '], "reasoning": "科技股走强，减持[新能源]"}\n```\n以上是我的决策。'
+)
+
+
+def _feed(parser, text, size):
+    emitted = []
+    for i in range(0, len(text), size):
+        emitted.append((i, parser.feed(text[i:i + size])))
+    return emitted
+
+
+def test_actions_emitted_as_soon_as_complete():
+    parser = IncrementalDecisionParser()
+    emitted = _feed(parser, RESPONSE, 7)
+
+    actions = [action for _, batch in emitted for action in batch]
+    assert [a['stock_code'] for a in actions] == ['000063', '300750']
+    assert actions[0]['reason'] == '突破{前高}"放量"' and actions[0]['price'] == 30.5
+
+    # 第一个操作在 reasoning 出现之前就已返回
+    first_offset = next(offset for offset, batch in emitted if batch)
+    assert first_offset < RESPONSE.index('"reasoning"')
+
+
+def test_done_when_top_level_object_closes():
+    parser = IncrementalDecisionParser()
+    _feed(parser, RESPONSE, 5)
+    assert parser.done
+    assert parser.text.endswith('减持[新能源]"}')
+    assert parser.feed('{"actions": [{"action": "buy"}]}') == []
+
+    result = parser.result()
+    assert result['success'] and len(result['actions']) == 2
+
+
+def test_invalid_action_is_skipped():
+    parser = IncrementalDecisionParser()
+    text = ('{"reasoning": "x", "actions": [{"action": "buy", "stock_code": "000063", "quantity": 150}, '
+            '{"action": "buy", "stock_code": "000063", "quantity": 300}]}')
+    emitted = parser.feed(text)
+    assert [a['quantity'] for a in emitted] == [300]
+    assert len(parser.rejected) == 1 and parser.done
+
+
+def test_null_or_malformed_optional_fields_do_not_raise():
+    parser = IncrementalDecisionParser()
+    text = ('{"actions": [{"action": "buy", "stock_code": "000063", "quantity": 100, "price_type": null, "reason": null}, '
+            '{"action": "buy", "stock_code": "000063", "quantity": 100, "price_type": 5}]')
+    emitted = parser.feed(text)
+    assert len(emitted) == 1 and emitted[0]['price_type'] == 'market' and emitted[0]['reason'] == ''
+    assert len(parser.rejected) == 1
+
+
+def test_nested_objects_outside_actions_are_ignored():
+    parser = IncrementalDecisionParser()
+    text = '{"meta": {"actions": [{"action": "buy"}]}, "reasoning": "x", "actions": []}'
+    assert parser.feed(text) == [] and parser.done
+
+
+def test_braces_in_preamble_are_not_taken_as_the_decision():
+    """前言中的花括号不算决策对象，继续查找真正的决策"""
+    text = ('根据{持仓}和{"风险": "中"}分析如下：{"reasoning": "看好通信", '
+            '"actions": [{"action": "buy", "stock_code": "000063", "quantity": 100}]}')
+    expected = DecisionParser().parse(text)
+    assert expected['success']
+
+    for size in (1, 4, len(text)):
+        parser = IncrementalDecisionParser()
+        actions = [action for _, batch in _feed(parser, text, size) for action in batch]
+        assert parser.done and parser.text.startswith('{"reasoning"')
+        assert actions == expected['actions']
+        assert parser.result() == expected
+
+
+def test_clean_response_stops_at_end_of_first_object():
+    parser = DecisionParser()
+    response = '{"reasoning": "观望", "actions": []}\n注：若明日放量 {突破} 再考虑'
+    result = parser.parse(response)
+    assert result['success'] and result['reasoning'] == '观望'
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
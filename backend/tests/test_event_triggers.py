@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+测试行情事件触发的决策
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service.ai_scheduler import AIScheduler
+from ai_service.event_triggers import EventTriggers
+from data_service.akshare_client import Quote
+from data_service.tick_buffer import TickBuffer
+
+START = datetime(2025, 4, 3, 10, 0, 0)
+
+
+def make_quote(code, price, close_yesterday=10.0, moment=START):
+    quote = Quote({'代码': code, '名称': code, '最新价': price, '昨收': close_yesterday})
+    quote.timestamp = moment
+    return quote
+
+
+def feed(triggers, ticks, price, moment):
+    quotes = [make_quote('000063', price, moment=moment)]
+    ticks.append(quotes)
+    return triggers.check_quotes(quotes, moment)
+
+
+def test_price_move_fires_once_and_is_debounced():
+    ticks = TickBuffer()
+    triggers = EventTriggers(tick_source=ticks, price_move_pct=3, price_move_minutes=5,
+                             limit_proximity_pct=0, debounce_seconds=600)
+
+    assert feed(triggers, ticks, 10.0, START - timedelta(minutes=6)) == []
+    assert feed(triggers, ticks, 10.0, START) == []
+    events = feed(triggers, ticks, 10.4, START + timedelta(minutes=2))
+    assert [e['kind'] for e in events] == ['price_up'] and '上涨 4.00%' in events[0]['message']
+    # 条件持续满足不重复触发
+    assert feed(triggers, ticks, 10.5, START + timedelta(minutes=3)) == []
+    # 回落后再次满足，但仍在去抖时间内
+    assert feed(triggers, ticks, 10.5, START + timedelta(minutes=9)) == []
+    assert feed(triggers, ticks, 10.9, START + timedelta(minutes=10)) == []
+    assert triggers.stats['debounced'] == 1
+    # 超过去抖时间后重新触发
+    assert feed(triggers, ticks, 10.9, START + timedelta(minutes=16)) == []
+    assert [e['kind'] for e in feed(triggers, ticks, 11.3, START + timedelta(minutes=20))] == ['price_up']
+
+
+def test_limit_proximity():
+    triggers = EventTriggers(limit_proximity_pct=1.0)
+    quotes = [make_quote('000063', 10.92), make_quote('300750', 9.05), make_quote('600703', 10.5), make_quote('ST0001', 10.45)]
+    events = {(e['stock_code'], e['kind']) for e in triggers.check_quotes(quotes, START)}
+    assert events == {('000063', 'near_limit_up'), ('300750', 'near_limit_down'), ('ST0001', 'near_limit_up')}
+
+
+def test_rate_cap_and_min_gap():
+    triggers = EventTriggers(min_gap_seconds=300, max_per_hour=2)
+    event = {'kind': 'price_up', 'stock_code': '000063', 'message': 'x', 'at': START.isoformat()}
+
+    triggers.enqueue([1, 2], event)
+    triggers.order_filled(1, "订单 #1 已成交")
+    due = triggers.take_due(START)
+    assert set(due) == {1, 2} and len(due[1]) == 2
+
+    # 间隔不足5分钟，事件继续排队
+    triggers.enqueue([1], event)
+    assert triggers.take_due(START + timedelta(minutes=2)) == {}
+    assert set(triggers.take_due(START + timedelta(minutes=5))) == {1}
+
+    # 每小时最多2次
+    triggers.enqueue([1], event)
+    assert triggers.take_due(START + timedelta(minutes=20)) == {}
+    assert triggers.stats['rate_limited'] == 1
+    assert set(triggers.take_due(START + timedelta(minutes=61))) == {1}
+
+
+def test_scheduled_decision_clears_pending_events():
+    triggers = EventTriggers(min_gap_seconds=300)
+    triggers.enqueue([1], {'kind': 'price_up', 'stock_code': '000063', 'message': 'x', 'at': ''})
+    triggers.note_decision([1], START)
+    assert triggers.take_due(START + timedelta(minutes=10)) == {}
+
+
+def test_scheduler_runs_triggered_ai_with_events():
+    triggers = EventTriggers(min_gap_seconds=300, limit_proximity_pct=1.0)
+    scheduler = AIScheduler(data_client=object(), kline_store=object(), force_run=True,
+                            decision_interval=1800, decision_slot=60, event_triggers=triggers)
+    scheduler._get_decision_settings = lambda: [(1, None, None), (2, None, None)]
+    scheduler._get_stock_watchers = lambda: {'000063': {2}}
+    runs = []
+
+    async def record(ai_ids=None, events=None):
+        runs.append((list(ai_ids), events))
+
+    scheduler._aexecute_ai_decisions = record
+    now = datetime(2025, 4, 3, 10, 0, 10)
+    scheduler._now = lambda: now
+
+    asyncio.run(scheduler._adecision_tick())             # 10:00:10 是 AI 1 的时间点
+    scheduler._check_market_events([make_quote('000063', 10.95)])
+    now = datetime(2025, 4, 3, 10, 1, 10)
+    asyncio.run(scheduler._adecision_tick())
+
+    assert runs[0] == ([1], {})
+    ai_ids, events = runs[1]
+    assert ai_ids == [2] and '接近涨停' in events[2][0]['message']
+
+
+def test_prompt_includes_trigger_events():
+    from ai_service.prompt_builder import PromptBuilder
+    from models.models import AI
+
+    ai = AI(name="a", model_name="m", initial_cash=100000.0, current_cash=100000.0, total_assets=100000.0)
+    prompt = PromptBuilder().build_user_prompt(
+        ai, [make_quote('000063', 10.95)], [], events=[{'message': '000063(000063) 接近涨停'}]
+    )
+    assert '【触发事件】' in prompt and '接近涨停' in prompt
+    assert '【触发事件】' not in PromptBuilder().build_user_prompt(ai, [make_quote('000063', 10.95)], [])
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
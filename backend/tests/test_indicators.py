@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+测试技术指标引擎
+"""
+
+import sys
+import os
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from data_service.akshare_client import Quote
+from data_service.indicators import IndicatorEngine, ema, rsi, macd, atr
+from ai_service.prompt_builder import PromptBuilder
+from models.models import AI
+
+TODAY = date(2025, 3, 3)
+
+
+def _bars(days, seed):
+    rng = np.random.default_rng(seed)
+    closes = 20 + np.cumsum(rng.normal(0, 0.3, days))
+    start = TODAY - timedelta(days=days)
+    return [
+        {'t': (start + timedelta(days=i)).strftime('%Y-%m-%d'), 'o': c, 'h': c + 0.4, 'l': c - 0.5,
+         'c': c, 'v': 1000 + 10 * i, 'pc': c}
+        for i, c in enumerate(closes)
+    ]
+
+
+class FakeKLineStore:
+    def __init__(self, bars):
+        self.bars = bars
+        self.calls = []
+
+    def get_klines_batch(self, stock_codes, interval='d', adjust='n', days=5):
+        self.calls.append(list(stock_codes))
+        return {code: self.bars[code][-days:] for code in stock_codes if code in self.bars}
+
+
+def test_matches_pandas_reference():
+    """与 pandas 的逐只计算结果一致（右对齐的短序列不受影响）"""
+    long_bars, short_bars = _bars(60, 1), _bars(30, 2)
+    closes = np.full((2, 60), np.nan)
+    closes[0] = [b['c'] for b in long_bars]
+    closes[1, 30:] = [b['c'] for b in short_bars]
+
+    for row, bars in ((0, long_bars), (1, short_bars)):
+        series = pd.Series([b['c'] for b in bars])
+        assert np.isclose(ema(closes, 12)[row, -1], series.ewm(span=12, adjust=False).mean().iloc[-1])
+
+        diff = series.diff().dropna()
+        gain = diff.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean().iloc[-1]
+        loss = (-diff.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean().iloc[-1]
+        assert np.isclose(rsi(closes)[row], 100 - 100 / (1 + gain / loss))
+
+        dif = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+        dea = dif.ewm(span=9, adjust=False).mean()
+        assert np.allclose(macd(closes)[0][row], dif.iloc[-1])
+        assert np.allclose(macd(closes)[1][row], dea.iloc[-1])
+
+    highs, lows = closes + 0.4, closes - 0.5
+    assert np.allclose(atr(highs, lows, closes)[0], 0.9, atol=0.3)
+
+
+def test_engine_caches_per_trading_day():
+    store = FakeKLineStore({'000063': _bars(61, 3), '300750': _bars(40, 4)})
+    today_bar = dict(store.bars['000063'][-1], t=TODAY.strftime('%Y-%m-%d'), c=999.0)
+    store.bars['000063'].append(today_bar)  # 当日未收盘的K线不参与日线指标
+    engine = IndicatorEngine(store)
+    quotes = [
+        Quote({'代码': '000063', '最新价': 20.5, '成交量': 10000, '成交额': 205000}),
+        Quote({'代码': '300750', '最新价': 19.0, '成交量': 100, '成交额': 190000}),  # 成交量单位为手
+    ]
+
+    first = engine.get_indicators(quotes, TODAY)
+    second = engine.get_indicators(quotes, TODAY)
+    assert len(store.calls) == 1
+    assert first == second
+
+    ind = first['000063']
+    assert ind['last_close'] != 999.0 and ind['bars'] == 60
+    assert ind['ma5'] == round(np.mean([b['c'] for b in store.bars['000063'][-6:-1]]), 2)
+    assert ind['vwap'] == 20.5 and first['300750']['vwap'] == 19.0
+    assert first['300750']['ma20'] is not None
+
+    engine.get_indicators(quotes, TODAY + timedelta(days=1))
+    assert len(store.calls) == 2
+
+
+def test_missing_klines_are_retried_next_cycle():
+    """K线同步失败的股票不缓存空指标，下一轮重新获取"""
+    store = FakeKLineStore({'000063': _bars(40, 5)})
+    engine = IndicatorEngine(store)
+    quotes = [Quote({'代码': '000063', '最新价': 20.0}), Quote({'代码': '300750', '最新价': 19.0})]
+
+    first = engine.get_indicators(quotes, TODAY)
+    assert first['000063']['ma20'] is not None and first['300750'].get('ma20') is None
+
+    store.bars['300750'] = _bars(40, 6)
+    second = engine.get_indicators(quotes, TODAY)
+    assert store.calls == [['000063', '300750'], ['300750']]
+    assert second['300750']['ma20'] is not None
+
+
+def test_prompt_uses_compact_indicator_table():
+    store = FakeKLineStore({'000063': _bars(60, 5)})
+    quotes = [Quote({'代码': '000063', '名称': '中兴通讯', '最新价': 20.5, '昨收': 20.0})]
+    indicators = IndicatorEngine(store).get_indicators(quotes, TODAY)
+    klines = {'000063': store.bars['000063'][-5:]}
+    ai = AI(name='test', model_name='m', initial_cash=100000.0, current_cash=100000.0, total_assets=100000.0)
+    builder = PromptBuilder()
+
+    with_indicators = builder.build_user_prompt(ai, quotes, [], klines, indicators)
+    without = builder.build_user_prompt(ai, quotes, [], klines)
+
+    assert '【技术指标（日线）】' in with_indicators and 'RSI14' in with_indicators
+    assert '【近5日K线数据】' in without
+    assert len(with_indicators) < len(without)
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
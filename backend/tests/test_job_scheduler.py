@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试定时任务调度器
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+from datetime import date, datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service.job_scheduler import Job, JobScheduler, current_job_scheduler
+from data_service.replay_client import VirtualClock
+from rules.trading_calendar import TradingCalendar
+
+
+def test_ticks_are_aligned_to_wall_clock():
+    job = Job("test", lambda: None, 15, offset=5)
+    assert job.align(datetime(2025, 4, 3, 10, 0, 7)) == datetime(2025, 4, 3, 10, 0, 20)
+    assert job.align(datetime(2025, 4, 3, 10, 0, 20)) == datetime(2025, 4, 3, 10, 0, 20)
+    assert Job("test", lambda: None, 1800).align(datetime(2025, 4, 3, 9, 31)) == datetime(2025, 4, 3, 10, 0)
+
+
+def test_ticks_do_not_drift_with_runtime():
+    clock = VirtualClock(datetime(2025, 4, 3, 10, 0, 3), speed=0)
+    jobs = JobScheduler(clock=clock)
+    runs = []
+
+    def slow():
+        runs.append(clock.now())
+        clock.advance(4)  # 每次执行耗时4秒
+
+    jobs.add_job("slow", slow, 15)
+    jobs.run_until(datetime(2025, 4, 3, 10, 1, 0))
+    assert [moment.second for moment in runs] == [15, 30, 45, 0]
+    assert jobs.jobs[0].runs == 4 and jobs.jobs[0].last_lag_ms == 0
+
+
+def test_closed_market_waits_for_next_session():
+    calendar = TradingCalendar(holidays={date(2025, 4, 4)})
+    clock = VirtualClock(datetime(2025, 4, 3, 11, 29, 40), speed=0)
+    jobs = JobScheduler(clock=clock, calendar=calendar)
+    runs, always = [], []
+    jobs.add_job("market", lambda: runs.append(clock.now()), 15)
+    jobs.add_job("always", lambda: always.append(clock.now()), 3600, trading_hours=False)
+    jobs.run_until(datetime(2025, 4, 7, 9, 30, 15))
+
+    assert [m.strftime("%d %H:%M:%S") for m in runs[:3]] == ["03 11:29:45", "03 11:30:00", "03 13:00:00"]
+    assert runs[-2:] == [datetime(2025, 4, 7, 9, 30), datetime(2025, 4, 7, 9, 30, 15)]
+    assert all(calendar.is_trading_time(moment) for moment in runs)
+    assert datetime(2025, 4, 5, 12, 0) in always
+
+
+def test_first_delay_then_aligned():
+    clock = VirtualClock(datetime(2025, 4, 3, 10, 12, 0), speed=0)
+    jobs = JobScheduler(clock=clock)
+    runs = []
+    jobs.add_job("decision", lambda: runs.append(clock.now()), 1800, offset=10, first_delay=10)
+    jobs.run_until(datetime(2025, 4, 3, 11, 0, 10))
+    assert runs == [datetime(2025, 4, 3, 10, 12, 10), datetime(2025, 4, 3, 10, 30, 10), datetime(2025, 4, 3, 11, 0, 10)]
+
+
+def test_overlapping_runs_are_skipped_and_stop_is_immediate():
+    jobs = JobScheduler()
+    release = threading.Event()
+    cancelled = []
+
+    async def long_job():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    def blocking_job():
+        release.wait(0.15)
+
+    jobs.add_job("long", long_job, 0.05)
+    jobs.add_job("blocking", blocking_job, 0.05)
+    jobs.start()
+    time.sleep(0.4)
+
+    start = time.monotonic()
+    jobs.stop()
+    assert time.monotonic() - start < 0.5
+    assert not jobs.is_running and cancelled
+
+    long, blocking = jobs.metrics()
+    assert long['runs'] == 0 and long['skipped'] >= 3
+    assert blocking['runs'] >= 1 and blocking['skipped'] >= 1
+    assert blocking['max_runtime_ms'] >= 100 and blocking['last_lag_ms'] is not None
+
+
+def test_errors_are_counted_and_do_not_stop_the_job():
+    clock = VirtualClock(datetime(2025, 4, 3, 10, 0, 0), speed=0)
+    jobs = JobScheduler(clock=clock)
+
+    def failing():
+        raise RuntimeError("boom")
+
+    jobs.add_job("failing", failing, 60)
+    jobs.run_until(datetime(2025, 4, 3, 10, 3, 0))
+    metrics = jobs.metrics()[0]
+    assert metrics['runs'] == 4 and metrics['errors'] == 4 and metrics['last_error'] == "boom"
+
+
+
+def test_spawned_tasks_do_not_block_ticks_and_are_drained():
+    clock = VirtualClock(datetime(2025, 4, 3, 10, 0, 0), speed=0)
+    jobs = JobScheduler(clock=clock)
+    ticks, finished = [], []
+
+    async def tick():
+        ticks.append(clock.now())
+        assert current_job_scheduler() is jobs
+
+        async def work(moment):
+            await asyncio.sleep(0.01)
+            finished.append(moment)
+
+        jobs.spawn(work(clock.now()))
+
+    jobs.add_job("tick", tick, 15)
+    jobs.run_until(datetime(2025, 4, 3, 10, 0, 45))
+    assert len(ticks) == 4 and finished == ticks   # 推进时钟前等待派生的协程
+    assert jobs.jobs[0].skipped == 0 and not jobs._spawned
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
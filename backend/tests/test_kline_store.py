@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+测试本地K线库的增量同步
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.models import Base, KLineBar
+from data_service.kline_store import KLineStore
+
+
+def _make_session_factory():
+    """内存数据库（所有会话共享同一个连接）"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    @contextmanager
+    def session_factory():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    return session_factory
+
+
+class FakeKlineClient:
+    """模拟 Biying K线接口：返回截至最新一天的日线"""
+
+    def __init__(self, total_days=30):
+        start = date.today() - timedelta(days=total_days - 1)
+        self.bars = [
+            {'t': (start + timedelta(days=i)).strftime('%Y-%m-%d'), 'o': 10, 'h': 11, 'l': 9, 'c': 10 + i, 'v': 1000, 'a': 10000, 'pc': 9 + i, 'sf': 0}
+            for i in range(total_days)
+        ]
+        self.requests = []
+
+    def get_historical_klines(self, stock_code, interval='d', adjust='n', days=5):
+        self.requests.append(days)
+        return self.bars[-days:]
+
+
+def test_backfill_then_incremental():
+    """首次回填，之后只请求最后一根K线之后的数据"""
+    session_factory = _make_session_factory()
+    client = FakeKlineClient(total_days=30)
+    store = KLineStore(client, session_factory=session_factory, backfill_days=20)
+
+    klines = store.get_klines('000063', days=5)
+    assert [k['c'] for k in klines] == [35, 36, 37, 38, 39]
+    assert client.requests == [20]
+
+    # 同一交易日内再次读取直接走内存
+    store.get_klines('000063', days=5)
+    assert client.requests == [20]
+
+    # 强制同步只请求增量
+    client.bars[-1]['c'] = 99  # 最后一根K线被修正
+    assert store.sync('000063', force=True) == 1
+    assert client.requests == [20, 2]
+    assert store.get_klines('000063', days=1)[0]['c'] == 99
+
+    with session_factory() as db:
+        assert db.query(KLineBar).count() == 20
+
+
+def test_reload_from_database():
+    """新实例从数据库加载已同步的K线"""
+    session_factory = _make_session_factory()
+    client = FakeKlineClient(total_days=10)
+    KLineStore(client, session_factory=session_factory).sync_all(['000063', '300750'])
+
+    store = KLineStore(client, session_factory=session_factory)
+    store._bars[('000063', 'd', 'n')] = store._load(('000063', 'd', 'n'))
+    assert len(store._bars[('000063', 'd', 'n')]) == 10
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+测试LLM响应缓存
+"""
+
+import sys
+import os
+import asyncio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service.llm_adapters.response_cache import CachedLLMAdapter, LLMResponseCache, make_cache_key
+
+MESSAGES = [{"role": "system", "content": "你是交易员"}, {"role": "user", "content": "行情..."}]
+RESPONSE = '{"reasoning": "观望", "actions": []}'
+
+
+class FakeAdapter:
+    model_name = "fake-model"
+
+    def __init__(self, success=True):
+        self.success = success
+        self.calls = 0
+
+    def call_api(self, messages, temperature=0.7, timeout=30):
+        self.calls += 1
+        return {"success": self.success, "response": RESPONSE if self.success else None,
+                "usage": {"total_tokens": 120}, "error": None if self.success else "boom"}
+
+    async def acall_api(self, messages, temperature=0.7, timeout=30, on_token=None):
+        self.calls += 1
+        for chunk in (RESPONSE[:10], RESPONSE[10:]):
+            if on_token and on_token(chunk):
+                break
+        return {"success": self.success, "response": RESPONSE, "usage": {"total_tokens": 120}, "error": None}
+
+
+def test_key_depends_on_model_temperature_and_messages():
+    key = make_cache_key("m", 0.7, MESSAGES)
+    assert key == make_cache_key("m", 0.7, [dict(reversed(list(m.items()))) for m in MESSAGES])
+    assert key != make_cache_key("m", 0.8, MESSAGES)
+    assert key != make_cache_key("n", 0.7, MESSAGES)
+    assert key != make_cache_key("m", 0.7, MESSAGES[:1])
+
+
+def test_call_api_hits_cache_and_persists(tmp_path):
+    path = str(tmp_path / "cache.db")
+    adapter = FakeAdapter()
+    cached = CachedLLMAdapter(adapter, LLMResponseCache(path))
+
+    first = cached.call_api(MESSAGES, temperature=0.5)
+    second = cached.call_api(MESSAGES, temperature=0.5)
+    assert adapter.calls == 1
+    assert second["response"] == first["response"] and second["cached"] and second["tokens_used"] == 120
+    assert cached.model_name == "fake-model"
+
+    # 重新打开缓存文件仍然命中
+    reopened = CachedLLMAdapter(adapter, LLMResponseCache(path))
+    assert reopened.call_api(MESSAGES, temperature=0.5)["cached"] and adapter.calls == 1
+    assert reopened.cache.metrics()["hits"] == 1
+
+
+def test_failures_are_not_cached(tmp_path):
+    adapter = FakeAdapter(success=False)
+    cached = CachedLLMAdapter(adapter, LLMResponseCache(str(tmp_path / "cache.db")))
+    cached.call_api(MESSAGES)
+    cached.call_api(MESSAGES)
+    assert adapter.calls == 2 and cached.cache.metrics()["entries"] == 0
+
+
+def test_acall_api_replays_through_on_token(tmp_path):
+    adapter = FakeAdapter()
+    cached = CachedLLMAdapter(adapter, LLMResponseCache(str(tmp_path / "cache.db")))
+    asyncio.run(cached.acall_api(MESSAGES))
+
+    received = []
+    result = asyncio.run(cached.acall_api(MESSAGES, on_token=lambda delta: received.append(delta) or True))
+    assert adapter.calls == 1
+    assert received == [RESPONSE] and result["stopped_early"] and result["cached"]
+
+
+def test_lru_eviction_keeps_size_bounded(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.db"), max_bytes=250)
+    for i in range(3):
+        cache.put(f"k{i}", "m", "x" * 100)
+    assert cache.get("k0") is None                 # 最早写入的被淘汰
+    assert cache.get("k1") is not None             # 刚被使用过
+    cache.put("k3", "m", "y" * 100)
+    assert cache.get("k2") is None and cache.get("k1") is not None and cache.get("k3") is not None
+    metrics = cache.metrics()
+    assert metrics["size_bytes"] <= 250 and metrics["evictions"] == 2
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
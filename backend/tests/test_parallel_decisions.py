@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+测试AI决策的并发执行
+"""
+
+import sys
+import os
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import ai_service.ai_scheduler as ai_scheduler_module
+from ai_service.ai_scheduler import AIScheduler
+from data_service.akshare_client import Quote
+from data_service.quote_hub import QuoteHub
+from models.models import AI, Base, DecisionLog, Order
+
+
+class SlowAdapter:
+    def __init__(self, delay):
+        self.delay = delay
+        self.timeouts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def acall_api(self, messages, temperature=0.7, timeout=30, on_token=None):
+        self.timeouts.append(timeout)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return {"success": True, "response": '{"reasoning": "观望", "actions": []}'}
+
+
+class EmptyKLines:
+    def get_klines_batch(self, stock_codes, interval='d', adjust='n', days=5):
+        return {}
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    @contextmanager
+    def session():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(ai_scheduler_module, "get_db_session", session)
+    with session() as db:
+        for i in range(4):
+            db.add(AI(name=f"ai-{i}", model_name="fake"))
+        db.commit()
+
+    hub = QuoteHub(data_client=object(), stock_codes=['000063'])
+    hub.publish([Quote({'代码': '000063', '名称': '中兴通讯', '最新价': 30.0, '昨收': 29.5})])
+    scheduler = AIScheduler(quote_hub=hub, kline_store=EmptyKLines(), llm_concurrency=4, decision_deadline=10)
+    scheduler.session = session
+    yield scheduler
+    scheduler._close_decision_loop()
+
+
+def test_llm_calls_run_concurrently(scheduler):
+    adapter = SlowAdapter(0.5)
+    scheduler._get_adapter = lambda name: adapter
+
+    start = time.monotonic()
+    scheduler._execute_ai_decisions()
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 1.5  # 顺序执行需要 2 秒以上
+    assert adapter.max_in_flight == 4
+    assert all(timeout <= 10 for timeout in adapter.timeouts)
+    with scheduler.session() as db:
+        assert db.query(DecisionLog).count() == 4
+
+
+def test_concurrency_limit(scheduler):
+    adapter = SlowAdapter(0.3)
+    scheduler._get_adapter = lambda name: adapter
+    scheduler.llm_concurrency = 2
+
+    start = time.monotonic()
+    scheduler._execute_ai_decisions()
+    assert time.monotonic() - start >= 0.6
+    assert adapter.max_in_flight == 2
+
+
+def test_deadline_cancels_slow_calls(scheduler):
+    adapter = SlowAdapter(0.0)
+    slow = SlowAdapter(5.0)
+    scheduler._get_adapter = lambda name: slow if name == "ai-3" else adapter
+    scheduler.decision_deadline = 0.5
+
+    async def with_deadline(messages, temperature=0.7, timeout=30, on_token=None):
+        try:
+            return await asyncio.wait_for(SlowAdapter.acall_api(slow, messages), timeout)
+        except asyncio.TimeoutError:
+            return {"success": False, "response": None, "error": "timeout"}
+
+    slow.acall_api = with_deadline
+    start = time.monotonic()
+    scheduler._execute_ai_decisions()
+    assert time.monotonic() - start < 2
+    with scheduler.session() as db:
+        assert db.query(DecisionLog).count() == 4
+
+
+class StreamingAdapter:
+    """按段推送响应，每段之间记录已创建的订单数"""
+
+    def __init__(self, chunks, session):
+        self.chunks = chunks
+        self.session = session
+        self.orders_seen = []
+        self.delivered = 0
+
+    async def acall_api(self, messages, temperature=0.7, timeout=30, on_token=None):
+        for chunk in self.chunks:
+            await asyncio.sleep(0.05)
+            with self.session() as db:
+                self.orders_seen.append(db.query(Order).count())
+            self.delivered += 1
+            if on_token(chunk):
+                break
+        return {"success": True, "response": "".join(self.chunks[:self.delivered])}
+
+
+def test_streamed_actions_are_ordered_before_reasoning(scheduler):
+    chunks = [
+        '{"actions": [{"action": "buy", "stock_code": "000063", "quantity": 100}', ', ',
+        '{"action": "buy", "stock_code": "300750", "quantity": 200}], ',
+        '"reasoning": "看好', '科技股"}', ' 多余的文字', ' 不应被读取',
+    ]
+    adapters = {}
+
+    def get_adapter(name):
+        if name not in adapters:
+            adapters[name] = StreamingAdapter(chunks, scheduler.session) if name == "ai-0" else SlowAdapter(0.0)
+        return adapters[name]
+
+    scheduler._get_adapter = get_adapter
+    scheduler._execute_ai_decisions()
+
+    streaming = adapters["ai-0"]
+    assert streaming.delivered == 5            # 顶层对象闭合后停止读取
+    assert streaming.orders_seen[3] >= 1       # reasoning 还没写完时第一个订单已创建
+    with scheduler.session() as db:
+        orders = db.query(Order).all()
+        assert sorted(o.stock_code for o in orders) == ['000063', '300750']  # 不重复下单
+        log = db.query(DecisionLog).filter(DecisionLog.ai_id == orders[0].ai_id).one()
+        assert log.execution_result == {"orders_created": 2, "streamed_orders": 2, "usage_estimated": True}
+
+
+def test_timed_out_stream_keeps_streamed_actions_in_log(scheduler):
+    chunks = ['{"actions": [{"action": "buy", "stock_code": "000063", "quantity": 100}', ', {"action": "se']
+
+    class TimingOutAdapter(StreamingAdapter):
+        async def acall_api(self, messages, temperature=0.7, timeout=30, on_token=None):
+            result = await super().acall_api(messages, temperature, timeout, on_token)
+            return {**result, "success": False, "error": "timeout after 10s"}
+
+    adapter = TimingOutAdapter(chunks, scheduler.session)
+    scheduler._get_adapter = lambda name: adapter if name == "ai-0" else SlowAdapter(0.0)
+    scheduler._execute_ai_decisions()
+
+    with scheduler.session() as db:
+        order = db.query(Order).one()
+        log = db.query(DecisionLog).filter(DecisionLog.ai_id == order.ai_id).one()
+        assert log.llm_response == "".join(chunks)
+        assert log.error == "timeout after 10s"
+        decision = json.loads(log.parsed_decision)
+        assert decision["partial"] and [a["stock_code"] for a in decision["actions"]] == ["000063"]
+        assert log.execution_result == {"orders_created": 1, "streamed_orders": 1, "usage_estimated": True}
+
+
+def test_streamed_orders_are_matched_by_content(scheduler):
+    """完整解析得到的操作顺序与流式阶段不同时，按操作内容去掉已下单的操作"""
+    buy_a = '{"action": "buy", "stock_code": "000063", "quantity": 100}'
+    buy_b = '{"action": "buy", "stock_code": "300750", "quantity": 200}'
+
+    class ReorderingAdapter(StreamingAdapter):
+        async def acall_api(self, messages, temperature=0.7, timeout=30, on_token=None):
+            await super().acall_api(messages, temperature, timeout, on_token)
+            return {"success": True, "response": f'{{"reasoning": "x", "actions": [{buy_b}, {buy_a}]}}'}
+
+    adapter = ReorderingAdapter([f'{{"actions": [{buy_a}', ', '], scheduler.session)
+    scheduler._get_adapter = lambda name: adapter if name == "ai-0" else SlowAdapter(0.0)
+    scheduler._execute_ai_decisions()
+
+    with scheduler.session() as db:
+        orders = db.query(Order).all()
+        assert sorted(o.stock_code for o in orders) == ['000063', '300750']
+        log = db.query(DecisionLog).filter(DecisionLog.ai_id == orders[0].ai_id).one()
+        assert log.execution_result == {"orders_created": 2, "streamed_orders": 1, "usage_estimated": True}
+
+
+def test_failed_ai_does_not_block_others(scheduler):
+    adapter = SlowAdapter(0.0)
+
+    def get_adapter(name):
+        if name == "ai-0":
+            raise RuntimeError("boom")
+        return adapter
+
+    scheduler._get_adapter = get_adapter
+    scheduler._execute_ai_decisions()
+    with scheduler.session() as db:
+        logs = db.query(DecisionLog).all()
+        assert len(logs) == 4
+        assert sum("LLM调用失败" in log.llm_response for log in logs) == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
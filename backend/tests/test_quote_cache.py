@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+测试按股票代码索引的行情缓存
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_service.akshare_client import AKShareClient, Quote
+from stock_config import TRADING_STOCKS
+
+
+def _quote(code):
+    return Quote({'代码': code, '名称': code, '最新价': 10.0, '昨收': 9.9})
+
+
+def _make_client(monkeypatch):
+    client = AKShareClient()
+    requests = []
+
+    def fetch(stock_codes):
+        requests.append(list(stock_codes))
+        return [_quote(code) for code in stock_codes]
+
+    monkeypatch.setattr(client, '_fetch_realtime_quotes', fetch)
+    return client, requests
+
+
+def test_subset_served_from_universe_fetch(monkeypatch):
+    """全市场刷新后，单只/子集查询不再请求网络"""
+    client, requests = _make_client(monkeypatch)
+    codes = list(TRADING_STOCKS.keys())
+
+    client.get_realtime_quotes()
+    info = client.get_stock_info(codes[0])
+    subset = client.get_realtime_quotes(codes[:2][::-1])
+
+    assert requests == [codes]
+    assert info['code'] == codes[0]
+    assert [q.code for q in subset] == codes[:2][::-1]
+
+
+def test_only_missing_codes_are_fetched(monkeypatch):
+    client, requests = _make_client(monkeypatch)
+
+    client.get_realtime_quotes(['000063'])
+    quotes = client.get_realtime_quotes(['000063.SZ', '300750'])
+
+    assert requests == [['000063'], ['300750']]
+    assert [q.code for q in quotes] == ['000063', '300750']
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
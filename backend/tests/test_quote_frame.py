@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测试列式行情 QuoteFrame
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from data_service.akshare_client import Quote
+from data_service.quote_frame import QuoteFrame
+from models.models import Base, AI, Position
+from portfolio.portfolio_manager import PortfolioManager
+from rules.trading_rules import TradingRules
+
+
+def _quotes():
+    return [
+        Quote({'代码': '000063', '名称': '中兴通讯', '最新价': 30.5, '昨收': 30.0, '涨跌幅': 1.67}),
+        Quote({'代码': '600703', '名称': '*ST三安', '最新价': 12.0, '昨收': 12.35, '涨跌幅': -2.83}),
+        Quote({'代码': '300750', '名称': '宁德时代', '最新价': 200.0, '昨收': 198.0, '涨跌幅': 1.01}),
+    ]
+
+
+def test_to_dicts_matches_quote_to_dict():
+    quotes = _quotes()
+    frame = QuoteFrame(quotes)
+
+    assert frame.to_dicts() == [q.to_dict() for q in quotes]
+    assert frame.to_dicts(('code', 'price')) == [{'code': q.code, 'price': q.price} for q in quotes]
+    assert [q.code for q in frame] == ['000063', '600703', '300750']
+    assert frame.get('300750') is quotes[2] and frame.get('999999') is None
+
+
+def test_limit_prices_match_trading_rules():
+    """向量化涨跌停价与 TradingRules.check_price_limit 一致"""
+    frame = QuoteFrame(_quotes())
+    rules = TradingRules()
+    upper, lower = frame.limit_prices()
+
+    for i, q in enumerate(frame):
+        _, expected_upper, expected_lower = rules.check_price_limit(q.code, q.price, q.close_yesterday)
+        assert upper[i] == expected_upper
+        assert lower[i] == expected_lower
+
+    upper, lower = frame.limit_prices(is_st=np.array([False, True, False]))
+    assert (upper[1], lower[1]) == (12.97, 11.73)
+
+
+def test_revalue_all_matches_per_ai_update():
+    """批量估值与逐个AI调用 update_market_value 的结果一致"""
+    def build_db():
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        for ai_id, cash in ((1, 50000.0), (2, 80000.0)):
+            db.add(AI(id=ai_id, name=f"ai{ai_id}", model_name="m", current_cash=cash))
+        db.add_all([
+            Position(ai_id=1, stock_code='000063', quantity=1000, avg_cost=29.0),
+            Position(ai_id=1, stock_code='300750', quantity=100, avg_cost=210.0),
+            Position(ai_id=2, stock_code='600703', quantity=500, avg_cost=0.0),
+            Position(ai_id=2, stock_code='688256', quantity=200, avg_cost=100.0, market_value=1.0),
+        ])
+        db.commit()
+        return db
+
+    frame = QuoteFrame(_quotes())
+
+    expected_db = build_db()
+    manager = PortfolioManager(expected_db, TradingRules())
+    for ai_id in (1, 2):
+        manager.update_market_value(ai_id, frame.price_map())
+
+    actual_db = build_db()
+    assert PortfolioManager(actual_db, TradingRules()).revalue_all(frame) == 2
+
+    def state(db):
+        ais = [(a.id, a.total_assets) for a in db.query(AI).order_by(AI.id)]
+        positions = [
+            (p.stock_code, p.current_price, p.market_value, p.profit, p.profit_rate)
+            for p in db.query(Position).order_by(Position.id)
+        ]
+        return ais, positions
+
+    expected, actual = state(expected_db), state(actual_db)
+    assert actual[0] == expected[0]
+    np.testing.assert_allclose(
+        [row[1:] for row in actual[1]], [row[1:] for row in expected[1]]
+    )
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+测试进程级行情中心
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_service.akshare_client import Quote
+from data_service.quote_hub import QuoteHub
+
+
+class CountingClient:
+    """记录上游调用次数的模拟数据源"""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_realtime_quotes(self, stock_codes=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return [Quote({'代码': code, '最新价': 10.0}) for code in stock_codes]
+
+
+def test_concurrent_readers_share_one_fetch():
+    """多个消费者同时读取，只触发一次上游请求"""
+    client = CountingClient()
+    hub = QuoteHub(client, refresh_interval=15, stock_codes=['000063', '300750'])
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(hub.refresh_if_stale()))
+        for _ in range(10)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert client.calls == 1
+    assert all(s.version == 1 for s in results)
+    assert [q.code for q in hub.get_snapshot().quotes] == ['000063', '300750']
+
+    # 快照未过期时不再请求上游
+    hub.get_quotes()
+    assert client.calls == 1
+
+
+def test_refresh_bumps_version_and_stale_refetches():
+    """显式刷新递增版本号，快照过期后读取方会重新获取"""
+    client = CountingClient(delay=0)
+    hub = QuoteHub(client, refresh_interval=0.1, stock_codes=['000063'])
+
+    assert hub.refresh().version == 1
+    assert hub.refresh().version == 2
+
+    time.sleep(0.15)
+    assert hub.refresh_if_stale().version == 3
+    assert client.calls == 3
+
+
+def test_wait_for_update():
+    """等待新版本发布"""
+    hub = QuoteHub(CountingClient(delay=0), stock_codes=['000063'])
+    threading.Timer(0.05, hub.refresh).start()
+
+    snapshot = hub.wait_for_update(0, timeout=2)
+    assert snapshot.version == 1
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
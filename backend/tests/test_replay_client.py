@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试行情回放客户端与虚拟时钟
+"""
+
+import sys
+import os
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from data_service.replay_client import ReplayDataClient, VirtualClock
+from data_service.tick_recorder import (
+    QUOTE_RECORD, BOOK_RECORD, KIND_QUOTES, KIND_BOOKS, tick_file_path
+)
+
+DAY = "20250106"  # 周一
+
+
+def _ns(hour, minute, second=0):
+    return int(datetime(2025, 1, 6, hour, minute, second).timestamp() * 1e9)
+
+
+def _write_tape(root):
+    """写入一段录制数据：两只股票、两个时刻"""
+    quotes = np.zeros(4, dtype=QUOTE_RECORD)
+    quotes['ts'] = [_ns(9, 30), _ns(9, 30), _ns(9, 30, 15), _ns(9, 30, 15)]
+    quotes['code'] = [b'000063', b'688256', b'000063', b'688256']
+    quotes['price'] = [30.0, 1250.0, 30.2, 1258.0]
+    quotes['close_yesterday'] = [29.8, 1240.0, 29.8, 1240.0]
+
+    books = np.zeros(1, dtype=BOOK_RECORD)
+    books['ts'] = _ns(9, 30, 10)
+    books['code'] = b'688256'
+    books['ask_prices'] = [1260.0, 1259.5, 1259.0, 1258.5, 1258.0]
+    books['bid_prices'] = [1257.5, 1257.0, 1256.5, 1256.0, 1255.5]
+
+    for kind, records in ((KIND_QUOTES, quotes), (KIND_BOOKS, books)):
+        path = tick_file_path(str(root), DAY, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        records.tofile(path)
+
+
+def test_replay_follows_virtual_clock(tmp_path):
+    _write_tape(tmp_path)
+    clock = VirtualClock(datetime(2025, 1, 6, 9, 30, 5), speed=0)
+    client = ReplayDataClient(str(tmp_path), DAY, clock=clock)
+
+    quotes = client.get_realtime_quotes(['000063', '688256', '600703'])
+    assert [(q.code, q.price) for q in quotes] == [('000063', 30.0), ('688256', 1250.0)]
+    assert client.get_order_book('688256') is None  # 盘口还没录到
+
+    clock.sleep(10)  # 冻结时钟下 sleep 直接推进虚拟时间
+    assert client.get_stock_info('688256')['price'] == 1258.0
+    assert client.get_order_book('688256')['ask_prices'][-1] == 1258.0
+    assert quotes[0].timestamp == datetime(2025, 1, 6, 9, 30)
+    assert not client.exhausted
+    clock.advance(1)
+    assert client.exhausted
+
+
+def test_default_clock_starts_at_first_tick_and_runs_faster(tmp_path):
+    _write_tape(tmp_path)
+    client = ReplayDataClient(str(tmp_path), DAY, speed=600)
+
+    assert client.first_tick_time == datetime(2025, 1, 6, 9, 30)
+    client.clock.sleep(15)  # 600倍速，实际只等 25ms
+    assert client.get_stock_info('000063')['price'] == 30.2
+    assert ReplayDataClient.available_days(str(tmp_path)) == [DAY]
+
+
+def test_klines_exclude_replay_day(tmp_path):
+    """历史K线不返回回放当天及之后的数据"""
+    _write_tape(tmp_path)
+    bars = [{'t': f'2025-01-0{d}', 'c': 30 + d} for d in (2, 3, 6, 7)]
+    client = ReplayDataClient(
+        str(tmp_path), DAY, clock=VirtualClock(datetime(2025, 1, 6, 10, 0), speed=0),
+        klines={'000063': bars}
+    )
+
+    assert [k['t'] for k in client.get_historical_klines('000063', days=5)] == ['2025-01-02', '2025-01-03']
+
+
+def test_scheduler_uses_injected_clock(tmp_path):
+    from ai_service.ai_scheduler import AIScheduler
+
+    _write_tape(tmp_path)
+    clock = VirtualClock(datetime(2025, 1, 6, 10, 0), speed=0)
+    scheduler = AIScheduler(data_client=ReplayDataClient(str(tmp_path), DAY, clock=clock), clock=clock)
+
+    assert scheduler._is_trading_time()
+    clock.jump_to(datetime(2025, 1, 6, 12, 0))
+    assert not scheduler._is_trading_time()
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
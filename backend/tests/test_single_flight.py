@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+测试请求合并（single-flight）与 stale-while-revalidate
+"""
+
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_service.akshare_client import AKShareClient, Quote
+from data_service.cache import KIND_QUOTE, TTLPolicy
+from data_service.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_request():
+    flights = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: flights.do('k', fetch), range(5)))
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert not flights.in_flight('k')
+
+
+def test_errors_are_shared():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def fetch():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("upstream 502")
+
+    def follower():
+        started.wait()
+        try:
+            flights.do('k', fetch)
+        except RuntimeError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(lambda: flights.do('k', fetch))
+        result = pool.submit(follower).result()
+
+    assert result == "upstream 502"
+    assert isinstance(leader.exception(), RuntimeError)
+
+
+def _make_client(monkeypatch, delay=0.2, **kwargs):
+    client = AKShareClient(**kwargs)
+    requests = []
+
+    def fetch(stock_codes):
+        requests.append(list(stock_codes))
+        time.sleep(delay)
+        return [Quote({'代码': code, '最新价': 10.0 + len(requests)}) for code in stock_codes]
+
+    monkeypatch.setattr(client, '_fetch_realtime_quotes', fetch)
+    return client, requests
+
+
+def test_subset_waits_for_in_flight_universe_fetch(monkeypatch):
+    """全市场请求进行中时，单只查询等待它的结果而不是再请求一次"""
+    client, requests = _make_client(monkeypatch)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        universe = pool.submit(client.get_realtime_quotes, ['000063', '300750', '600703'])
+        time.sleep(0.05)
+        singles = [pool.submit(client.get_stock_info, '300750') for _ in range(3)]
+        assert [s.result()['code'] for s in singles] == ['300750'] * 3
+        assert len(universe.result()) == 3
+
+    assert requests == [['000063', '300750', '600703']]
+
+
+def test_stale_while_revalidate(monkeypatch):
+    """缓存过期后立即返回旧数据，后台刷新完成后返回新数据"""
+    client, requests = _make_client(
+        monkeypatch, delay=0.1, stale_while_revalidate=True, stale_max_age=60,
+        cache_policies={KIND_QUOTE: TTLPolicy(0.05)}
+    )
+
+    assert client.get_realtime_quotes(['000063'])[0].price == 11.0
+    time.sleep(0.06)
+
+    start = time.time()
+    assert client.get_realtime_quotes(['000063'])[0].price == 11.0  # 旧数据
+    assert time.time() - start < 0.05
+
+    time.sleep(0.15)
+    assert client._cache.get_stale('quote_000063', 60).price == 12.0  # 后台刷新已写入缓存
+    assert len(requests) == 2
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+测试数据源熔断与自动恢复
+"""
+
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_service import akshare_client as client_module
+from data_service.akshare_client import AKShareClient, Quote, SOURCE_BIYING
+from data_service.source_health import SourceHealth, STATE_OPEN, STATE_CLOSED, STATE_HALF_OPEN
+
+
+def test_trips_on_consecutive_failures_and_recovers():
+    health = SourceHealth('biying', max_consecutive_failures=3, cooldown=0.05)
+    for _ in range(3):
+        assert health.allow_request()
+        health.record_failure(100, "timeout")
+
+    assert health.state == STATE_OPEN and not health.allow_request()
+    assert not health.begin_probe()  # 冷却中
+
+    time.sleep(0.06)
+    assert health.begin_probe()
+    assert not health.begin_probe()  # 只探测一次
+    assert health.state == STATE_HALF_OPEN
+
+    health.record_success(20)
+    assert health.state == STATE_CLOSED and health.allow_request()
+    metrics = health.metrics()
+    assert metrics['trip_count'] == 1 and metrics['latency_ms']['max'] == 100
+
+
+def test_trips_on_error_rate():
+    health = SourceHealth('akshare', min_calls=4, error_rate_threshold=0.5, max_consecutive_failures=10)
+    for success in (True, False, True, False):
+        health.record_success(10) if success else health.record_failure(10)
+    assert health.state == STATE_OPEN
+
+
+def test_tripped_biying_is_skipped_then_probed(monkeypatch):
+    """Biying 熔断后直接使用 AKShare，冷却后后台探测恢复"""
+    monkeypatch.setattr(client_module.settings, 'biying_license', 'test-license')
+    client = AKShareClient()
+    client.source_health[SOURCE_BIYING] = SourceHealth(SOURCE_BIYING, max_consecutive_failures=2, cooldown=0.1)
+    biying_calls = []
+    biying_up = {'value': False}
+
+    def biying(codes):
+        biying_calls.append(list(codes))
+        if not biying_up['value']:
+            raise TimeoutError("read timeout")
+        return [Quote({'代码': code, '最新价': 10.0}) for code in codes]
+
+    monkeypatch.setattr(client, '_get_realtime_quotes_biying', biying)
+    monkeypatch.setattr(client, '_get_realtime_quotes_akshare',
+                        lambda codes: [Quote({'代码': code, '最新价': 9.0}) for code in codes])
+
+    for _ in range(4):
+        assert client._fetch_realtime_quotes(['000063'])[0].price == 9.0
+    assert len(biying_calls) == 2  # 熔断后不再请求 Biying
+
+    biying_up['value'] = True
+    time.sleep(0.12)
+    client._fetch_realtime_quotes(['000063'])  # 触发后台探测
+    deadline = time.time() + 2
+    while client.source_health[SOURCE_BIYING].state != STATE_CLOSED and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert client._fetch_realtime_quotes(['000063'])[0].price == 10.0
+    metrics = {m['name']: m for m in client.get_source_metrics()}
+    assert metrics['biying']['trip_count'] == 1
+    assert metrics['akshare']['total_calls'] == 5
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
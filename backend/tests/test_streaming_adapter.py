@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+测试LLM适配器的异步流式调用
+"""
+
+import sys
+import os
+import asyncio
+import json
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from ai_service.llm_adapters import base_adapter
+from ai_service.llm_adapters.openai_adapter import OpenAIAdapter
+
+
+def _sse(*events):
+    return "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+
+
+def _chunk(text):
+    return {"choices": [{"delta": {"content": text}}]}
+
+
+def _run(handler, coro_factory):
+    async def main():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        base_adapter._async_clients[asyncio.get_running_loop()] = client
+        try:
+            return await coro_factory()
+        finally:
+            await base_adapter.close_async_http_client()
+    return asyncio.run(main())
+
+
+def test_streams_tokens_and_usage():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        body = _sse(_chunk('{"reasoning": '), _chunk('"观望", "actions": []}'),
+                    {"choices": [], "usage": {"prompt_tokens": 100, "completion_tokens": 12, "total_tokens": 112}})
+        return httpx.Response(200, text=body)
+
+    adapter = OpenAIAdapter("key", "https://llm.example.com/v1/", "test-model")
+    tokens = []
+    result = _run(handler, lambda: adapter.acall_api([{"role": "user", "content": "hi"}], on_token=tokens.append))
+
+    assert result["success"] and result["response"] == '{"reasoning": "观望", "actions": []}'
+    assert tokens == ['{"reasoning": ', '"观望", "actions": []}']
+    assert result["tokens_used"] == 112 and result["ttft_ms"] is not None
+    assert str(requests[0].url) == "https://llm.example.com/v1/chat/completions"
+    payload = json.loads(requests[0].content)
+    assert payload["stream"] is True and payload["model"] == "test-model"
+    assert requests[0].headers["authorization"] == "Bearer key"
+
+
+def test_deadline_cancels_and_keeps_partial_output():
+    async def slow_body():
+        yield f"data: {json.dumps(_chunk('部分'))}\n\n".encode()
+        await asyncio.sleep(5)
+        yield b"data: [DONE]\n\n"
+
+    def handler(request):
+        return httpx.Response(200, content=slow_body())
+
+    adapter = OpenAIAdapter("key", "https://llm.example.com/v1", "test-model")
+    result = _run(handler, lambda: adapter.acall_api([{"role": "user", "content": "hi"}], timeout=0.3))
+
+    assert not result["success"] and "timeout" in result["error"]
+    assert result["response"] == "部分"
+    assert result["latency_ms"] < 2000
+
+
+def test_http_error_is_reported():
+    adapter = OpenAIAdapter("key", "https://llm.example.com/v1", "test-model")
+    result = _run(lambda request: httpx.Response(401, text="invalid key"),
+                  lambda: adapter.acall_api([{"role": "user", "content": "hi"}]))
+    assert not result["success"] and "401" in result["error"] and result["response"] is None
+
+
+
+def test_retries_without_stream_options_when_rejected():
+    payloads = []
+
+    def handler(request):
+        payload = json.loads(request.content)
+        payloads.append(payload)
+        if "stream_options" in payload:
+            return httpx.Response(400, text="unknown field: stream_options")
+        return httpx.Response(200, text=_sse(_chunk('{"actions": []}')))
+
+    adapter = OpenAIAdapter("key", "https://llm.example.com/v1", "test-model")
+    result = _run(handler, lambda: adapter.acall_api([{"role": "user", "content": "hi"}]))
+    assert result["success"] and result["response"] == '{"actions": []}'
+    assert ["stream_options" in p for p in payloads] == [True, False]
+    assert adapter.stream_usage is False
+
+    # 之后的请求不再携带 stream_options
+    _run(handler, lambda: adapter.acall_api([{"role": "user", "content": "hi"}]))
+    assert len(payloads) == 3 and "stream_options" not in payloads[-1]
+
+
+def test_unrelated_bad_request_keeps_stream_options():
+    adapter = OpenAIAdapter("key", "https://llm.example.com/v1", "test-model")
+    result = _run(lambda request: httpx.Response(400, text="bad messages"),
+                  lambda: adapter.acall_api([{"role": "user", "content": "hi"}]))
+    assert not result["success"] and "400" in result["error"]
+    assert adapter.stream_usage is True
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+测试当日分笔环形缓冲
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from data_service.akshare_client import Quote
+from data_service.tick_buffer import TickBuffer, TickRing
+from trading_engine.matching_engine import MatchingEngine
+
+START = datetime(2025, 3, 3, 9, 30, 0)
+
+
+def _quote(code, moment, price, volume=1000):
+    quote = Quote({'代码': code, '最新价': price, '成交量': volume, '成交额': price * volume})
+    quote.timestamp = moment
+    return quote
+
+
+def _fill(buffer, code, prices, step=15):
+    for i, price in enumerate(prices):
+        buffer.append([_quote(code, START + timedelta(seconds=i * step), price, 1000 + i)])
+
+
+def test_ring_views_are_contiguous_and_zero_copy():
+    ring = TickRing(4)
+    for i in range(10):
+        ring.append(float(i), 10.0 + i, 0.0, 0.0)
+
+    view = ring.view()
+    assert list(view['ts']) == [6.0, 7.0, 8.0, 9.0]
+    assert np.shares_memory(view, ring.data)
+    assert list(ring.view(2)['price']) == [18.0, 19.0]
+    with pytest.raises(ValueError):
+        view['price'][0] = 0.0
+
+
+def test_buffer_skips_duplicates_and_resets_daily():
+    buffer = TickBuffer(capacity=100)
+    _fill(buffer, '000063', [10.0, 10.1, 10.2])
+    buffer.append([_quote('000063', START + timedelta(seconds=30), 99.0)])  # 缓存中的同一笔
+    assert list(buffer.view('000063')['price']) == [10.0, 10.1, 10.2]
+
+    buffer.append([_quote('000063', START + timedelta(days=1), 11.0)])
+    assert list(buffer.view('000063')['price']) == [11.0]
+    assert len(buffer.view('600000')) == 0
+
+
+def test_last_minutes_and_change_pct():
+    buffer = TickBuffer()
+    _fill(buffer, '000063', [10.0 + 0.01 * i for i in range(41)])  # 10分钟
+
+    recent = buffer.last_minutes('000063', 5)
+    assert len(recent) == 21 and recent['price'][-1] == pytest.approx(10.4)
+    assert buffer.change_pct(['000063'], 5)['000063'] == round((10.4 / 10.2 - 1) * 100, 2)
+    assert buffer.change_pct(['000063'], 30)['000063'] is None
+
+
+def test_matching_engine_fills_limit_crossed_between_polls():
+    buffer = TickBuffer()
+    _fill(buffer, '000063', [20.0, 19.7, 19.4, 19.8, 20.1])
+    engine = MatchingEngine(None, None, None, None, tick_buffer=buffer)
+    now = START + timedelta(seconds=60)  # 本次行情（最后一笔）的时间
+
+    def order(direction, price, created_at=START):
+        return SimpleNamespace(id=1, order_type='limit', price=price, direction=direction,
+                               stock_code='000063', created_at=created_at)
+
+    assert engine._crossed_limit_price(order('buy', 19.5), now) == 19.5
+    assert engine._crossed_limit_price(order('buy', 19.3), now) is None
+    # 本次行情已按最新价判断过，不算穿过
+    assert engine._crossed_limit_price(order('sell', 20.1), now) is None
+    assert engine._crossed_limit_price(order('sell', 19.8), now) == 19.8
+    # 委托之前的行情不算
+    assert engine._crossed_limit_price(order('buy', 19.5, START + timedelta(seconds=40)), now) is None
+    assert engine._crossed_limit_price(order('buy', 19.5), None) is None
+
+
+class _FakeClient:
+    def __init__(self, price, order_book, moment):
+        self.price = price
+        self.order_book = order_book
+        self.moment = moment
+
+    def get_stock_info(self, stock_code):
+        return {'price': self.price, 'close_yesterday': self.price, 'timestamp': self.moment.isoformat()}
+
+    def get_order_book(self, stock_code):
+        return self.order_book
+
+
+def test_limit_between_bid_and_ask_rests_even_if_ticks_touched_it():
+    """有盘口时限价在买一和卖一之间视为挂单，分笔补判不覆盖盘口规则"""
+    buffer = TickBuffer()
+    _fill(buffer, '000063', [10.02, 10.0, 10.0])
+    now = START + timedelta(seconds=30)
+    book = {'bid_prices': [9.99], 'ask_prices': [10.01]}
+    engine = MatchingEngine(None, None, None, _FakeClient(10.0, book, now), tick_buffer=buffer)
+    order = SimpleNamespace(id=1, order_type='limit', price=10.0, direction='buy', status='pending',
+                            stock_code='000063', created_at=START - timedelta(seconds=1), ai_id=1)
+
+    matched, message = engine.match_order(order)
+    assert not matched and "not crossed order book" in message
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
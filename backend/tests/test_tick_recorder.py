@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+测试行情录制（后台写入、按日分区、内存映射读取）
+"""
+
+import sys
+import os
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_service.akshare_client import AKShareClient, Quote
+from data_service.tick_recorder import (
+    TickRecorder, read_ticks, tick_file_path, KIND_QUOTES, KIND_BOOKS, QUOTE_RECORD
+)
+
+
+def _today():
+    return datetime.now().strftime("%Y%m%d")
+
+
+def test_records_quotes_and_books(tmp_path):
+    recorder = TickRecorder(str(tmp_path))
+    recorder.record_quotes([
+        Quote({'代码': '000063', '最新价': 30.5, '昨收': 30.0, '成交量': 1200}),
+        Quote({'代码': '688256', '最新价': 0, '昨收': 1260.0}),
+    ])
+    recorder.record_order_book('688256', {
+        'ask_prices': [1262.0, 1261.5, 1261.0, 1260.5, 1260.0],
+        'bid_prices': [1259.0, 1258.5],
+        'ask_volumes': [1, 2, 3, 4, 5],
+        'bid_volumes': [6, 7],
+    })
+    recorder.close()
+
+    quotes = read_ticks(tick_file_path(str(tmp_path), _today(), KIND_QUOTES), KIND_QUOTES)
+    assert quotes['code'].tolist() == [b'000063', b'688256']
+    assert quotes['price'].tolist() == [30.5, 0.0]
+    assert quotes['volume'][0] == 1200
+    assert quotes['ts'][0] == quotes['ts'][1] > 0
+
+    books = read_ticks(tick_file_path(str(tmp_path), _today(), KIND_BOOKS), KIND_BOOKS)
+    assert books['bid_prices'][0].tolist() == [1259.0, 1258.5, 0.0, 0.0, 0.0]
+    assert books['ask_volumes'][0].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_append_only_and_partial_record_ignored(tmp_path):
+    path = tick_file_path(str(tmp_path), _today(), KIND_QUOTES)
+    for price in (10.0, 11.0):
+        recorder = TickRecorder(str(tmp_path))
+        recorder.record_quotes([Quote({'代码': '000063', '最新价': price})])
+        recorder.close()
+
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * (QUOTE_RECORD.itemsize // 2))  # 模拟写到一半时进程退出
+
+    assert read_ticks(path, KIND_QUOTES)['price'].tolist() == [10.0, 11.0]
+
+
+def test_client_records_fetched_quotes(tmp_path, monkeypatch):
+    """行情客户端只录制从上游获取的数据，命中缓存时不重复录制"""
+    recorder = TickRecorder(str(tmp_path))
+    client = AKShareClient(recorder=recorder)
+    monkeypatch.setattr(
+        client, '_fetch_realtime_quotes',
+        lambda codes: [Quote({'代码': code, '最新价': 10.0}) for code in codes]
+    )
+
+    client.get_realtime_quotes(['000063', '300750'])
+    client.get_stock_info('000063')
+    recorder.flush()
+
+    assert recorder.written[KIND_QUOTES] == 2
+    recorder.close()
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+测试token用量记录、每日预算和用量汇总
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import ai_service.ai_scheduler as ai_scheduler_module
+from ai_service.ai_scheduler import AIScheduler
+from ai_service.token_usage import (
+    budget_exceeded, daily_spend, estimate_cost, estimate_usage, normalize_usage, usage_summary
+)
+from data_service.akshare_client import Quote
+from data_service.quote_hub import QuoteHub
+from models.models import AI, Base, DecisionLog
+
+PRICES = {"fake-model": [2.0, 0.5, 8.0]}
+
+
+class UsageAdapter:
+    model_name = "fake-model"
+
+    def __init__(self, cached=False):
+        self.cached = cached
+        self.calls = 0
+
+    async def acall_api(self, messages, temperature=0.7, timeout=30, on_token=None):
+        self.calls += 1
+        return {
+            "success": True,
+            "response": '{"reasoning": "观望", "actions": []}',
+            "tokens_used": 1300,
+            "usage": {
+                "prompt_tokens": 1200, "completion_tokens": 100, "total_tokens": 1300,
+                "prompt_tokens_details": {"cached_tokens": 1000},
+            },
+            "cached": self.cached,
+        }
+
+
+class NoUsageAdapter(UsageAdapter):
+    """不返回 usage 的服务商（如关闭了 stream_options）"""
+
+    async def acall_api(self, messages, temperature=0.7, timeout=30, on_token=None):
+        result = await super().acall_api(messages, temperature, timeout, on_token)
+        return {**result, "tokens_used": None, "usage": None}
+
+
+class EmptyKLines:
+    def get_klines_batch(self, stock_codes, interval='d', adjust='n', days=5):
+        return {}
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    @contextmanager
+    def session():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(ai_scheduler_module, "get_db_session", session)
+    monkeypatch.setattr(ai_scheduler_module.settings, "llm_token_prices", PRICES)
+    monkeypatch.setattr(ai_scheduler_module.settings, "ai_daily_token_budget", 0)
+    monkeypatch.setattr(ai_scheduler_module.settings, "ai_daily_cost_budget", 0.0)
+    with session() as db:
+        db.add(AI(name="ai-0", model_name="fake"))
+        db.add(AI(name="ai-1", model_name="fake"))
+        db.commit()
+
+    hub = QuoteHub(data_client=object(), stock_codes=['000063'])
+    hub.publish([Quote({'代码': '000063', '名称': '中兴通讯', '最新价': 30.0, '昨收': 29.5})])
+    scheduler = AIScheduler(quote_hub=hub, kline_store=EmptyKLines(), decision_deadline=10)
+    scheduler.session = session
+    yield scheduler
+    scheduler._close_decision_loop()
+
+
+def test_normalize_usage_variants():
+    openai = normalize_usage({
+        "prompt_tokens": 1200, "completion_tokens": 100, "total_tokens": 1300,
+        "prompt_tokens_details": {"cached_tokens": 1000},
+    })
+    assert openai == {"prompt_tokens": 1200, "completion_tokens": 100, "cached_tokens": 1000, "total_tokens": 1300}
+
+    deepseek = normalize_usage({"prompt_tokens": 800, "completion_tokens": 50, "prompt_cache_hit_tokens": 640})
+    assert deepseek["cached_tokens"] == 640 and deepseek["total_tokens"] == 850
+
+    kimi = normalize_usage({"prompt_tokens": 500, "completion_tokens": 20, "total_tokens": 520, "cached_tokens": 256})
+    assert kimi["cached_tokens"] == 256
+
+    assert normalize_usage(None) is None
+    assert normalize_usage({"foo": 1}) is None
+
+
+def test_estimate_cost():
+    usage = normalize_usage({"prompt_tokens": 1200, "completion_tokens": 100, "prompt_tokens_details": {"cached_tokens": 1000}})
+    # 200 × 2 + 1000 × 0.5 + 100 × 8 = 1700 元/百万token
+    assert estimate_cost("fake-model", usage, PRICES) == pytest.approx(0.0017)
+    # 只配置输入、输出单价时缓存命中按输入单价计
+    assert estimate_cost("m", usage, {"m": [1.0, 4.0]}) == pytest.approx((1200 * 1.0 + 100 * 4.0) / 1e6)
+    assert estimate_cost("unknown", usage, PRICES) is None
+
+
+def test_estimate_usage():
+    usage = estimate_usage([{"role": "user", "content": "买入中兴通讯 abcdefgh"}], '{"actions": []}')
+    # 6 个汉字 + 9 个ASCII字符（含空格）→ 6 + 3，加 4 个格式开销
+    assert usage == {"prompt_tokens": 13, "completion_tokens": 4, "cached_tokens": 0, "total_tokens": 17}
+    assert estimate_usage([], None)["total_tokens"] == 0
+
+
+def test_budget_exceeded():
+    spend = {"total_tokens": 5000, "cost": 0.2}
+    assert budget_exceeded(spend, 0, 0.0) is None
+    assert budget_exceeded(spend, 6000, 0.0) is None
+    assert budget_exceeded(spend, 5000, 0.0)
+    assert budget_exceeded(spend, 0, 0.1)
+    assert budget_exceeded(None, 1, 0.1) is None
+
+
+def test_decision_log_records_provider_usage(scheduler):
+    adapter = UsageAdapter()
+    scheduler._get_adapter = lambda name: adapter
+    scheduler._execute_ai_decisions()
+
+    with scheduler.session() as db:
+        logs = db.query(DecisionLog).all()
+        assert len(logs) == 2
+        for log in logs:
+            assert (log.prompt_tokens, log.completion_tokens, log.cached_tokens, log.tokens_used) == (1200, 100, 1000, 1300)
+            assert log.cost == pytest.approx(0.0017)
+            assert "llm_cached" not in log.execution_result
+
+
+def test_response_cache_hits_are_not_counted(scheduler):
+    scheduler._get_adapter = lambda name: UsageAdapter(cached=True)
+    scheduler._execute_ai_decisions()
+
+    with scheduler.session() as db:
+        logs = db.query(DecisionLog).all()
+        assert len(logs) == 2
+        assert all(log.tokens_used is None and log.cost is None for log in logs)
+        assert all(log.execution_result["llm_cached"] for log in logs)
+
+
+def test_over_budget_ai_is_skipped(scheduler):
+    adapter = UsageAdapter()
+    scheduler._get_adapter = lambda name: adapter
+    with scheduler.session() as db:
+        db.query(AI).filter(AI.name == "ai-0").one().daily_token_budget = 2000
+        db.commit()
+
+    scheduler._execute_ai_decisions()   # 两个AI都执行，ai-0 用掉 1300
+    scheduler._execute_ai_decisions()   # 两个AI都执行，ai-0 用掉 2600
+    scheduler._execute_ai_decisions()   # ai-0 已超出预算
+    assert adapter.calls == 5
+
+    with scheduler.session() as db:
+        ai_0 = db.query(AI).filter(AI.name == "ai-0").one()
+        spend = daily_spend(db, datetime.now().date())
+        assert spend[ai_0.id]["total_tokens"] == 2600 and spend[ai_0.id]["calls"] == 2
+
+
+def test_budget_enforced_with_estimated_usage(scheduler):
+    """服务商不返回用量时按估算值记账，预算仍然生效"""
+    adapter = NoUsageAdapter()
+    scheduler._get_adapter = lambda name: adapter
+    with scheduler.session() as db:
+        db.query(AI).filter(AI.name == "ai-0").one().daily_token_budget = 1
+        db.commit()
+
+    scheduler._execute_ai_decisions()
+    scheduler._execute_ai_decisions()   # ai-0 已超出预算
+    assert adapter.calls == 3
+
+    with scheduler.session() as db:
+        logs = db.query(DecisionLog).all()
+        assert all(log.tokens_used > 0 and log.prompt_tokens > 0 and log.cost > 0 for log in logs)
+        assert all(log.execution_result["usage_estimated"] for log in logs)
+
+
+def test_cost_budget_from_settings(scheduler, monkeypatch):
+    adapter = UsageAdapter()
+    scheduler._get_adapter = lambda name: adapter
+    monkeypatch.setattr(ai_scheduler_module.settings, "ai_daily_cost_budget", 0.001)
+
+    scheduler._execute_ai_decisions()
+    scheduler._execute_ai_decisions()
+    assert adapter.calls == 2
+
+
+def test_usage_summary_groups_by_ai_and_day(scheduler):
+    now = datetime.now()
+    with scheduler.session() as db:
+        ai_ids = [ai.id for ai in db.query(AI).order_by(AI.id).all()]
+        for ai_id, days_ago, prompt, cached, cost in [
+            (ai_ids[0], 1, 1000, 800, 0.01),
+            (ai_ids[0], 0, 1000, 0, 0.02),
+            (ai_ids[0], 0, 500, 500, 0.005),
+            (ai_ids[1], 0, 2000, 1000, None),
+        ]:
+            db.add(DecisionLog(
+                ai_id=ai_id, timestamp=now - timedelta(days=days_ago), latency_ms=100,
+                prompt_tokens=prompt, completion_tokens=100, cached_tokens=cached,
+                tokens_used=prompt + 100, cost=cost,
+            ))
+        db.commit()
+
+        start = datetime.combine(now.date() - timedelta(days=1), datetime.min.time())
+        rows = usage_summary(db, start, now + timedelta(days=1))
+        assert [(row["ai_id"], row["calls"]) for row in rows] == [(ai_ids[0], 1), (ai_ids[0], 2), (ai_ids[1], 1)]
+        today = rows[1]
+        assert today["prompt_tokens"] == 1500 and today["cached_tokens"] == 500
+        assert today["cache_hit_rate"] == pytest.approx(1 / 3, abs=1e-4)
+        assert today["cost"] == pytest.approx(0.025)
+        assert rows[2]["cost"] == 0.0
+
+        assert usage_summary(db, start, now + timedelta(days=1), ai_ids[1])[0]["total_tokens"] == 2100
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+测试交易日历
+"""
+
+import sys
+import os
+from datetime import date, datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_service.cache import TradingSessionPolicy
+from data_service.replay_client import VirtualClock
+from rules.trading_calendar import TradingCalendar
+from rules.trading_rules import TradingRules
+from ai_service.ai_scheduler import AIScheduler
+
+
+def test_bundled_holidays():
+    calendar = TradingCalendar()
+    assert not calendar.is_trading_day(date(2025, 10, 1))
+    assert not calendar.is_trading_day(date(2026, 2, 17))
+    assert calendar.is_trading_day(date(2025, 10, 9))
+    assert not calendar.is_trading_time(datetime(2025, 5, 1, 10, 0))
+    assert calendar.is_trading_time(datetime(2025, 5, 6, 10, 0))
+
+
+def test_session_boundaries():
+    calendar = TradingCalendar(holidays={date(2025, 10, 1), date(2025, 10, 2), date(2025, 10, 3),
+                                         date(2025, 10, 6), date(2025, 10, 7), date(2025, 10, 8)})
+    assert calendar.is_trading_time(datetime(2025, 9, 30, 9, 30))
+    assert calendar.is_trading_time(datetime(2025, 9, 30, 15, 0))
+    assert not calendar.is_trading_time(datetime(2025, 9, 30, 12, 0))
+
+    assert calendar.next_session_start(datetime(2025, 9, 30, 8, 0)) == datetime(2025, 9, 30, 9, 30)
+    assert calendar.next_session_start(datetime(2025, 9, 30, 11, 30, 1)) == datetime(2025, 9, 30, 13, 0)
+    # 国庆长假加周末，下一次开盘在10月9日
+    assert calendar.next_session_start(datetime(2025, 9, 30, 15, 0, 1)) == datetime(2025, 10, 9, 9, 30)
+    assert calendar.next_trading_day(date(2025, 9, 30)) == date(2025, 10, 9)
+    assert calendar.previous_trading_day(date(2025, 10, 9)) == date(2025, 9, 30)
+    assert "2025-10-09 09:30" in calendar.describe(datetime(2025, 10, 3, 10, 0))
+
+
+def test_uncovered_year_falls_back_to_weekdays():
+    calendar = TradingCalendar(holidays={date(2025, 1, 1)})
+    assert calendar.is_trading_time(datetime(2030, 1, 2, 10, 0))
+    assert calendar.next_session_start(datetime(2030, 1, 5, 10, 0)) == datetime(2030, 1, 7, 9, 30)
+    assert calendar.next_session_start(datetime(2025, 12, 31, 16, 0)) == datetime(2026, 1, 1, 9, 30)
+
+
+def test_trading_rules_and_cache_policy_use_calendar():
+    calendar = TradingCalendar(holidays={date(2025, 4, 4)})
+    assert not TradingRules(calendar=calendar).check_trading_time(datetime(2025, 4, 4, 10, 0))
+
+    policy = TradingSessionPolicy(calendar)
+    assert policy.next_boundary(datetime(2025, 4, 3, 15, 30)) == datetime(2025, 4, 7, 9, 30)
+
+
+def test_scheduler_sleeps_until_next_open():
+    calendar = TradingCalendar(holidays={date(2025, 4, 4)})
+    clock = VirtualClock(datetime(2025, 4, 3, 15, 30), speed=0)
+    scheduler = AIScheduler(
+        data_client=object(), trading_rules=TradingRules(calendar=calendar), kline_store=object(), clock=clock
+    )
+
+    assert not scheduler._is_trading_time()
+    jobs = scheduler._create_job_scheduler()
+    runs = []
+    jobs.jobs[0].func = lambda: runs.append(clock.now())
+    jobs.jobs[1].func = jobs.jobs[2].func = lambda: None
+    jobs.run_until(datetime(2025, 4, 7, 9, 31))
+    assert runs[0] == datetime(2025, 4, 7, 9, 30)
+    assert scheduler._is_trading_time()
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
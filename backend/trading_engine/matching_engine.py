@@ -12,6 +12,7 @@ from models.models import Order, Transaction
 from rules.trading_rules import TradingRules
 from portfolio.portfolio_manager import PortfolioManager
 from data_service.akshare_client import AKShareClient
+from data_service.tick_buffer import TickBuffer
 
 # 导入WebSocket管理器用于广播
 try:
@@ -30,7 +31,8 @@ class MatchingEngine:
         db: Session,
         trading_rules: TradingRules,
         portfolio_manager: PortfolioManager,
-        akshare_client: AKShareClient
+        akshare_client: AKShareClient,
+        tick_buffer: Optional[TickBuffer] = None
     ):
         """
         初始化
@@ -40,11 +42,13 @@ class MatchingEngine:
             trading_rules: 交易规则引擎
             portfolio_manager: 持仓管理器
             akshare_client: AKShare客户端
+            tick_buffer: 当日分笔缓冲（可选），用于判断委托后价格是否曾穿过限价
         """
         self.db = db
         self.trading_rules = trading_rules
         self.portfolio_manager = portfolio_manager
         self.akshare_client = akshare_client
+        self.tick_buffer = tick_buffer
         logger.info("MatchingEngine initialized")
     
     def match_order(self, order: Order) -> Tuple[bool, str]:
@@ -95,6 +99,9 @@ class MatchingEngine:
 
         # 确定成交价格
         match_price, reason = self._determine_match_price(order, current_price, order_book)
+        if match_price is None and not order_book:
+            # 有盘口时以盘口的判断为准（限价在买一和卖一之间视为挂单），不再用分笔补判
+            match_price = self._crossed_limit_price(order, self._quote_time(stock_info))
         if match_price is None:
             return False, reason
 
@@ -260,6 +267,31 @@ class MatchingEngine:
                 f"(bid1: {best_bid}, ask1: {best_ask}, price: {limit_price})"
             )
     
+    @staticmethod
+    def _quote_time(stock_info: Dict[str, Any]) -> Optional[datetime]:
+        """本次撮合所用行情的时间"""
+        timestamp = stock_info.get('timestamp')
+        if isinstance(timestamp, datetime):
+            return timestamp
+        try:
+            return datetime.fromisoformat(timestamp) if timestamp else None
+        except ValueError:
+            return None
+    
+    def _crossed_limit_price(self, order: Order, until: Optional[datetime]) -> Optional[float]:
+        """
+        两次撮合之间价格可能穿过限价后又回到限价外，只看最新价会漏掉这类成交。
+        委托后、本次行情之前（不含本次，本次已按最新价判断过）的分笔中价格曾触及限价时，按限价成交。
+        """
+        if (self.tick_buffer is None or order.order_type == "market" or order.price is None
+                or not order.created_at or until is None):
+            return None
+        limit_price = float(order.price)
+        if self.tick_buffer.crossed(order.stock_code, limit_price, order.direction, order.created_at, until):
+            logger.info(f"订单 #{order.id} 委托后价格曾触及限价 {limit_price}，按限价成交")
+            return limit_price
+        return None
+    
     def _execute_trade(
         self,
         order: Order,